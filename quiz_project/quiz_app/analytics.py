@@ -0,0 +1,297 @@
+"""
+File: analytics.py
+
+Description: This file computes the per-question difficulty statistics shown to quiz owners:
+the percentage of correct answers, the discrimination index (the point-biserial correlation
+between answering a question correctly and the score of the attempt) and the distribution
+of the answers chosen.
+
+Rather than aggregating UserAnswer rows per question with the ORM, the job streams the rows
+out in id order, in chunks, into NumPy arrays and reduces every chunk to per-question sums
+in a few vectorized passes. Multi-select questions store one row per selected answer, so
+rows are first grouped into responses, one per (attempt, question): a response is correct
+when every selected answer is, and, for multi-select questions, every correct answer was
+selected. Chunks never split the rows of an attempt.
+
+QuestionStats keeps those sums rather than the final figures, so a run only has to read the
+answers recorded since the previous one: the StatsWatermark row remembers the highest
+UserAnswer id already included. Answers of deleted attempts are not subtracted; a full
+rebuild recomputes everything from scratch.
+
+The watermark relies on rows being committed in id order, which holds on SQLite since it
+serializes writers. Other databases allocate ids before commit, so a row below the watermark
+can still commit after a run; there every run is a full recompute.
+
+Functions in this file:
+1. update_question_stats: Adds the answers recorded since the last run to QuestionStats.
+   incremental_supported tells whether the database allows incremental runs.
+2. quiz_question_stats: Returns the statistics of every question of a quiz, for display.
+"""
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Question, QuestionStats, StatsWatermark, UserAnswer
+
+WATERMARK = "question_stats"
+
+# Columns of a chunk array, and of the per-question sums
+ID, ATTEMPT, QUESTION, CHOICE, CORRECT, SCORE = range(6)
+SUMS = ("responses", "correct", "score_sum", "score_squares", "correct_score_sum")
+
+# Ids per "IN (...)" lookup, below SQLite's bound parameter limit
+IN_BATCH = 900
+
+
+class StatsConflict(Exception):
+    """
+    Raised when another run updated the statistics while this one was reading.
+    """
+
+
+def _chunks(after_id, until_id, chunk_size):
+    """
+    Yields the UserAnswer rows with after_id < id <= until_id as int64 arrays of
+    (id, attempt, question, choice, correct, attempt score), choice being -1 when no answer
+    was selected. The rows of an attempt are always yielded in the same chunk.
+    """
+    rows = (
+        UserAnswer.objects.annotate(choice=Coalesce("selected_answer_id", Value(-1)))
+        .order_by("id")
+        .values_list(
+            "id",
+            "quiz_attempt_id",
+            "question_id",
+            "choice",
+            "is_correct",
+            "quiz_attempt__score",
+        )
+    )
+    carried = set()  # Ids above after_id already yielded with their attempt
+    while after_id < until_id:
+        chunk = list(rows.filter(id__gt=after_id, id__lte=until_id)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1][ID]
+        chunk = [row for row in chunk if row[ID] not in carried]
+        # Complete the attempts of the chunk, whose rows may continue past it
+        attempts = sorted({row[ATTEMPT] for row in chunk})
+        for start in range(0, len(attempts), IN_BATCH):
+            rest = rows.filter(
+                id__gt=last_id,
+                id__lte=until_id,
+                quiz_attempt_id__in=attempts[start : start + IN_BATCH],
+            )
+            for row in rest:
+                carried.add(row[ID])
+                chunk.append(row)
+        carried = {row_id for row_id in carried if row_id > last_id}
+        after_id = last_id
+        if chunk:
+            yield np.array(chunk, dtype=np.int64)
+
+
+def _question_kinds(question_ids, kinds):
+    """
+    Adds (is multi-select, number of correct answers) of the given questions to kinds.
+    """
+    missing = [question_id for question_id in question_ids if question_id not in kinds]
+    for start in range(0, len(missing), IN_BATCH):
+        rows = (
+            Question.objects.filter(id__in=missing[start : start + IN_BATCH])
+            .annotate(correct=Count("answers", filter=Q(answers__is_correct=True)))
+            .values_list("id", "question_type", "correct")
+        )
+        for question_id, question_type, correct in rows:
+            kinds[question_id] = (question_type in Question.MULTI_SELECT_TYPES, correct)
+
+
+def _reduce_chunk(block, kinds):
+    """
+    Reduces a chunk to (question ids, sums) and (answer ids, question ids, counts).
+    Parameters:
+        block: The rows of the chunk.
+        kinds: Question id -> (is multi-select, number of correct answers), completed here
+            with the questions of the chunk.
+    """
+    # One response per (attempt, question)
+    keys, group = np.unique(block[:, [ATTEMPT, QUESTION]], axis=0, return_inverse=True)
+    group = group.reshape(-1)
+    selected = np.bincount(group, weights=block[:, CHOICE] >= 0, minlength=len(keys))
+    right = np.bincount(group, weights=block[:, CORRECT], minlength=len(keys))
+    score = np.zeros(len(keys))
+    score[group] = block[:, SCORE]
+
+    _question_kinds(np.unique(keys[:, 1]).tolist(), kinds)
+    # Questions deleted since their answers were read count as single-select; _save skips them
+    multi_select, correct_answers = np.array(
+        [kinds.get(question_id, (False, 0)) for question_id in keys[:, 1].tolist()],
+        dtype=np.int64,
+    ).reshape(-1, 2).T
+    correct = (right == selected) & (selected > 0)
+    correct &= ~multi_select.astype(bool) | (selected == correct_answers)
+    correct = correct.astype(np.float64)
+
+    questions, index = np.unique(keys[:, 1], return_inverse=True)
+    columns = (None, correct, score, score * score, correct * score)
+    sums = np.stack(
+        [np.bincount(index, weights=column, minlength=len(questions)) for column in columns],
+        axis=1,
+    )
+
+    answered = block[block[:, CHOICE] >= 0]
+    answers, first, counts = np.unique(
+        answered[:, CHOICE], return_index=True, return_counts=True
+    )
+    return (questions, sums), (answers, answered[first, QUESTION], counts)
+
+
+def _merge(parts):
+    """
+    Sums the values of several reduced chunks, given as (keys, values) pairs, by key.
+    """
+    keys = np.concatenate([keys for keys, _ in parts])
+    values = np.concatenate([values for _, values in parts]).reshape(len(keys), -1)
+    unique, index = np.unique(keys, return_inverse=True)
+    merged = np.stack(
+        [
+            np.bincount(index, weights=column, minlength=len(unique))
+            for column in values.T
+        ],
+        axis=1,
+    )
+    return unique, merged
+
+
+def _collect(after_id, until_id, chunk_size):
+    """
+    Returns the summed statistics of the answers in (after_id, until_id] as
+    (question ids, sums, answer ids, answer question ids, answer counts, rows read).
+    """
+    totals, choices, rows, kinds = [], [], 0, {}
+    for block in _chunks(after_id, until_id, chunk_size):
+        chunk_totals, chunk_choices = _reduce_chunk(block, kinds)
+        totals.append(chunk_totals)
+        choices.append(chunk_choices)
+        rows += len(block)
+    if not rows:
+        return None
+
+    questions, sums = _merge(totals)
+    # An answer always belongs to the same question, so its question id is carried along
+    answer_ids = np.concatenate([part[0] for part in choices])
+    answer_questions = dict(
+        zip(answer_ids.tolist(), np.concatenate([part[1] for part in choices]).tolist())
+    )
+    answers, counts = _merge([(part[0], part[2]) for part in choices])
+    return questions, sums, answers, answer_questions, counts[:, 0], rows
+
+
+def _save(questions, sums, answers, answer_questions, counts, replace):
+    now = timezone.now()
+    choice_counts = {}
+    for answer_id, count in zip(answers.tolist(), counts.tolist()):
+        question_id = answer_questions[answer_id]
+        choice_counts.setdefault(question_id, {})[str(answer_id)] = int(count)
+
+    question_ids = questions.tolist()
+    quiz_of, existing = {}, {}
+    for start in range(0, len(question_ids), IN_BATCH):
+        batch = question_ids[start : start + IN_BATCH]
+        # Questions deleted since their answers were read are skipped
+        quiz_of.update(Question.objects.filter(id__in=batch).values_list("id", "quiz_id"))
+        if not replace:
+            existing.update(QuestionStats.objects.in_bulk(batch))
+
+    created, updated = [], []
+    for question_id, row in zip(question_ids, sums.tolist()):
+        if question_id not in quiz_of:
+            continue
+        stats = existing.get(question_id)
+        if stats is None:
+            stats = QuestionStats(question_id=question_id, quiz_id=quiz_of[question_id])
+            created.append(stats)
+        else:
+            updated.append(stats)
+        responses, correct, *score_sums = row
+        stats.responses += round(responses)
+        stats.correct += round(correct)
+        for name, value in zip(SUMS[2:], score_sums):
+            setattr(stats, name, getattr(stats, name) + value)
+        for answer_id, count in choice_counts.get(question_id, {}).items():
+            stats.choice_counts[answer_id] = stats.choice_counts.get(answer_id, 0) + count
+        stats.updated_at = now
+
+    QuestionStats.objects.bulk_create(created, batch_size=IN_BATCH)
+    QuestionStats.objects.bulk_update(
+        updated, [*SUMS, "choice_counts", "updated_at"], batch_size=IN_BATCH
+    )
+    return len(created) + len(updated)
+
+
+def incremental_supported():
+    """
+    Returns True if the database commits UserAnswer rows in id order, as SQLite does.
+    """
+    return connection.vendor == "sqlite"
+
+
+def update_question_stats(chunk_size=50000, full=False):
+    """
+    Adds the answers recorded since the previous run to the question statistics.
+    Parameters:
+        chunk_size: The number of UserAnswer rows fetched from the database at a time.
+        full: Recompute every statistic from scratch instead. Always the case on databases
+            other than SQLite, where ids may commit out of order.
+    Returns:
+        tuple: The number of answers read and of questions whose statistics changed.
+    Raises:
+        StatsConflict: If another run completed while this one was reading.
+    """
+    full = full or not incremental_supported()
+    watermark, _ = StatsWatermark.objects.get_or_create(name=WATERMARK)
+    start = 0 if full else watermark.last_id
+    until = UserAnswer.objects.aggregate(last=Max("id"))["last"] or 0
+
+    collected = _collect(start, until, chunk_size)
+    with transaction.atomic():
+        current = StatsWatermark.objects.select_for_update().get(name=WATERMARK)
+        if current.last_id != watermark.last_id:
+            raise StatsConflict("The question statistics were updated by another run.")
+        if full:
+            QuestionStats.objects.all().delete()
+        changed = _save(*collected[:5], replace=full) if collected else 0
+        current.last_id = max(until, start)
+        current.updated_at = timezone.now()
+        current.save()
+    return (collected[5] if collected else 0), changed
+
+
+def quiz_question_stats(quiz):
+    """
+    Returns the questions of a quiz in order, each with its "statistics" (None if nobody
+    answered it yet) and a "choices" list of (answer, times chosen, percentage) tuples.
+    """
+    questions = list(
+        Question.objects.filter(quiz=quiz)
+        .select_related("stats")
+        .prefetch_related("answers")
+        .order_by("id")
+    )
+    for question in questions:
+        stats = getattr(question, "stats", None)
+        question.statistics = stats
+        counts = stats.choice_counts if stats else {}
+        total = sum(counts.values())
+        question.choices = [
+            (
+                answer,
+                counts.get(str(answer.id), 0),
+                100 * counts.get(str(answer.id), 0) / total if total else 0,
+            )
+            for answer in question.answers.all()
+        ]
+    return questions
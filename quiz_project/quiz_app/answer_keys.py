@@ -0,0 +1,439 @@
+"""
+File: answer_keys.py
+
+Description: This file implements the scoring engine and the per-quiz answer-key cache used
+to grade submissions. Each quiz is compiled into an AnswerKey: for every question, its
+points, its scoring kind and a bitmask of its correct answers, each answer of the question
+being assigned one bit. A submission is graded in a single pass over the questions, with
+dictionary lookups and integer bit operations only, so grading never touches the database.
+
+Question types (see Question.QUESTION_TYPES) are scored as follows:
+- single / true_false: the points if the one selected answer is correct, which may be any
+  of several correct answers;
+- multiple: the points if exactly the correct answers are selected (all or nothing);
+- multiple_partial: points * (correct selected - wrong selected) / correct answers, rounded
+  down and never below zero.
+Unknown types (such as the legacy "text") are scored as single choice.
+
+Keys are built with a single query, kept in a bounded in-process LRU and mirrored into
+Django's cache so that other worker processes can reuse them. Every key carries the content
+version of the quiz it was built from (see snapshots.py), and lookups take the version the
+caller read from the database: an entry built from another version is never used, so an
+edit reaches every worker process on its next lookup, whatever the cache backend. Signal
+handlers in signals.py also drop a quiz's key from the local LRU when its content changes.
+
+Usage:
+    key = answer_keys.get(quiz.id, quiz.content_version)
+    score, responses = key.score(request.POST)
+    score, responses = key.score(request.POST, drawn_question_ids)  # Pooled quizzes
+    correct = answer_keys.for_questions([question_id])[question_id].check(question_id, answer_id)
+
+Async code uses the "a"-prefixed methods (aget, afor_questions) instead.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Question, Quiz
+
+# Scoring kinds of the compiled questions
+SINGLE, ALL_OR_NOTHING, PARTIAL = range(3)
+
+KINDS = {
+    Question.SINGLE_CHOICE: SINGLE,
+    Question.TRUE_FALSE: SINGLE,
+    Question.MULTIPLE_CHOICE: ALL_OR_NOTHING,
+    Question.MULTIPLE_CHOICE_PARTIAL: PARTIAL,
+}
+
+
+def _selected_values(data):
+    """
+    Returns a function listing the values submitted for a field, for QueryDicts (which
+    may hold several values per field) and plain mappings alike.
+    """
+    getlist = getattr(data, "getlist", None)
+    if getlist is not None:
+        return getlist
+
+    def values(name):
+        value = data.get(name)
+        if value is None:
+            return ()
+        return value if isinstance(value, (list, tuple)) else (value,)
+
+    return values
+
+
+class AnswerKey:
+    """
+    Compiled, read-only answer key for a single quiz.
+
+    Attributes:
+        - quiz_id: The ID of the quiz this key belongs to.
+        - version: The content version of the quiz the key was built from.
+        - questions: One (question id, form field, kind, points, choices, correct mask,
+          number of correct answers) tuple per question, in id order. choices maps the
+          string form of each answer id to its (answer id, bit) pair.
+        - max_score: The score of a perfect submission.
+    """
+
+    __slots__ = ("quiz_id", "version", "questions", "max_score", "_by_question")
+
+    def __init__(self, quiz_id, questions, version=None):
+        self.quiz_id = quiz_id
+        self.version = version
+        self.questions = questions
+        self.max_score = sum(max(question[3], 0) for question in questions)
+        self._by_question = {question[0]: question for question in questions}
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __contains__(self, question_id):
+        return question_id in self._by_question
+
+    def __getstate__(self):
+        return self.quiz_id, self.questions, self.version
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def _subset(self, question_ids):
+        if question_ids is None:
+            return self.questions
+        return [self._by_question[qid] for qid in question_ids if qid in self._by_question]
+
+    def max_score_for(self, question_ids):
+        """
+        Returns the score of a perfect submission covering only the given questions.
+        """
+        return sum(max(question[3], 0) for question in self._subset(question_ids))
+
+    def score(self, data, question_ids=None):
+        """
+        Grades a submission in one pass.
+        Parameters:
+            data: A mapping such as request.POST holding "question_<id>" -> answer id, with
+                several values for multi-select questions.
+            question_ids: Only grade these questions, such as the ones drawn from a pooled
+                quiz (see pools.py). Defaults to every question of the quiz.
+        Returns:
+            tuple: The score, and (question_id, selected_answer_id, is_correct) tuples with
+            one per selected answer, or (question_id, None, False) for a question without
+            a valid selection. Submitted ids that are not answers of the question, and
+            extra selections on single-choice questions, are ignored.
+        """
+        values = _selected_values(data)
+        questions = self._subset(question_ids)
+        total = 0
+        responses = []
+        for question_id, field, kind, points, choices, correct, correct_count in questions:
+            selected = 0
+            for value in values(field):
+                choice = choices.get(value)
+                if choice is None or selected & choice[1]:
+                    continue
+                answer_id, bit = choice
+                selected |= bit
+                responses.append((question_id, answer_id, bool(bit & correct)))
+                if kind == SINGLE:
+                    break
+            if not selected:
+                responses.append((question_id, None, False))
+            elif kind == PARTIAL:
+                if not correct_count:
+                    continue
+                right = (selected & correct).bit_count()
+                wrong = (selected & ~correct).bit_count()
+                total += max(right - wrong, 0) * points // correct_count
+            elif kind == SINGLE:
+                if selected & correct:
+                    total += points
+            elif selected == correct:
+                total += points
+        return total, responses
+
+    def points_by_question(self, data, question_ids=None):
+        """
+        Returns {question id: points earned} for a submission, such as one rebuilt from
+        the stored responses of an attempt to show its per-question breakdown.
+        """
+        return {
+            question[0]: self.score(data, (question[0],))[0]
+            for question in self._subset(question_ids)
+        }
+
+    def check(self, question_id, answer_id):
+        """
+        Checks a single selected answer.
+        Parameters:
+            question_id: The ID of the question.
+            answer_id: The ID of the selected answer (int or numeric string).
+        Returns:
+            bool or None: Whether the answer is correct, or None if it is not an answer
+            of the question.
+        """
+        question = self._by_question.get(question_id)
+        if question is None:
+            return None
+        choice = question[4].get(str(answer_id))
+        if choice is None:
+            return None
+        return bool(choice[1] & question[5])
+
+    @staticmethod
+    def _rows(quiz_id):
+        # Keys are cached until the quiz changes, so they are built from the primary
+        # rather than a possibly lagging replica. The content version is read in the same
+        # query, and a quiz without questions still yields one row.
+        return (
+            Quiz.objects.using(DEFAULT_DB_ALIAS)
+            .filter(pk=quiz_id)
+            .values_list(
+                "content_version",
+                "questions__id",
+                "questions__question_type",
+                "questions__points",
+                "questions__answers__id",
+                "questions__answers__is_correct",
+            )
+            .order_by("questions__id", "questions__answers__id")
+        )
+
+    @classmethod
+    def build(cls, quiz_id):
+        """
+        Compiles the answer key for a quiz from the database with one query.
+        """
+        return cls._from_quiz_rows(quiz_id, list(cls._rows(quiz_id)))
+
+    @classmethod
+    async def abuild(cls, quiz_id):
+        """
+        Async version of build.
+        """
+        return cls._from_quiz_rows(quiz_id, [row async for row in cls._rows(quiz_id)])
+
+    @classmethod
+    def _from_quiz_rows(cls, quiz_id, rows):
+        version = rows[0][0] if rows else None
+        return cls._from_rows(
+            quiz_id, [row[1:] for row in rows if row[1] is not None], version
+        )
+
+    @classmethod
+    def _from_rows(cls, quiz_id, rows, version=None):
+        compiled = {}
+        for question_id, question_type, points, answer_id, is_correct in rows:
+            question = compiled.get(question_id)
+            if question is None:
+                kind = KINDS.get(question_type, SINGLE)
+                question = compiled[question_id] = [kind, points, {}, 0]
+            if answer_id is None:
+                continue
+            bit = 1 << len(question[2])
+            question[2][str(answer_id)] = (answer_id, bit)
+            if is_correct:
+                question[3] |= bit
+        return cls(
+            quiz_id,
+            tuple(
+                (
+                    question_id,
+                    f"question_{question_id}",
+                    kind,
+                    points,
+                    choices,
+                    correct,
+                    correct.bit_count(),
+                )
+                for question_id, (kind, points, choices, correct) in compiled.items()
+            ),
+            version,
+        )
+
+
+class AnswerKeyCache:
+    """
+    Bounded LRU of answer keys with a Django cache fallback.
+
+    Lookups first check the in-process LRU, then the shared Django cache, and finally
+    build the key from the database. Both levels only serve keys built from the content
+    version given by the caller. Hits and misses are counted per level.
+    """
+
+    def __init__(self, max_entries=512, timeout=3600):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def cache_key(quiz_id, version):
+        return f"quiz_app:answer_key:v3:{quiz_id}:{version}"
+
+    def get(self, quiz_id, version):
+        """
+        Returns the answer key for a quiz, building it on a miss.
+        Parameters:
+            quiz_id: The ID of the quiz.
+            version: The content version of the quiz, as read from the database.
+        """
+        key = self._local(quiz_id, version)
+        if key is not None:
+            return key
+
+        key = cache.get(self.cache_key(quiz_id, version))
+        if key is not None:
+            self._count("shared_hits")
+        else:
+            self._count("misses")
+            key = AnswerKey.build(quiz_id)
+            # Only shared under the version it was built from
+            if key.version == version:
+                cache.set(self.cache_key(quiz_id, version), key, self.timeout)
+        self._remember(quiz_id, key)
+        return key
+
+    async def aget(self, quiz_id, version):
+        """
+        Async version of get.
+        """
+        key = self._local(quiz_id, version)
+        if key is not None:
+            return key
+
+        key = await cache.aget(self.cache_key(quiz_id, version))
+        if key is not None:
+            self._count("shared_hits")
+        else:
+            self._count("misses")
+            key = await AnswerKey.abuild(quiz_id)
+            if key.version == version:
+                await cache.aset(self.cache_key(quiz_id, version), key, self.timeout)
+        self._remember(quiz_id, key)
+        return key
+
+    def for_questions(self, question_ids):
+        """
+        Returns the answer keys covering the given questions.
+
+        The quiz of each question is looked up in Django's cache, and the misses are
+        resolved with a single query. The content versions of those quizzes are then read
+        with one more query.
+        Parameters:
+            question_ids: The IDs of the questions.
+        Returns:
+            dict: Mapping of question id to the AnswerKey of its quiz. Unknown questions
+            are left out.
+        """
+        cache_keys = self._question_cache_keys(question_ids)
+        quiz_ids = {
+            cache_keys[key]: quiz_id for key, quiz_id in cache.get_many(cache_keys).items()
+        }
+        missing = set(cache_keys.values()) - quiz_ids.keys()
+        if missing:
+            found = dict(
+                Question.objects.filter(id__in=missing).values_list("id", "quiz_id")
+            )
+            cache.set_many(self._question_cache_values(found), self.timeout)
+            quiz_ids.update(found)
+
+        versions = self._versions(set(quiz_ids.values()))
+        keys = {quiz_id: self.get(quiz_id, version) for quiz_id, version in versions}
+        return self._keys_by_question(quiz_ids, keys)
+
+    async def afor_questions(self, question_ids):
+        """
+        Async version of for_questions.
+        """
+        cache_keys = self._question_cache_keys(question_ids)
+        cached = await cache.aget_many(cache_keys)
+        quiz_ids = {cache_keys[key]: quiz_id for key, quiz_id in cached.items()}
+        missing = set(cache_keys.values()) - quiz_ids.keys()
+        if missing:
+            rows = Question.objects.filter(id__in=missing).values_list("id", "quiz_id")
+            found = {question_id: quiz_id async for question_id, quiz_id in rows}
+            await cache.aset_many(self._question_cache_values(found), self.timeout)
+            quiz_ids.update(found)
+
+        versions = self._versions(set(quiz_ids.values()))
+        keys = {
+            quiz_id: await self.aget(quiz_id, version) async for quiz_id, version in versions
+        }
+        return self._keys_by_question(quiz_ids, keys)
+
+    @staticmethod
+    def _versions(quiz_ids):
+        return Quiz.objects.filter(id__in=quiz_ids).values_list("id", "content_version")
+
+    @staticmethod
+    def _question_cache_keys(question_ids):
+        return {f"quiz_app:question_quiz:{qid}": qid for qid in set(question_ids)}
+
+    @staticmethod
+    def _question_cache_values(quiz_ids):
+        return {f"quiz_app:question_quiz:{qid}": quiz_id for qid, quiz_id in quiz_ids.items()}
+
+    @staticmethod
+    def _keys_by_question(quiz_ids, keys):
+        # Quizzes deleted since their questions were cached are left out
+        return {
+            qid: keys[quiz_id]
+            for qid, quiz_id in quiz_ids.items()
+            if quiz_id in keys and qid in keys[quiz_id]
+        }
+
+    def invalidate(self, quiz_id):
+        """
+        Drops a quiz's answer key from the LRU of this process. Keys of the previous
+        version left in the shared cache and in other processes are no longer served once
+        the content version is bumped, and simply expire.
+        """
+        with self._lock:
+            self._entries.pop(quiz_id, None)
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns a snapshot of the cache counters and current size.
+        """
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), max_entries=self.max_entries)
+
+    def _local(self, quiz_id, version):
+        with self._lock:
+            key = self._entries.get(quiz_id)
+            if key is None or key.version != version:
+                return None
+            self._entries.move_to_end(quiz_id)
+            self._stats["hits"] += 1
+            return key
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _remember(self, quiz_id, key):
+        with self._lock:
+            self._entries[quiz_id] = key
+            self._entries.move_to_end(quiz_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Process-wide answer key cache shared by all views
+answer_keys = AnswerKeyCache(
+    max_entries=getattr(settings, "ANSWER_KEY_CACHE_SIZE", 512),
+    timeout=getattr(settings, "ANSWER_KEY_CACHE_TIMEOUT", 3600),
+)
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class QuizAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quiz_app'
+
+    def ready(self):
+        # Register signal handlers that keep cached quiz data consistent
+        from . import signals  # noqa: F401
+
+        # Apply the SQLite connection profile to every new connection
+        from . import database  # noqa: F401
+
+        # Time the queries of every new connection for the request metrics
+        from . import metrics  # noqa: F401
@@ -0,0 +1,206 @@
+"""
+File: async_views.py
+
+Description: This file defines native async versions of the views on the play path. They use
+Django's async ORM API (aget, aaggregate, async iteration) and the async cache API, so under
+an ASGI server (uvicorn, daphne) a request waiting on the database or cache does not tie up a
+worker thread. Writes that need a transaction still run through sync_to_async, since Django
+transactions are not available from async code.
+
+urls.py routes to these views instead of their counterparts in views.py when the
+QUIZ_ASYNC_VIEWS setting is enabled. Only enable it for ASGI deployments; under WSGI every
+async view is run through async_to_sync and is slower than the sync version.
+
+Views in this file:
+1. index: Displays a filterable, paginated list of quizzes on the home page.
+2. play_quiz: Displays a specific quiz for the user to attempt.
+3. check_answer: Verifies if a selected answer is correct and returns the result as JSON.
+4. submit_quiz: Grades the submitted answers and saves the attempt with its responses.
+5. quiz_results: Displays the results of a quiz attempt with its per-question breakdown.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.urls import reverse
+
+from . import attempt_tokens
+from .answer_keys import answer_keys
+from .attempts import record_attempt
+from .catalogue import acatalogue_page, afacet_counts
+from .fragments import aquestions_fragment, render_questions
+from .leaderboards import apercentile_rank
+from .models import Question, Quiz, QuizAttempt
+from .pools import adraw_questions, adrawn_question_ids
+from .question_pages import aget_question_page
+from .results import aresults_fragment
+from .write_behind import AttemptWriteFailed
+
+
+async def _load_user(request):
+    """
+    Resolves request.user with the async auth API so templates can use it without
+    triggering a synchronous query.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+async def index(request):
+    """
+    Displays one page of the quiz catalogue on the home page.
+    Parameters:
+        request: The HTTP request object. The optional "category" and "difficulty"
+            query parameters filter the quizzes, and "cursor" selects the page.
+    Returns:
+        HttpResponse: Renders the 'index.html' template with the page of quizzes,
+        the facet counts, the link to the next page and the user object.
+    """
+    category = request.GET.get("category", "")
+    difficulty = request.GET.get("difficulty", "")
+    page = await acatalogue_page(category, difficulty, request.GET.get("cursor"))
+
+    next_query = None
+    if page.has_next:
+        params = request.GET.copy()
+        params["cursor"] = page.next_cursor
+        next_query = params.urlencode()
+
+    context = {
+        "quizzes": page,
+        "facets": await afacet_counts(),
+        "category": category,
+        "difficulty": difficulty,
+        "next_query": next_query,
+        "user": await _load_user(request),
+    }
+    return render(request, "index.html", context)
+
+
+@login_required
+async def play_quiz(request, quiz_id):
+    """
+    Fetches and displays a specific quiz for the user to attempt.
+    Parameters:
+        request: The HTTP request object.
+        quiz_id: The ID of the quiz to be played.
+    Returns:
+        HttpResponse: Renders the 'play_quiz.html' template with the quiz and its cached questions.
+    """
+    user = await _load_user(request)
+    quiz = await aget_object_or_404(Quiz, id=quiz_id)
+    attempt = attempt_tokens.issue(quiz, user)
+    context = {"quiz": quiz, "attempt_token": attempt.sign()}
+    if quiz.pool_size:
+        questions = await adraw_questions(quiz, attempt.seed)
+        context["questions_html"] = render_questions(questions)
+    elif quiz.question_count > settings.QUIZ_PROGRESSIVE_PLAY_THRESHOLD:
+        page = await aget_question_page(quiz.id, quiz.content_version)
+        context["questions_html"] = render_questions(page.expanded())
+        context["next_page"] = page.next_cursor
+        context["multi_select_types"] = " ".join(Question.MULTI_SELECT_TYPES)
+    else:
+        context["questions_html"] = await aquestions_fragment(quiz)
+    return render(request, "play_quiz.html", context)
+
+
+async def check_answer(request, question_id):
+    """
+    Verifies if the selected answer for a question is correct.
+    Parameters:
+        request: The HTTP request object with the selected answer id in "answer".
+        question_id: The ID of the question being answered.
+    Returns:
+        JsonResponse: A JSON response indicating whether the answer is correct.
+    Raises:
+        Http404: If the question does not exist or the answer does not belong to it.
+    """
+    answer_key = (await answer_keys.afor_questions([question_id])).get(question_id)
+    is_correct = None
+    if answer_key is not None:
+        is_correct = answer_key.check(question_id, request.POST.get("answer"))
+    if is_correct is None:
+        raise Http404("No such answer for this question.")
+    return JsonResponse({"correct": is_correct})
+
+
+@login_required
+async def submit_quiz(request, quiz_id):
+    """
+    Processes user-submitted answers, calculates the score, and saves the quiz attempt.
+    Parameters:
+        request: The HTTP request object.
+        quiz_id: The ID of the quiz being submitted.
+    Returns:
+        HttpResponseRedirect: Redirects to the quiz results page, or to the attempt history
+        if the attempt is still queued by the write-behind buffer.
+    """
+    user = await _load_user(request)
+    quiz = await aget_object_or_404(Quiz, id=quiz_id)
+
+    try:
+        attempt = await attempt_tokens.aredeem(quiz, user, request.POST.get("attempt"))
+        question_ids = None
+        if attempt.pool_size:
+            question_ids = await adrawn_question_ids(attempt, quiz)
+    except ValidationError as error:
+        return JsonResponse({"errors": {"__all__": error.messages}}, status=400)
+
+    try:
+        answer_key = await answer_keys.aget(quiz.id, quiz.content_version)
+        # Points-aware grading in one pass over the compiled key, without queries
+        score, responses = answer_key.score(request.POST, question_ids)
+
+        # The attempt and its responses are written in one transaction on a worker thread
+        saved = await sync_to_async(record_attempt)(
+            user,
+            quiz,
+            responses,
+            score=score,
+            time_taken=attempt.time_taken(),
+            wait=True,
+        )
+    except AttemptWriteFailed:
+        # Nothing was saved, so the same token can be submitted again
+        await attempt_tokens.arelease(attempt)
+        return JsonResponse(
+            {"errors": {"__all__": ["Your attempt could not be saved, please try again."]}},
+            status=503,
+        )
+    except Exception:
+        await attempt_tokens.arelease(attempt)
+        raise
+    if saved.pk is None:
+        # Still queued, and written later: the history lists it once it is
+        return redirect(reverse("attempt_history") + "?pending=1")
+
+    return redirect("quiz_results", attempt_id=saved.pk)
+
+
+@login_required
+async def quiz_results(request, attempt_id):
+    """
+    Displays the results of one of the user's quiz attempts, with its per-question breakdown.
+    Parameters:
+        request: The HTTP request object.
+        attempt_id: The ID of the QuizAttempt.
+    Returns:
+        HttpResponse: Renders the 'quiz_results.html' template with the attempt, its cached
+        breakdown and the percentage of attempts that scored lower.
+    Raises:
+        Http404: If the attempt does not exist or belongs to another user.
+    """
+    user = await _load_user(request)
+    attempt = await aget_object_or_404(
+        QuizAttempt.objects.select_related("quiz"), id=attempt_id, user=user
+    )
+    context = {
+        "quiz": attempt.quiz,
+        "attempt": attempt,
+        "breakdown_html": await aresults_fragment(attempt),
+        "percentile": await apercentile_rank(attempt.quiz_id, attempt.score),
+    }
+    return render(request, "quiz_results.html", context)
@@ -0,0 +1,143 @@
+"""
+File: attempt_tokens.py
+
+Description: This file issues and redeems the attempt tokens that tell submit_quiz when an
+attempt started, without a database write when it starts. play_quiz issues a token, signed
+with django.core.signing, carrying the quiz id, the user id, the start time, the quiz's
+content version and pool size, the seed of its question draw (see pools.py) and a random
+nonce. The play form posts it back with the answers.
+
+submit_quiz redeems the token: the signature and the age of the token are checked, the quiz
+and user must be the ones it was issued for, and its nonce is then added to Django's cache
+with cache.add, which fails if the nonce is already there, so that every token is redeemed at
+most once. Nonces are kept for as long as tokens stay valid. If the attempt then cannot be
+saved, submit_quiz releases the nonce so that the same token can be submitted again. Replays
+are only detected across the processes that share the cache, so deployments with several
+workers need a shared CACHE_URL backend rather than the default per-process memory cache.
+
+Contents of this file:
+1. AttemptToken: The decoded content of a token.
+2. issue: Creates the token of a new attempt.
+3. redeem: Verifies a submitted token and marks it as used. aredeem is its async counterpart.
+4. release: Marks a redeemed token as unused again. arelease is its async counterpart.
+"""
+
+import secrets
+import time
+from dataclasses import astuple, dataclass
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+SALT = "quiz_app.attempt_tokens"
+
+
+def _max_age():
+    return getattr(settings, "QUIZ_ATTEMPT_TOKEN_MAX_AGE", 4 * 3600)
+
+
+@dataclass(frozen=True)
+class AttemptToken:
+    quiz_id: int
+    user_id: int
+    started_at: int  # Unix time, in seconds
+    version: int
+    pool_size: int | None
+    seed: int
+    nonce: str
+
+    def sign(self):
+        """
+        Returns the signed, URL-safe form of the token.
+        """
+        return signing.dumps(astuple(self), salt=SALT)
+
+    def time_taken(self):
+        """
+        Returns the number of seconds since the attempt started.
+        """
+        return max(int(time.time()) - self.started_at, 0)
+
+
+def issue(quiz, user):
+    """
+    Creates the token of a new attempt at a quiz.
+    Parameters:
+        quiz: The Quiz being played.
+        user: The user playing it.
+    Returns:
+        AttemptToken: The token, to be sent to the client with sign().
+    """
+    return AttemptToken(
+        quiz_id=quiz.id,
+        user_id=user.pk,
+        started_at=int(time.time()),
+        version=quiz.content_version,
+        pool_size=quiz.pool_size,
+        seed=secrets.randbits(64),
+        nonce=secrets.token_urlsafe(12),
+    )
+
+
+def _nonce_key(nonce):
+    return f"quiz_app:attempt_nonce:{nonce}"
+
+
+def _verify(quiz, user, value):
+    """
+    Decodes a signed token and checks that it was issued for this quiz and user.
+    """
+    try:
+        token = AttemptToken(*signing.loads(value or "", salt=SALT, max_age=_max_age()))
+    except signing.SignatureExpired:
+        raise ValidationError("This attempt has expired. Reload the quiz to start again.")
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ValidationError("Invalid or missing attempt token.")
+    if token.quiz_id != quiz.id or token.user_id != user.pk:
+        raise ValidationError("The attempt token was issued for another quiz or user.")
+    return token
+
+
+def redeem(quiz, user, value):
+    """
+    Verifies the token submitted with an attempt and marks it as used.
+    Parameters:
+        quiz: The Quiz being submitted.
+        user: The user submitting it.
+        value: The signed token, as posted by the play form.
+    Returns:
+        AttemptToken: The decoded token.
+    Raises:
+        ValidationError: If the token is missing, forged, expired, issued for another quiz
+        or user, or was already redeemed.
+    """
+    token = _verify(quiz, user, value)
+    if not cache.add(_nonce_key(token.nonce), token.quiz_id, _max_age()):
+        raise ValidationError("This attempt has already been submitted.")
+    return token
+
+
+async def aredeem(quiz, user, value):
+    """
+    Async version of redeem.
+    """
+    token = _verify(quiz, user, value)
+    if not await cache.aadd(_nonce_key(token.nonce), token.quiz_id, _max_age()):
+        raise ValidationError("This attempt has already been submitted.")
+    return token
+
+
+def release(token):
+    """
+    Marks a redeemed token as unused again, for an attempt that could not be saved.
+    """
+    cache.delete(_nonce_key(token.nonce))
+
+
+async def arelease(token):
+    """
+    Async version of release.
+    """
+    await cache.adelete(_nonce_key(token.nonce))
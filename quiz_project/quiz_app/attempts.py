@@ -0,0 +1,81 @@
+"""
+File: attempts.py
+
+Description: This file records graded quiz attempts. An attempt and the per-question
+responses it was graded from are written in one transaction: a single INSERT for the
+QuizAttempt and a bulk INSERT for its UserAnswer rows. Correctness comes from the answer key
+used for grading, so no Answer rows are fetched while saving.
+
+When the write-behind mode is enabled (see write_behind.py), record_attempt queues the
+attempt for a background batch writer instead of writing it on the request thread.
+
+Functions in this file:
+1. build_user_answers: Turns graded responses into unsaved UserAnswer objects.
+2. record_attempt: Saves an attempt together with its responses.
+"""
+
+from django.db import transaction
+
+from .models import QuizAttempt, UserAnswer
+from .write_behind import AttemptWriteFailed, get_buffer, write_behind_settings
+
+# Rows per INSERT statement, kept below SQLite's bound-parameter limit
+BATCH_SIZE = 500
+
+
+def build_user_answers(attempt, responses):
+    """
+    Builds unsaved UserAnswer objects for an attempt.
+    Parameters:
+        attempt: The QuizAttempt the responses belong to.
+        responses: (question_id, selected_answer_id, is_correct) tuples from AnswerKey.score.
+    Returns:
+        list: UserAnswer objects ready for bulk_create.
+    """
+    return [
+        UserAnswer(
+            quiz_attempt=attempt,
+            question_id=question_id,
+            selected_answer_id=answer_id,
+            is_correct=is_correct,
+        )
+        for question_id, answer_id, is_correct in responses
+    ]
+
+
+def record_attempt(user, quiz, responses, score, time_taken=0, wait=False):
+    """
+    Saves a graded attempt and its per-question responses in one transaction.
+    Parameters:
+        user: The user who took the quiz.
+        quiz: The quiz that was taken.
+        responses: (question_id, selected_answer_id, is_correct) tuples.
+        score: The score of the attempt.
+        time_taken: The time (in seconds) taken to complete the quiz.
+        wait: In write-behind mode, wait (up to WAIT_TIMEOUT seconds) for the batch holding
+            the attempt to be committed, for callers that need its pk.
+    Returns:
+        QuizAttempt: The saved attempt. In write-behind mode the attempt is only queued,
+        and its pk is set once the background writer has committed it (it stays None if
+        the attempt is still queued after WAIT_TIMEOUT seconds, and is written later).
+    Raises:
+        AttemptWriteFailed: In write-behind mode with wait, if the attempt could not be
+        written.
+    """
+    options = write_behind_settings()
+    if options["ENABLED"]:
+        attempt = QuizAttempt(user=user, quiz=quiz, score=score, time_taken=time_taken)
+        pending = get_buffer().submit(attempt, build_user_answers(attempt, responses))
+        if wait and pending.wait(options["WAIT_TIMEOUT"]) and pending.failed:
+            raise AttemptWriteFailed("The quiz attempt could not be saved.")
+        return attempt
+
+    with transaction.atomic():
+        attempt = QuizAttempt.objects.create(
+            user=user, quiz=quiz, score=score, time_taken=time_taken
+        )
+        # bulk_create bypasses UserAnswer.save(), which would fetch each selected answer
+        UserAnswer.objects.bulk_create(
+            build_user_answers(attempt, responses), batch_size=BATCH_SIZE
+        )
+    return attempt
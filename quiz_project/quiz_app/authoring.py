@@ -0,0 +1,198 @@
+"""
+File: authoring.py
+
+Description: This file implements the write pipeline used to author quizzes. Submitted data,
+either the create_quiz form or a JSON document, is first parsed into an in-memory quiz tree
+and then written in one atomic block with bulk inserts: one batch of questions, whose ids are
+returned by the database, followed by one batch of answers attached to those ids. If any
+insert fails the whole quiz is rolled back, so no orphan rows are left behind.
+
+Questions are single choice and worth one point unless the submission says otherwise; a
+points value of 0 is accepted for unscored questions.
+
+Contents of this file:
+1. QuestionDraft / AnswerDraft: The in-memory quiz tree.
+2. parse_form_questions: Builds the tree from "questions[i][answers][j][...]" POST keys.
+3. parse_json_questions: Builds the tree from a decoded JSON document.
+4. save_quiz: Writes a quiz and its tree inside a single transaction.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from .models import Answer, Question
+from .signals import quiz_content_changed
+
+# Rows per INSERT statement, kept below SQLite's bound-parameter limit
+BATCH_SIZE = 500
+
+# Matches "questions[0][text]" and "questions[0][answers][1][is_correct]"
+FORM_KEY_RE = re.compile(
+    r"^questions\[(\d+)\](?:\[answers\]\[(\d+)\])?\[(\w+)\]$"
+)
+
+
+@dataclass
+class AnswerDraft:
+    text: str
+    is_correct: bool = False
+
+
+@dataclass
+class QuestionDraft:
+    text: str
+    question_type: str = Question.SINGLE_CHOICE
+    points: int = 1
+    answers: list = field(default_factory=list)
+
+
+def _parse_points(value):
+    try:
+        points = int(value)
+    except (TypeError, ValueError):
+        points = -1
+    if points < 0:
+        raise ValidationError(f"Invalid points value: {value!r}")
+    return points
+
+
+def _parse_question_type(value):
+    question_type = str(value or Question.SINGLE_CHOICE)
+    if question_type not in Question.QUESTION_TYPES:
+        raise ValidationError(
+            f"Invalid question type {question_type!r}, expected one of "
+            f"{', '.join(Question.QUESTION_TYPES)}."
+        )
+    return question_type
+
+
+def parse_form_questions(data):
+    """
+    Parses the create_quiz POST data into a list of QuestionDraft objects in one pass.
+    Parameters:
+        data: The QueryDict (or mapping) holding the submitted form.
+    Returns:
+        list: QuestionDraft objects ordered by their form index.
+    """
+    questions = {}
+    answers = {}
+    for key in data.keys():
+        match = FORM_KEY_RE.match(key)
+        if match is None:
+            continue
+        question_index, answer_index, name = match.groups()
+        if answer_index is None:
+            questions.setdefault(int(question_index), {})[name] = data.get(key)
+        else:
+            answer = answers.setdefault(int(question_index), {}).setdefault(
+                int(answer_index), {}
+            )
+            answer[name] = data.get(key)
+
+    drafts = []
+    for question_index in sorted(questions):
+        fields = questions[question_index]
+        if "text" not in fields:
+            continue
+        draft = QuestionDraft(
+            text=fields["text"],
+            question_type=_parse_question_type(fields.get("question_type")),
+            points=_parse_points(fields.get("points") or 1),
+        )
+        for answer_index, answer in sorted(answers.get(question_index, {}).items()):
+            if "text" in answer:
+                draft.answers.append(
+                    AnswerDraft(
+                        text=answer["text"],
+                        is_correct=answer.get("is_correct", "off") == "on",
+                    )
+                )
+        drafts.append(draft)
+    return drafts
+
+
+def parse_json_questions(questions):
+    """
+    Parses the "questions" list of a JSON authoring document into QuestionDraft objects.
+    Parameters:
+        questions: A list of dicts with text, question_type, points and answers keys.
+    Returns:
+        list: QuestionDraft objects in document order.
+    Raises:
+        ValidationError: If the document is malformed, such as an 'is_correct' value that is
+        not a JSON boolean.
+    """
+    if not isinstance(questions, list):
+        raise ValidationError("'questions' must be a list.")
+
+    drafts = []
+    for question in questions:
+        if not isinstance(question, dict) or not question.get("text"):
+            raise ValidationError("Every question needs a 'text' value.")
+        answers = question.get("answers", [])
+        if not isinstance(answers, list):
+            raise ValidationError("'answers' must be a list.")
+        draft = QuestionDraft(
+            text=str(question["text"]),
+            question_type=_parse_question_type(question.get("question_type")),
+            points=_parse_points(question.get("points", 1)),
+        )
+        for answer in answers:
+            if not isinstance(answer, dict) or not answer.get("text"):
+                raise ValidationError("Every answer needs a 'text' value.")
+            is_correct = answer.get("is_correct", False)
+            # A string such as "false" would otherwise count as correct
+            if not isinstance(is_correct, bool):
+                raise ValidationError("'is_correct' must be true or false.")
+            draft.answers.append(AnswerDraft(text=str(answer["text"]), is_correct=is_correct))
+        drafts.append(draft)
+    return drafts
+
+
+def save_quiz(quiz, drafts):
+    """
+    Saves a quiz together with its questions and answers in a single transaction.
+    Parameters:
+        quiz: An unsaved Quiz instance with its owner set.
+        drafts: The QuestionDraft list returned by one of the parsers.
+    Returns:
+        Quiz: The saved quiz.
+    """
+    with transaction.atomic():
+        # bulk_create skips the signals that maintain the counters, and the quiz is new
+        quiz.question_count = len(drafts)
+        quiz.total_points = sum(draft.points for draft in drafts)
+        quiz.save()
+        questions = Question.objects.bulk_create(
+            [
+                Question(
+                    quiz=quiz,
+                    text=draft.text,
+                    question_type=draft.question_type,
+                    points=draft.points,
+                )
+                for draft in drafts
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # The quiz is brand new, so its questions in id order are the ones just inserted
+            ids = quiz.questions.order_by("id").values_list("id", flat=True)
+            for question, question_id in zip(questions, ids):
+                question.pk = question_id
+
+        Answer.objects.bulk_create(
+            [
+                Answer(question=question, text=answer.text, is_correct=answer.is_correct)
+                for question, draft in zip(questions, drafts)
+                for answer in draft.answers
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        # bulk_create sends no signals, so refresh the quiz's caches and search row here
+        quiz_content_changed(quiz.id)
+    return quiz
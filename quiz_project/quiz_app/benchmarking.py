@@ -0,0 +1,292 @@
+"""
+File: benchmarking.py
+
+Description: This file contains the helpers shared by the benchmark management commands:
+latency summaries, a minimal cookie-aware HTTP session for driving a live server, a context
+manager that starts and stops a server process, and a runner that executes simulated players
+on a thread pool.
+
+Contents of this file:
+1. summarize: Reduces request latencies to throughput and p50/p95/p99 figures.
+2. HttpSession: Keep-alive HTTP connection that tracks cookies and the CSRF token.
+   ClientSession offers the same interface on top of Django's in-process test client.
+3. running_server: Starts a server command and waits until it accepts connections.
+4. run_players: Runs a player function concurrently and summarizes the timings.
+5. create_session: Creates a logged-in session for a user, for use as a cookie.
+6. benchmark_quiz: Returns a quiz with questions to play, creating one if needed.
+7. count_queries: Counts the queries a callable runs on every database connection.
+"""
+
+import http.client
+import os
+import re
+import socket
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .authoring import AnswerDraft, QuestionDraft, save_quiz
+from .models import Quiz
+
+CSRF_INPUT_RE = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def percentile(sorted_samples, fraction):
+    """
+    Returns the value at the given fraction (0-1) of an ascending list of samples.
+    """
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, round(fraction * (len(sorted_samples) - 1)))
+    return sorted_samples[index]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def summarize(latencies, elapsed, errors=0):
+    """
+    Summarizes request latencies (in seconds) measured over a wall-clock period.
+    Returns:
+        dict: Request and error counts, requests per second and latency percentiles in ms.
+    """
+    samples = sorted(latencies)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(samples) / elapsed, 1) if elapsed else None,
+        "mean_ms": _ms(sum(samples) / len(samples)) if samples else None,
+        "p50_ms": _ms(percentile(samples, 0.50)),
+        "p95_ms": _ms(percentile(samples, 0.95)),
+        "p99_ms": _ms(percentile(samples, 0.99)),
+    }
+
+
+class HttpSession:
+    """
+    A keep-alive HTTP/1.1 connection to a live server that behaves like a browser tab:
+    it stores cookies and sends the CSRF token with POST requests.
+    """
+
+    def __init__(self, host, port, cookies=None):
+        self.host = host
+        self.port = port
+        self.cookies = dict(cookies or {})
+        self.csrf_token = None
+        self.location = None  # Location header of the last redirect
+        self.latencies = []
+        self.errors = 0
+        self._connection = http.client.HTTPConnection(host, port, timeout=60)
+
+    def request(self, method, path, data=None):
+        """
+        Sends a request and returns (status, body). The latency is recorded.
+        """
+        headers = {"Host": f"{self.host}:{self.port}"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        body = None
+        if method == "POST":
+            data = dict(data or {})
+            if self.csrf_token:
+                data.setdefault("csrfmiddlewaretoken", self.csrf_token)
+            body = urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        started = time.perf_counter()
+        try:
+            self._connection.request(method, path, body=body, headers=headers)
+            response = self._connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.errors += 1
+            self._connection.close()
+            return None, b""
+        self.latencies.append(time.perf_counter() - started)
+
+        self.location = response.headers.get("Location")
+        for header in response.headers.get_all("Set-Cookie") or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        match = CSRF_INPUT_RE.search(content)
+        if match:
+            self.csrf_token = match.group(1).decode()
+        if response.status >= 500:
+            self.errors += 1
+        return response.status, content
+
+    def get(self, path):
+        return self.request("GET", path)
+
+    def post(self, path, data=None):
+        return self.request("POST", path, data)
+
+    def close(self):
+        self._connection.close()
+
+
+class ClientSession:
+    """
+    The HttpSession interface on top of Django's test client, for benchmarking the views
+    in-process without a server. Responses are counted as errors instead of raising.
+    """
+
+    def __init__(self, user=None):
+        self.client = Client(raise_request_exception=False)
+        if user is not None:
+            self.client.force_login(user)
+        self.location = None
+        self.latencies = []
+        self.errors = 0
+
+    def request(self, method, path, data=None):
+        started = time.perf_counter()
+        if method == "POST":
+            response = self.client.post(path, data or {})
+        else:
+            response = self.client.get(path)
+        self.latencies.append(time.perf_counter() - started)
+        self.location = response.headers.get("Location")
+        if response.status_code >= 500:
+            self.errors += 1
+        return response.status_code, response.content
+
+    def get(self, path):
+        return self.request("GET", path)
+
+    def post(self, path, data=None):
+        return self.request("POST", path, data)
+
+    def close(self):
+        # Each player runs on its own thread, which holds its own database connections
+        connections.close_all()
+
+
+def _wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+@contextmanager
+def running_server(argv, host, port, env=None, cwd=None, timeout=30):
+    """
+    Starts a server process and stops it when the block exits.
+    Parameters:
+        argv: The command line of the server.
+        host, port: The address the server listens on.
+        env: Extra environment variables for the server process.
+        cwd: The working directory of the server process.
+        timeout: Seconds to wait for the server to accept connections.
+    """
+    process = subprocess.Popen(
+        argv,
+        cwd=cwd,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not _wait_for_port(host, port, timeout):
+            raise RuntimeError(f"Server {' '.join(argv)} did not start on port {port}.")
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_players(player, concurrency, players):
+    """
+    Runs simulated players on a thread pool and summarizes their requests.
+    Parameters:
+        player: A callable taking the player number and returning an HttpSession-like
+            object with "latencies" and "errors" attributes once it has finished.
+        concurrency: The number of players running at the same time.
+        players: The total number of players to run.
+    Returns:
+        dict: The summary returned by summarize, plus the concurrency level.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        sessions = list(executor.map(player, range(players)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for session in sessions for latency in session.latencies]
+    errors = sum(session.errors for session in sessions)
+    return dict(summarize(latencies, elapsed, errors), concurrency=concurrency)
+
+
+def create_session(user):
+    """
+    Creates a database-backed session in which the given user is logged in.
+    Returns:
+        str: The session key, to be sent as the session cookie.
+    """
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.save()
+    return store.session_key
+
+
+def benchmark_quiz():
+    """
+    Returns the first quiz that has questions, creating a 20-question quiz if there is none.
+    """
+    quiz = Quiz.objects.filter(questions__isnull=False).order_by("id").first()
+    if quiz is not None:
+        return quiz
+    owner, _ = User.objects.get_or_create(username="bench-author")
+    drafts = [
+        QuestionDraft(
+            text=f"Benchmark question {i + 1}",
+            points=1,
+            answers=[AnswerDraft(f"Answer {j + 1}", is_correct=j == 0) for j in range(4)],
+        )
+        for i in range(20)
+    ]
+    return save_quiz(
+        Quiz(
+            title="Benchmark quiz",
+            description="Created for benchmarking.",
+            category="Benchmark",
+            difficulty="Medium",
+            owner=owner,
+        ),
+        drafts,
+    )
+
+
+def count_queries(function):
+    """
+    Calls a function and returns the number of queries it ran on all database connections.
+    """
+    with ExitStack() as stack:
+        contexts = [
+            stack.enter_context(CaptureQueriesContext(connection))
+            for connection in connections.all()
+        ]
+        function()
+    return sum(len(context) for context in contexts)
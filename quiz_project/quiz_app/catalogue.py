@@ -0,0 +1,104 @@
+"""
+File: catalogue.py
+
+Description: This file builds the filterable quiz catalogue shown on the home page. It pages
+through quizzes with keyset pagination and keeps the per-category and per-difficulty facet
+counts in Django's cache. signals.py drops the cached counts whenever a quiz is saved or
+deleted.
+
+Functions in this file:
+1. catalogue_page: Returns one page of quizzes matching the category/difficulty filters.
+2. facet_counts: Returns the number of quizzes per category and per difficulty.
+3. invalidate_facet_counts: Drops the cached facet counts.
+The "a"-prefixed functions are the async counterparts used by async_views.py.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+
+from .models import Quiz
+from .pagination import akeyset_paginate, keyset_paginate
+
+FACET_CACHE_KEY = "quiz_app:catalogue:facets"
+
+
+def _filtered_quizzes(category, difficulty):
+    quizzes = Quiz.objects.all()
+    if category:
+        quizzes = quizzes.filter(category=category)
+    if difficulty:
+        quizzes = quizzes.filter(difficulty=difficulty)
+    return quizzes
+
+
+def _page_size():
+    return getattr(settings, "QUIZ_CATALOGUE_PAGE_SIZE", 20)
+
+
+def _facet_querysets():
+    # Counted on the primary: a lagging replica would stay cached until the next change
+    return {
+        name: Quiz.objects.using(DEFAULT_DB_ALIAS)
+        .values_list(name)
+        .annotate(count=Count("id"))
+        .order_by(name)
+        for name in ("category", "difficulty")
+    }
+
+
+def _facet_timeout():
+    return getattr(settings, "QUIZ_FACET_CACHE_TIMEOUT", 300)
+
+
+def catalogue_page(category=None, difficulty=None, cursor=None):
+    """
+    Returns one page of the quiz catalogue, newest quizzes first.
+    Parameters:
+        category: Only include quizzes of this category, if given.
+        difficulty: Only include quizzes of this difficulty, if given.
+        cursor: The cursor of the page to show, or None for the first page.
+    Returns:
+        KeysetPage: The quizzes on the page and the cursor of the next page.
+    """
+    return keyset_paginate(_filtered_quizzes(category, difficulty), cursor, _page_size())
+
+
+async def acatalogue_page(category=None, difficulty=None, cursor=None):
+    """
+    Async version of catalogue_page.
+    """
+    return await akeyset_paginate(
+        _filtered_quizzes(category, difficulty), cursor, _page_size()
+    )
+
+
+def facet_counts():
+    """
+    Returns the quiz counts per category and per difficulty, cached between changes.
+    Returns:
+        dict: {"category": [(value, count), ...], "difficulty": [(value, count), ...]}
+    """
+    facets = cache.get(FACET_CACHE_KEY)
+    if facets is None:
+        facets = {name: list(qs) for name, qs in _facet_querysets().items()}
+        cache.set(FACET_CACHE_KEY, facets, _facet_timeout())
+    return facets
+
+
+async def afacet_counts():
+    """
+    Async version of facet_counts.
+    """
+    facets = await cache.aget(FACET_CACHE_KEY)
+    if facets is None:
+        facets = {
+            name: [row async for row in qs] for name, qs in _facet_querysets().items()
+        }
+        await cache.aset(FACET_CACHE_KEY, facets, _facet_timeout())
+    return facets
+
+
+def invalidate_facet_counts():
+    cache.delete(FACET_CACHE_KEY)
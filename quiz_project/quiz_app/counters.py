@@ -0,0 +1,149 @@
+"""
+File: counters.py
+
+Description: This file maintains the denormalized counters stored on each Quiz:
+question_count, total_points, attempt_count and score_sum. They let the catalogue show
+"12 questions · 1,403 plays · avg 7.2" and submit_quiz know the number of questions without
+an aggregate query per quiz.
+
+Counters are only ever changed with F() expressions in UPDATE statements, so concurrent
+writers never lose an increment. Quiz.save() leaves them out of its UPDATE for the same
+reason. signals.py calls these functions for single-row saves and deletes and for recorded
+attempts; code that bulk-creates questions must update the counters itself, like
+authoring.save_quiz does.
+
+The update only commits together with the rows it counts when the writer has opened a
+transaction, as authoring.save_quiz, attempts.record_attempt, the write-behind flush and the
+admin do. A plain save() or delete() under autocommit commits the row first and the counter
+update separately, so a failure in between leaves the counter off until reconcile (the
+reconcile_quiz_counters command) repairs it.
+
+Functions in this file:
+1. add_questions: Adds inserted (or, negated, deleted) questions to a quiz's counters.
+2. refresh_question_counters: Recomputes question_count and total_points of a quiz with a
+   subquery, for changes that cannot be applied as a delta (such as new points values).
+3. record_attempts / forget_attempt: Add new attempts to, or remove a deleted attempt from,
+   the attempt counters of their quizzes.
+4. reconcile: Recomputes every counter in bulk and reports the quizzes that had drifted.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Question, Quiz, QuizAttempt
+
+COUNTER_FIELDS = Quiz.COUNTER_FIELDS
+
+# Ids per "IN (...)" lookup, below SQLite's bound parameter limit
+IN_BATCH = 900
+
+
+def add_questions(quiz_id, count, points):
+    """
+    Adds count questions worth points in total to a quiz's counters (both may be negative).
+    """
+    Quiz.objects.filter(pk=quiz_id).update(
+        question_count=F("question_count") + count, total_points=F("total_points") + points
+    )
+
+
+def _aggregate(model, function, value="pk"):
+    """
+    Returns a subquery computing function(value) over the rows of model for each quiz.
+    """
+    return Coalesce(
+        Subquery(
+            model.objects.filter(quiz_id=OuterRef("pk"))
+            .order_by()
+            .values("quiz_id")
+            .annotate(total=function(value))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def _actual_values():
+    """
+    Returns the expressions computing each counter from the underlying tables.
+    """
+    return {
+        "question_count": _aggregate(Question, Count),
+        "total_points": _aggregate(Question, Sum, "points"),
+        "attempt_count": _aggregate(QuizAttempt, Count),
+        "score_sum": _aggregate(QuizAttempt, Sum, "score"),
+    }
+
+
+def refresh_question_counters(quiz_id):
+    """
+    Recomputes the question count and total points of a quiz from its questions.
+    """
+    actual = _actual_values()
+    Quiz.objects.filter(pk=quiz_id).update(
+        question_count=actual["question_count"], total_points=actual["total_points"]
+    )
+
+
+def record_attempts(attempts):
+    """
+    Adds newly saved attempts to the attempt counters of their quizzes.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for attempt in attempts:
+        totals[attempt.quiz_id][0] += 1
+        totals[attempt.quiz_id][1] += attempt.score
+    for quiz_id, (count, score_sum) in totals.items():
+        Quiz.objects.filter(pk=quiz_id).update(
+            attempt_count=F("attempt_count") + count, score_sum=F("score_sum") + score_sum
+        )
+
+
+def forget_attempt(attempt):
+    """
+    Removes a deleted attempt from the attempt counters of its quiz.
+    """
+    Quiz.objects.filter(pk=attempt.quiz_id).update(
+        attempt_count=F("attempt_count") - 1, score_sum=F("score_sum") - attempt.score
+    )
+
+
+def reconcile(fix=True):
+    """
+    Compares every quiz counter with the value computed from the question and attempt
+    tables, and overwrites the ones that drifted.
+    Parameters:
+        fix: Set to False to only report the drift.
+    Returns:
+        list: (quiz id, counter, stored value, actual value) for every drifted counter.
+    """
+    actual = _actual_values()
+    drifted = Q()
+    for field in COUNTER_FIELDS:
+        drifted |= ~Q(**{field: F(f"actual_{field}")})
+    annotations = {f"actual_{field}": actual[field] for field in COUNTER_FIELDS}
+
+    with transaction.atomic():
+        rows = (
+            Quiz.objects.annotate(**annotations)
+            .filter(drifted)
+            .order_by("id")
+            .values_list("id", *COUNTER_FIELDS, *annotations)
+        )
+        report = []
+        for quiz_id, *values in rows:
+            stored, computed = values[: len(COUNTER_FIELDS)], values[len(COUNTER_FIELDS) :]
+            report.extend(
+                (quiz_id, field, old, new)
+                for field, old, new in zip(COUNTER_FIELDS, stored, computed)
+                if old != new
+            )
+        if fix:
+            quiz_ids = sorted({quiz_id for quiz_id, *_ in report})
+            for start in range(0, len(quiz_ids), IN_BATCH):
+                Quiz.objects.filter(pk__in=quiz_ids[start : start + IN_BATCH]).update(**actual)
+    return report
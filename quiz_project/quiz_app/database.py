@@ -0,0 +1,52 @@
+"""
+File: database.py
+
+Description: This file applies the SQLite connection profile from the SQLITE_PRAGMAS setting.
+Django opens SQLite connections with the library defaults (rollback journal, full fsync on
+every commit, a small page cache). The connection_created receiver below runs the configured
+PRAGMAs on every new connection instead, so WAL journaling, the busy timeout, memory-mapped
+I/O and the cache size are in effect for web workers, management commands and tests alike.
+
+Other database backends are left untouched.
+
+Functions in this file:
+1. sqlite_pragmas: Returns the PRAGMA statements to run on a new SQLite connection.
+2. configure_connection: connection_created receiver that runs those statements.
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# PRAGMAs that take a keyword rather than a number
+KEYWORD_PRAGMAS = {"journal_mode", "synchronous", "temp_store"}
+
+
+def sqlite_pragmas():
+    """
+    Returns the PRAGMA statements for the SQLITE_PRAGMAS setting, in order.
+    Raises:
+        ValueError: If a value is not a plain keyword or integer.
+    """
+    statements = []
+    for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+        if value is None:
+            continue
+        value = str(value)
+        valid = value.isalpha() if name in KEYWORD_PRAGMAS else value.lstrip("-").isdigit()
+        if not (name.isidentifier() and valid):
+            raise ValueError(f"Invalid SQLite PRAGMA {name}={value!r}.")
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    """
+    Applies the configured PRAGMAs to a newly opened SQLite connection.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in sqlite_pragmas():
+            cursor.execute(statement)
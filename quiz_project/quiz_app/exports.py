@@ -0,0 +1,197 @@
+"""
+File: exports.py
+
+Description: This file streams the attempts at quizzes, with every per-question response, as
+CSV or JSON Lines. Attempts are read with .iterator(chunk_size=...) in id order, their user
+and quiz joined with select_related and their responses prefetched one chunk at a time, and
+every attempt is encoded and handed on as soon as it is read. Memory use therefore depends
+on the chunk size, never on the number of rows exported. The export_attempts view wraps the
+stream in a StreamingHttpResponse, and the export_attempts command writes it to a file.
+
+In CSV, each response is one row repeating the attempt columns (an attempt without responses
+is one row with empty response columns). In JSON Lines, each attempt is one object with a
+"responses" list.
+
+Functions in this file:
+1. parse_export_filters: Validates the quiz, date range and format filters of an export.
+2. attempts_for_export: Returns the attempts matching the filters, ready to be streamed.
+3. stream_export: Yields the encoded export of some attempts, chunk by chunk.
+"""
+
+import csv
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import QuizAttempt, UserAnswer
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+ATTEMPT_COLUMNS = [
+    "attempt_id",
+    "quiz_id",
+    "quiz_title",
+    "user_id",
+    "username",
+    "score",
+    "time_taken",
+    "completed_at",
+]
+RESPONSE_COLUMNS = [
+    "question_id",
+    "question_text",
+    "selected_answer_id",
+    "selected_answer_text",
+    "is_correct",
+]
+
+
+def _parse_moment(value, end=False):
+    """
+    Parses an ISO date or datetime. A date stands for the start of that day. When the value
+    ends a range, the result is the first moment after it (the start of the next day, or one
+    microsecond later) so that it can be used as an exclusive bound of an inclusive range.
+    """
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            day += datetime.timedelta(days=1)
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError
+        if end:
+            moment += datetime.timedelta(microseconds=1)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_export_filters(quiz_ids=None, since=None, until=None, export_format=None):
+    """
+    Validates the filters of an export, given as strings.
+    Parameters:
+        quiz_ids: A list of quiz ids, or None for every quiz.
+        since, until: ISO dates or datetimes bounding the completion time (both inclusive).
+        export_format: "csv" (the default) or "jsonl".
+    Returns:
+        dict: The keyword arguments of attempts_for_export (until becomes the first moment
+        after the range, an exclusive bound), plus the export format.
+    Raises:
+        ValidationError: If a value is invalid.
+    """
+    try:
+        quiz_ids = [int(quiz_id) for quiz_id in quiz_ids] if quiz_ids else None
+    except ValueError:
+        raise ValidationError("'quiz' must be a quiz id.")
+
+    bounds = {}
+    for name, value, end in (("since", since, False), ("until", until, True)):
+        try:
+            bounds[name] = _parse_moment(value, end) if value else None
+        except ValueError:
+            raise ValidationError(f"'{name}' must be an ISO date or datetime.")
+
+    export_format = export_format or "csv"
+    if export_format not in FORMATS:
+        raise ValidationError(f"'format' must be one of {', '.join(FORMATS)}.")
+    return dict(quiz_ids=quiz_ids, export_format=export_format, **bounds)
+
+
+def attempts_for_export(quiz_ids=None, since=None, until=None, owner=None):
+    """
+    Returns the attempts to export, oldest first, with their user, quiz and responses.
+    Parameters:
+        quiz_ids: Only export attempts at these quizzes, if given.
+        since: Only export attempts completed at or after this datetime, if given.
+        until: Only export attempts completed before this datetime, if given.
+        owner: Only export attempts at quizzes owned by this user, if given.
+    """
+    attempts = QuizAttempt.objects.select_related("user", "quiz")
+    if quiz_ids is not None:
+        attempts = attempts.filter(quiz_id__in=quiz_ids)
+    if owner is not None:
+        attempts = attempts.filter(quiz__owner=owner)
+    if since is not None:
+        attempts = attempts.filter(completed_at__gte=since)
+    if until is not None:
+        attempts = attempts.filter(completed_at__lt=until)
+    responses = UserAnswer.objects.select_related("question", "selected_answer").order_by("id")
+    return attempts.prefetch_related(Prefetch("user_answers", queryset=responses)).order_by(
+        "id"
+    )
+
+
+def _attempt_values(attempt):
+    return [
+        attempt.id,
+        attempt.quiz_id,
+        attempt.quiz.title,
+        attempt.user_id,
+        attempt.user.username,
+        attempt.score,
+        attempt.time_taken,
+        attempt.completed_at.isoformat(),
+    ]
+
+
+def _response_values(response):
+    selected = response.selected_answer
+    return [
+        response.question_id,
+        response.question.text,
+        response.selected_answer_id,
+        selected.text if selected is not None else None,
+        response.is_correct,
+    ]
+
+
+class _Line:
+    """
+    File-like object whose write() returns what it was given, for csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(attempts):
+    writer = csv.writer(_Line())
+    yield writer.writerow(ATTEMPT_COLUMNS + RESPONSE_COLUMNS)
+    blank = [None] * len(RESPONSE_COLUMNS)
+    for attempt in attempts:
+        values = _attempt_values(attempt)
+        rows = [values + _response_values(r) for r in attempt.user_answers.all()]
+        yield "".join(writer.writerow(row) for row in rows or [values + blank])
+
+
+def _jsonl_chunks(attempts):
+    for attempt in attempts:
+        document = dict(zip(ATTEMPT_COLUMNS, _attempt_values(attempt)))
+        document["responses"] = [
+            dict(zip(RESPONSE_COLUMNS, _response_values(response)))
+            for response in attempt.user_answers.all()
+        ]
+        yield json.dumps(document, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def stream_export(attempts, export_format="csv", chunk_size=500):
+    """
+    Yields the export of some attempts as strings, one attempt at a time.
+    Parameters:
+        attempts: The queryset returned by attempts_for_export.
+        export_format: "csv" or "jsonl".
+        chunk_size: The number of attempts fetched from the database at a time.
+    """
+    rows = attempts.iterator(chunk_size=chunk_size)
+    if export_format == "jsonl":
+        return _jsonl_chunks(rows)
+    return _csv_chunks(rows)
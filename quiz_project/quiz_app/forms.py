@@ -72,11 +72,12 @@ class QuizForm(forms.ModelForm):
         - description: A brief description of the quiz.
         - category: The category to which the quiz belongs (e.g., Science, Math).
         - difficulty: The difficulty level of the quiz (e.g., Easy, Medium, Hard).
+        - pool_size: The number of questions drawn at random for each attempt (optional).
     """
 
     class Meta:
         model = Quiz
-        fields = ["title", "description", "category", "difficulty"]
+        fields = ["title", "description", "category", "difficulty", "pool_size"]
 
 
 # Form for Question model
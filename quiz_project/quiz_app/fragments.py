@@ -0,0 +1,78 @@
+"""
+File: fragments.py
+
+Description: This file caches the rendered question/answer block of the play_quiz page.
+The block is rendered from the quiz's content snapshot (see snapshots.py), so a cache miss
+needs no ORM objects, and it is cached under a key that includes the quiz's content_version.
+Changing any question or answer bumps the version, so the next request renders a fresh
+block while the stale one simply expires.
+
+Functions in this file:
+1. questions_fragment: Returns the rendered question block of a quiz, using the cache.
+   aquestions_fragment is its async counterpart.
+2. render_questions: Renders a list of questions without caching them.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .models import Question
+from .snapshots import aget_snapshot, get_snapshot
+
+
+def _fragment_key(quiz_id, version):
+    return f"quiz_app:play_quiz:{quiz_id}:{version}"
+
+
+def _fragment_timeout():
+    return getattr(settings, "QUIZ_FRAGMENT_CACHE_TIMEOUT", 86400)
+
+
+def render_questions(questions):
+    """
+    Renders a list of questions shaped like the "questions" of a content snapshot, such as
+    the questions drawn for an attempt at a pooled quiz (see pools.py), which are not cached.
+    """
+    return render_to_string(
+        "_quiz_questions.html",
+        {"questions": questions, "multi_select_types": Question.MULTI_SELECT_TYPES},
+    )
+
+
+def _render(snapshot):
+    if snapshot is None:
+        # The quiz was deleted after the caller loaded it
+        return None, ""
+    html = render_questions(snapshot.data["questions"])
+    # Stored under the snapshot's version, which is newer than the caller's if the
+    # quiz changed after it was loaded
+    return _fragment_key(snapshot.quiz_id, snapshot.version), html
+
+
+def questions_fragment(quiz):
+    """
+    Returns the rendered questions and answers of a quiz for the play_quiz page.
+    Parameters:
+        quiz: The Quiz being played.
+    Returns:
+        str: The HTML of the question block, served from the cache when possible.
+    """
+    html = cache.get(_fragment_key(quiz.id, quiz.content_version))
+    if html is None:
+        key, html = _render(get_snapshot(quiz.id, quiz.content_version))
+        if key is not None:
+            cache.set(key, html, _fragment_timeout())
+    return html
+
+
+async def aquestions_fragment(quiz):
+    """
+    Async version of questions_fragment.
+    """
+    html = await cache.aget(_fragment_key(quiz.id, quiz.content_version))
+    if html is None:
+        key, html = _render(await aget_snapshot(quiz.id, quiz.content_version))
+        if key is not None:
+            await cache.aset(key, html, _fragment_timeout())
+    return html
@@ -0,0 +1,254 @@
+"""
+File: history.py
+
+Description: This file backs the attempt history dashboard of a player. The attempts are
+listed newest first with keyset pagination (see pagination.py) over the
+(user, completed_at, id) index of QuizAttempt, with their quiz loaded by select_related, so
+every page costs one query however long the history is.
+
+The rollups shown above the list are kept in two summary tables, updated whenever attempts
+are recorded (see the attempts_recorded signal in signals.py) rather than aggregated from the
+attempts table on every view: PlayerQuizStats holds the attempts, best score and last play
+of a player at each quiz, and PlayerStats holds their daily streaks. Days are counted in
+TIME_ZONE. Like the quiz counters (see counters.py), rows are changed with F() expressions in
+UPDATE statements, so concurrent writers never lose an update.
+
+Deleting an attempt recomputes the rollups of its player from their remaining attempts.
+Attempts deleted with their quiz only take the quiz's rows with them: the days they were
+played still count towards the streaks.
+
+Functions in this file:
+1. record_attempts: Adds new attempts to the rollups of their players.
+2. forget_attempt: Recomputes the rollups of the player of a deleted attempt.
+3. attempt_history: Returns one page of the attempts of a player, newest first.
+4. player_summary: Returns the rollups of a player: totals, streaks and best scores.
+5. rebuild_all: Recomputes every rollup from the attempts table.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, Sum, Value, When
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import PlayerQuizStats, PlayerStats, QuizAttempt
+from .pagination import keyset_paginate
+
+
+def _page_size():
+    return getattr(settings, "QUIZ_HISTORY_PAGE_SIZE", 20)
+
+
+def _best_scores_shown():
+    return getattr(settings, "QUIZ_HISTORY_BEST_SCORES", 10)
+
+
+def _upsert(model, filters, update, create):
+    """
+    Applies update to the row matching filters, or creates it with create if there is none.
+    """
+    if model.objects.filter(**filters).update(**update):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**filters, **create)
+    except IntegrityError:
+        # Another writer created the row first
+        model.objects.filter(**filters).update(**update)
+
+
+def _streak_after(day):
+    """
+    Returns the new current streak of a player who played on day, as an expression of the
+    stored row. Days older than the last one played (late writes) leave it unchanged.
+    """
+    return Case(
+        When(last_played_on__gte=day, then=F("current_streak")),
+        When(last_played_on=day - timedelta(days=1), then=F("current_streak") + 1),
+        default=Value(1),
+    )
+
+
+def _record_day(user_id, day):
+    streak = _streak_after(day)
+    _upsert(
+        PlayerStats,
+        {"user_id": user_id},
+        {
+            "current_streak": streak,
+            "longest_streak": Greatest(F("longest_streak"), streak),
+            "last_played_on": Greatest(F("last_played_on"), Value(day)),
+        },
+        {"last_played_on": day},
+    )
+
+
+def record_attempts(attempts):
+    """
+    Adds newly saved attempts to the rollups of their players.
+    Parameters:
+        attempts: QuizAttempt instances that already have a primary key.
+    """
+    per_quiz = {}
+    days = defaultdict(set)
+    for attempt in attempts:
+        key = (attempt.user_id, attempt.quiz_id)
+        count, best, last = per_quiz.get(key, (0, attempt.score, attempt.completed_at))
+        per_quiz[key] = (
+            count + 1,
+            max(best, attempt.score),
+            max(last, attempt.completed_at),
+        )
+        days[attempt.user_id].add(timezone.localdate(attempt.completed_at))
+
+    with transaction.atomic():
+        for (user_id, quiz_id), (count, best, last) in per_quiz.items():
+            _upsert(
+                PlayerQuizStats,
+                {"user_id": user_id, "quiz_id": quiz_id},
+                {
+                    "attempts": F("attempts") + count,
+                    "best_score": Greatest(F("best_score"), Value(best)),
+                    "last_completed_at": Greatest(F("last_completed_at"), Value(last)),
+                },
+                {"attempts": count, "best_score": best, "last_completed_at": last},
+            )
+        for user_id, played in days.items():
+            for day in sorted(played):
+                _record_day(user_id, day)
+
+
+def _streaks(days):
+    """
+    Returns (current streak, longest streak) of a sorted list of distinct days.
+    """
+    current = longest = 0
+    previous = None
+    for day in days:
+        current = current + 1 if previous and (day - previous).days == 1 else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest
+
+
+def _played_days(attempts):
+    return (
+        attempts.annotate(day=TruncDate("completed_at")).values_list("day", flat=True).distinct()
+    )
+
+
+def forget_attempt(attempt):
+    """
+    Recomputes the rollups of the player of a deleted attempt from their other attempts.
+    Parameters:
+        attempt: The QuizAttempt that has just been deleted.
+    """
+    user_attempts = QuizAttempt.objects.filter(user_id=attempt.user_id)
+    with transaction.atomic():
+        quiz_stats = PlayerQuizStats.objects.filter(
+            user_id=attempt.user_id, quiz_id=attempt.quiz_id
+        )
+        rollup = user_attempts.filter(quiz_id=attempt.quiz_id).aggregate(
+            attempts=Count("id"), best_score=Max("score"), last_completed_at=Max("completed_at")
+        )
+        if rollup["attempts"]:
+            quiz_stats.update(**rollup)
+        else:
+            quiz_stats.delete()
+
+        days = sorted(set(_played_days(user_attempts)))
+        if not days:
+            PlayerStats.objects.filter(user_id=attempt.user_id).delete()
+            return
+        current, longest = _streaks(days)
+        PlayerStats.objects.filter(user_id=attempt.user_id).update(
+            current_streak=current, longest_streak=longest, last_played_on=days[-1]
+        )
+
+
+def attempt_history(user, cursor=None):
+    """
+    Returns one page of the attempts of a player, newest first, with their quiz loaded.
+    Parameters:
+        user: The player.
+        cursor: The cursor of the page to show, or None for the first page.
+    Returns:
+        KeysetPage: The attempts on the page and the cursor of the next page.
+    """
+    attempts = QuizAttempt.objects.filter(user=user).select_related("quiz")
+    return keyset_paginate(attempts, cursor, _page_size(), field="completed_at")
+
+
+def player_summary(user):
+    """
+    Returns the rollups of a player, in three queries whatever the size of their history.
+    Parameters:
+        user: The player.
+    Returns:
+        dict: "attempt_count", "quiz_count" (the number of quizzes played), "streaks" (the
+        PlayerStats row, or None before the first attempt) and "best_scores" (the
+        PlayerQuizStats of the most recently played quizzes, with their quiz loaded).
+    """
+    rows = PlayerQuizStats.objects.filter(user=user)
+    totals = rows.aggregate(
+        attempt_count=Sum("attempts", default=0), quiz_count=Count("id")
+    )
+    return {
+        **totals,
+        "streaks": PlayerStats.objects.filter(user=user).first(),
+        "best_scores": list(
+            rows.select_related("quiz").order_by("-last_completed_at")[: _best_scores_shown()]
+        ),
+    }
+
+
+def rebuild_all():
+    """
+    Recomputes every player rollup from the attempts table.
+    Returns:
+        tuple: The number of (player, quiz) rollups and of players rebuilt.
+    """
+    per_quiz = (
+        QuizAttempt.objects.order_by()
+        .values("user_id", "quiz_id")
+        .annotate(count=Count("id"), best=Max("score"), last=Max("completed_at"))
+    )
+    days = _played_days(QuizAttempt.objects.order_by()).values_list("user_id", "day")
+
+    with transaction.atomic():
+        PlayerQuizStats.objects.all().delete()
+        PlayerStats.objects.all().delete()
+        created = PlayerQuizStats.objects.bulk_create(
+            [
+                PlayerQuizStats(
+                    user_id=row["user_id"],
+                    quiz_id=row["quiz_id"],
+                    attempts=row["count"],
+                    best_score=row["best"],
+                    last_completed_at=row["last"],
+                )
+                for row in per_quiz.iterator()
+            ],
+            batch_size=1000,
+        )
+
+        played = defaultdict(set)
+        for user_id, day in days.iterator():
+            played[user_id].add(day)
+        players = []
+        for user_id, user_days in played.items():
+            user_days = sorted(user_days)
+            current, longest = _streaks(user_days)
+            players.append(
+                PlayerStats(
+                    user_id=user_id,
+                    current_streak=current,
+                    longest_streak=longest,
+                    last_played_on=user_days[-1],
+                )
+            )
+        PlayerStats.objects.bulk_create(players, batch_size=1000)
+    return len(created), len(players)
@@ -0,0 +1,254 @@
+"""
+File: leaderboards.py
+
+Description: This file maintains the per-quiz leaderboards and score histograms. Both are
+updated incrementally whenever attempts are recorded (see the attempts_recorded signal in
+signals.py), so reading the top-N of a quiz or the percentile of a score never has to sort
+the attempts table.
+
+Attempts are ranked by score (highest first), then time taken (fastest first), then
+completion time (earliest first). A merge trims the leaderboard to LEADERBOARD_SIZE entries
+after writing, in the same transaction, so concurrent merges cannot leave it longer.
+
+Functions in this file:
+1. record_attempts: Adds new attempts to the histograms and leaderboards of their quizzes.
+2. forget_attempt: Removes a deleted attempt from its quiz's histogram and leaderboard.
+3. top_attempts: Returns the leaderboard of a quiz.
+4. percentile_rank: Returns the percentage of attempts that scored below a given score
+   (apercentile_rank is its async counterpart).
+5. rebuild_all: Recomputes every leaderboard and histogram in one streaming pass.
+"""
+
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q, Sum
+
+from .models import LeaderboardEntry, Quiz, QuizAttempt, ScoreBucket
+
+
+def leaderboard_size():
+    return getattr(settings, "LEADERBOARD_SIZE", 10)
+
+
+def _rank_key(score, time_taken, completed_at, attempt_id):
+    return (-score, time_taken, completed_at, attempt_id)
+
+
+def _entry_from_attempt(attempt):
+    return LeaderboardEntry(
+        quiz_id=attempt.quiz_id,
+        attempt_id=attempt.pk,
+        user_id=attempt.user_id,
+        score=attempt.score,
+        time_taken=attempt.time_taken,
+        completed_at=attempt.completed_at,
+    )
+
+
+def _add_to_bucket(quiz_id, score, count):
+    updated = ScoreBucket.objects.filter(quiz_id=quiz_id, score=score).update(
+        attempts=F("attempts") + count
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                ScoreBucket.objects.create(quiz_id=quiz_id, score=score, attempts=count)
+        except IntegrityError:
+            # Another writer created the bucket first
+            ScoreBucket.objects.filter(quiz_id=quiz_id, score=score).update(
+                attempts=F("attempts") + count
+            )
+
+
+def _merge_into_leaderboard(quiz_id, candidates):
+    size = leaderboard_size()
+    if connection.features.has_select_for_update:
+        # Serializes the merges of a quiz; SQLite already serializes its writers
+        list(Quiz.objects.select_for_update().filter(pk=quiz_id).values_list("pk"))
+    current = list(LeaderboardEntry.objects.filter(quiz_id=quiz_id))
+    entries = current + [_entry_from_attempt(attempt) for attempt in candidates]
+    entries.sort(
+        key=lambda entry: _rank_key(
+            entry.score, entry.time_taken, entry.completed_at, entry.attempt_id
+        )
+    )
+    kept = entries[:size]
+    if not any(entry.pk is None for entry in kept) and not current[size:]:
+        return  # None of the new attempts made it onto the leaderboard
+
+    LeaderboardEntry.objects.bulk_create([entry for entry in kept if entry.pk is None])
+    # Ranked again after the write, which also drops the entries of a merge that read the
+    # leaderboard before this one was written
+    ranked = LeaderboardEntry.objects.filter(quiz_id=quiz_id).values_list("pk", flat=True)
+    dropped_ids = list(ranked[size:])
+    if dropped_ids:
+        LeaderboardEntry.objects.filter(pk__in=dropped_ids).delete()
+
+
+def record_attempts(attempts):
+    """
+    Adds saved attempts to the score histograms and leaderboards of their quizzes.
+    Parameters:
+        attempts: QuizAttempt instances that already have a primary key.
+    """
+    by_quiz = defaultdict(list)
+    for attempt in attempts:
+        by_quiz[attempt.quiz_id].append(attempt)
+
+    with transaction.atomic():
+        for quiz_id, quiz_attempts in by_quiz.items():
+            for score, count in Counter(a.score for a in quiz_attempts).items():
+                _add_to_bucket(quiz_id, score, count)
+
+            _merge_into_leaderboard(quiz_id, quiz_attempts)
+
+
+def forget_attempt(attempt):
+    """
+    Removes a deleted attempt from its quiz's histogram and refills the leaderboard.
+    Parameters:
+        attempt: The QuizAttempt that has just been deleted.
+    """
+    with transaction.atomic():
+        ScoreBucket.objects.filter(
+            quiz_id=attempt.quiz_id, score=attempt.score, attempts__gt=0
+        ).update(attempts=F("attempts") - 1)
+        refresh_leaderboard(attempt.quiz_id)
+
+
+def refresh_leaderboard(quiz_id):
+    """
+    Recomputes the leaderboard of one quiz from its attempts.
+    """
+    best = QuizAttempt.objects.filter(quiz_id=quiz_id).order_by(
+        "-score", "time_taken", "completed_at", "id"
+    )[: leaderboard_size()]
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(quiz_id=quiz_id).delete()
+        LeaderboardEntry.objects.bulk_create(
+            [_entry_from_attempt(attempt) for attempt in best]
+        )
+
+
+def top_attempts(quiz_id):
+    """
+    Returns the leaderboard entries of a quiz, best first, with their users loaded.
+    """
+    return LeaderboardEntry.objects.filter(quiz_id=quiz_id).select_related("user")
+
+
+def percentile_rank(quiz_id, score):
+    """
+    Returns the percentage of attempts at a quiz that scored below the given score.
+    Parameters:
+        quiz_id: The ID of the quiz.
+        score: The score to rank.
+    Returns:
+        int or None: The rounded percentage, or None if the quiz has no attempts.
+    """
+    buckets = ScoreBucket.objects.filter(quiz_id=quiz_id)
+    return _percentage(buckets.aggregate(**_percentile_aggregates(score)))
+
+
+async def apercentile_rank(quiz_id, score):
+    """
+    Async version of percentile_rank.
+    """
+    buckets = ScoreBucket.objects.filter(quiz_id=quiz_id)
+    return _percentage(await buckets.aaggregate(**_percentile_aggregates(score)))
+
+
+def _percentile_aggregates(score):
+    return {
+        "below": Sum("attempts", filter=Q(score__lt=score)),
+        "total": Sum("attempts"),
+    }
+
+
+def _percentage(totals):
+    if not totals["total"]:
+        return None
+    return round(100 * (totals["below"] or 0) / totals["total"])
+
+
+def rebuild_all(chunk_size=5000):
+    """
+    Recomputes every leaderboard and score histogram from the attempts table.
+
+    Attempts are streamed once in quiz order; each quiz's histogram and top-N heap are
+    written out as soon as the stream moves on to the next quiz.
+    Parameters:
+        chunk_size: The number of attempts fetched from the database at a time.
+    Returns:
+        tuple: The number of quizzes and attempts processed.
+    """
+    size = leaderboard_size()
+    rows = (
+        QuizAttempt.objects.order_by("quiz_id")
+        .values_list("id", "quiz_id", "user_id", "score", "time_taken", "completed_at")
+        .iterator(chunk_size=chunk_size)
+    )
+    quizzes = attempts = 0
+
+    def flush(quiz_id, histogram, heap):
+        ScoreBucket.objects.bulk_create(
+            [
+                ScoreBucket(quiz_id=quiz_id, score=score, attempts=count)
+                for score, count in histogram.items()
+            ]
+        )
+        LeaderboardEntry.objects.bulk_create(
+            [
+                LeaderboardEntry(
+                    quiz_id=quiz_id,
+                    attempt_id=attempt_id,
+                    user_id=user_id,
+                    score=score,
+                    time_taken=time_taken,
+                    completed_at=completed_at,
+                )
+                for _, (attempt_id, user_id, score, time_taken, completed_at) in heap
+            ]
+        )
+
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        ScoreBucket.objects.all().delete()
+
+        current, histogram, heap = None, Counter(), []
+        for attempt_id, quiz_id, user_id, score, time_taken, completed_at in rows:
+            if quiz_id != current:
+                if current is not None:
+                    flush(current, histogram, heap)
+                current, histogram, heap = quiz_id, Counter(), []
+                quizzes += 1
+            attempts += 1
+            histogram[score] += 1
+
+            # Bounded max-heap on the rank key: the root is the worst entry kept so far
+            rank = _rank_key(score, time_taken, completed_at, attempt_id)
+            item = (_Reversed(rank), (attempt_id, user_id, score, time_taken, completed_at))
+            if len(heap) < size:
+                heapq.heappush(heap, item)
+            elif rank < heap[0][0].key:
+                heapq.heapreplace(heap, item)
+        if current is not None:
+            flush(current, histogram, heap)
+    return quizzes, attempts
+
+
+class _Reversed:
+    """
+    Inverts the ordering of a rank key so heapq keeps the worst kept entry at the root.
+    """
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return self.key > other.key
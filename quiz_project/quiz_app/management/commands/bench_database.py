@@ -0,0 +1,168 @@
+"""
+File: bench_database.py
+
+Description: Management command that measures how the SQLite connection profile affects
+mixed read/write traffic. It copies the configured database into a temporary directory once
+per profile and starts gunicorn against the copy, with that profile's settings passed as
+environment variables. Simulated players then make a series of requests: a share of them
+(--write-ratio) submit the quiz and the rest read the home page, the play page or the
+leaderboard. Results are printed as JSON.
+
+Profiles:
+    baseline: Django's SQLite defaults (rollback journal, synchronous=FULL, no mmap, a 2 MB
+        page cache, deferred transactions) and a new connection per request.
+    tuned: The profile from settings.py (WAL, synchronous=NORMAL, mmap, a 64 MB page cache,
+        immediate transactions) with persistent, health-checked connections.
+
+The benchmark user, its session and, if needed, a benchmark quiz are created in the
+configured database before it is copied; the servers only write to the copies.
+
+Usage:
+    python manage.py bench_database --concurrency 8 32 --players 100 --write-ratio 0.2
+"""
+
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from quiz_app import attempt_tokens
+from quiz_app.benchmarking import (
+    HttpSession,
+    benchmark_quiz,
+    create_session,
+    run_players,
+    running_server,
+)
+
+HOST = "127.0.0.1"
+
+PROFILES = {
+    "baseline": {
+        "DB_CONN_MAX_AGE": "0",
+        "SQLITE_JOURNAL_MODE": "delete",
+        "SQLITE_SYNCHRONOUS": "full",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_SIZE": "-2000",
+        "SQLITE_TEMP_STORE": "default",
+        "SQLITE_TRANSACTION_MODE": "DEFERRED",
+    },
+    "tuned": {},
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmarks mixed read/write throughput of the baseline and tuned SQLite profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+        parser.add_argument("--players", type=int, default=100, help="Players per run.")
+        parser.add_argument(
+            "--requests", type=int, default=10, help="Requests made by each player."
+        )
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.2,
+            help="Share of requests that submit an attempt.",
+        )
+        parser.add_argument("--workers", type=int, default=2, help="gunicorn workers.")
+        parser.add_argument("--threads", type=int, default=8, help="Threads per worker.")
+        parser.add_argument("--port", type=int, default=8766)
+        parser.add_argument(
+            "--profile", choices=list(PROFILES), nargs="+", default=list(PROFILES)
+        )
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("bench_database only supports SQLite databases.")
+
+        quiz = benchmark_quiz()
+        user, _ = User.objects.get_or_create(username="bench-player")
+        session_cookie = {settings.SESSION_COOKIE_NAME: create_session(user)}
+        answer_ids = {
+            question.id: [answer.id for answer in question.answers.all()]
+            for question in quiz.questions.prefetch_related("answers")
+        }
+        reads = ["/", f"/play_quiz/{quiz.id}/", f"/leaderboard/{quiz.id}/"]
+
+        def player(number):
+            rng = random.Random(number)
+            session = HttpSession(HOST, options["port"], session_cookie)
+            session.get(reads[1])  # Picks up the CSRF token for the submissions
+            for _ in range(options["requests"]):
+                if rng.random() < options["write_ratio"]:
+                    data = {f"question_{qid}": rng.choice(ids) for qid, ids in answer_ids.items()}
+                    data["attempt"] = attempt_tokens.issue(quiz, user).sign()
+                    session.post(f"/submit_quiz/{quiz.id}/", data)
+                else:
+                    session.get(rng.choice(reads))
+            session.close()
+            return session
+
+        report = {
+            "quiz_id": quiz.id,
+            "write_ratio": options["write_ratio"],
+            "requests_per_player": options["requests"] + 1,
+            "runs": [],
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in options["profile"]:
+                database = Path(directory) / f"{profile}.sqlite3"
+                self._copy_database(database)
+                env = dict(PROFILES[profile], DATABASE_URL=f"sqlite:///{database}")
+                with running_server(
+                    self._server_command(options), HOST, options["port"],
+                    env=env, cwd=settings.BASE_DIR,
+                ):
+                    for concurrency in options["concurrency"]:
+                        result = run_players(player, concurrency, options["players"])
+                        report["runs"].append(dict(result, profile=profile))
+                        self.stderr.write(
+                            f"{profile} c={concurrency}: {result['requests_per_s']} req/s, "
+                            f"p95 {result['p95_ms']} ms, {result['errors']} errors"
+                        )
+
+        report["speedup"] = self._speedups(report["runs"])
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                handle.write(output)
+        self.stdout.write(output)
+
+    def _copy_database(self, destination):
+        # The backup API gives a consistent copy even while the source is in WAL mode
+        source = sqlite3.connect(settings.DATABASES["default"]["NAME"])
+        target = sqlite3.connect(destination)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+    def _server_command(self, options):
+        return [
+            sys.executable, "-m", "gunicorn",
+            "-b", f"{HOST}:{options['port']}",
+            "-w", str(options["workers"]),
+            "--threads", str(options["threads"]),
+            "quiz_project.wsgi",
+        ]
+
+    def _speedups(self, runs):
+        throughput = {
+            (run["profile"], run["concurrency"]): run["requests_per_s"] for run in runs
+        }
+        return {
+            str(concurrency): round(tuned / throughput[("baseline", concurrency)], 2)
+            for (profile, concurrency), tuned in throughput.items()
+            if profile == "tuned" and throughput.get(("baseline", concurrency))
+        }
@@ -0,0 +1,88 @@
+"""
+File: bench_scoring.py
+
+Description: Management command that micro-benchmarks the scoring engine (see
+answer_keys.py). It compiles an answer key, either for an existing quiz (--quiz) or for a
+synthetic quiz mixing every question type, generates random submissions as QueryDicts like
+the ones submit_quiz receives, and grades them all on one thread without database access.
+It reports the submissions graded per second and the time per submission.
+
+Usage:
+    python manage.py bench_scoring [--submissions 100000] [--questions 20] [--quiz 12]
+"""
+
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from quiz_app.answer_keys import AnswerKey
+from quiz_app.models import Question
+
+
+class Command(BaseCommand):
+    help = "Measures how many quiz submissions the scoring engine grades per second."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--submissions", type=int, default=100000)
+        parser.add_argument(
+            "--questions", type=int, default=20, help="Questions of the synthetic quiz."
+        )
+        parser.add_argument("--answers", type=int, default=4, help="Answers per question.")
+        parser.add_argument("--quiz", type=int, help="Benchmark this quiz's answer key.")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        if options["quiz"] is not None:
+            key = AnswerKey.build(options["quiz"])
+            if not len(key):
+                raise CommandError(f"Quiz {options['quiz']} has no questions.")
+        else:
+            key = self._synthetic_key(rng, options["questions"], options["answers"])
+
+        submissions = [self._submission(rng, key) for _ in range(options["submissions"])]
+        started = time.perf_counter()
+        for data in submissions:
+            key.score(data)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            json.dumps(
+                {
+                    "questions": len(key),
+                    "submissions": len(submissions),
+                    "elapsed_s": round(elapsed, 3),
+                    "submissions_per_s": round(len(submissions) / elapsed),
+                    "us_per_submission": round(elapsed / len(submissions) * 1e6, 2),
+                },
+                indent=2,
+            )
+        )
+
+    def _synthetic_key(self, rng, questions, answers):
+        """
+        Compiles a key from fake rows, cycling through every question type.
+        """
+        rows = []
+        for index in range(questions):
+            question_type = Question.QUESTION_TYPES[index % len(Question.QUESTION_TYPES)]
+            count = 2 if question_type == Question.TRUE_FALSE else answers
+            many = question_type in Question.MULTI_SELECT_TYPES
+            correct = set(rng.sample(range(count), rng.randint(1, count) if many else 1))
+            for position in range(count):
+                answer_id = index * answers + position + 1
+                rows.append(
+                    (index + 1, question_type, rng.randint(1, 5), answer_id, position in correct)
+                )
+        return AnswerKey._from_rows(0, rows)
+
+    def _submission(self, rng, key):
+        data = QueryDict(mutable=True)
+        for question_id, field, kind, points, choices, correct, correct_count in key.questions:
+            values = list(choices)
+            picked = rng.sample(values, rng.randint(1, len(values))) if values else []
+            data.setlist(field, picked)
+        return data
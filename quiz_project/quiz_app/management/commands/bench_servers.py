@@ -0,0 +1,109 @@
+"""
+File: bench_servers.py
+
+Description: Management command that compares the throughput of the sync WSGI stack and the
+async ASGI stack under many concurrent players. For each stack it starts gunicorn on a local
+port (sync gthread workers for WSGI, uvicorn workers with QUIZ_ASYNC_VIEWS enabled for ASGI),
+then runs simulated players that each open the home page, play a quiz, check one answer,
+submit the quiz and view the results. Results are printed as JSON.
+
+The ASGI run requires uvicorn (see requirements.txt). Both servers use the configured
+database, so run the command against a scratch copy rather than production data.
+
+Usage:
+    python manage.py bench_servers --concurrency 10 50 100 --players 200
+"""
+
+import json
+import random
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app import attempt_tokens
+from quiz_app.benchmarking import (
+    HttpSession,
+    benchmark_quiz,
+    create_session,
+    run_players,
+    running_server,
+)
+
+HOST = "127.0.0.1"
+
+
+class Command(BaseCommand):
+    help = "Benchmarks requests/sec of the sync WSGI and async ASGI stacks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100])
+        parser.add_argument("--players", type=int, default=200, help="Players per run.")
+        parser.add_argument("--workers", type=int, default=2, help="gunicorn workers.")
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Threads per sync WSGI worker."
+        )
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--stack", choices=["wsgi", "asgi"], nargs="+", default=["wsgi", "asgi"]
+        )
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        quiz = benchmark_quiz()
+        user, _ = User.objects.get_or_create(username="bench-player")
+        session_cookie = {settings.SESSION_COOKIE_NAME: create_session(user)}
+        answer_ids = {
+            question.id: [answer.id for answer in question.answers.all()]
+            for question in quiz.questions.prefetch_related("answers")
+        }
+
+        def player(number):
+            rng = random.Random(number)
+            session = HttpSession(HOST, options["port"], session_cookie)
+            session.get("/")
+            session.get(f"/play_quiz/{quiz.id}/")
+            question_id = rng.choice(list(answer_ids))
+            session.post(
+                f"/check_answer/{question_id}/",
+                {"answer": rng.choice(answer_ids[question_id])},
+            )
+            data = {f"question_{qid}": rng.choice(ids) for qid, ids in answer_ids.items()}
+            data["attempt"] = attempt_tokens.issue(quiz, user).sign()
+            status, _ = session.post(f"/submit_quiz/{quiz.id}/", data)
+            if status == 302:
+                session.get(session.location)
+            session.close()
+            return session
+
+        report = {"quiz_id": quiz.id, "questions": len(answer_ids), "runs": []}
+        for stack in options["stack"]:
+            argv, env = self._server_command(stack, options)
+            with running_server(argv, HOST, options["port"], env=env, cwd=settings.BASE_DIR):
+                for concurrency in options["concurrency"]:
+                    result = run_players(player, concurrency, options["players"])
+                    report["runs"].append(dict(result, stack=stack))
+                    self.stderr.write(
+                        f"{stack} c={concurrency}: {result['requests_per_s']} req/s, "
+                        f"p95 {result['p95_ms']} ms, {result['errors']} errors"
+                    )
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                handle.write(output)
+        self.stdout.write(output)
+
+    def _server_command(self, stack, options):
+        bind = f"{HOST}:{options['port']}"
+        gunicorn = [sys.executable, "-m", "gunicorn", "-b", bind, "-w", str(options["workers"])]
+        if stack == "wsgi":
+            argv = gunicorn + ["--threads", str(options["threads"]), "quiz_project.wsgi"]
+            return argv, {"QUIZ_ASYNC_VIEWS": "false"}
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError("The ASGI benchmark requires uvicorn (pip install uvicorn).")
+        argv = gunicorn + ["-k", "uvicorn.workers.UvicornWorker", "quiz_project.asgi"]
+        return argv, {"QUIZ_ASYNC_VIEWS": "true"}
@@ -0,0 +1,95 @@
+"""
+File: bench_sessions.py
+
+Description: Management command that measures what the session and authentication layer
+costs each logged-in request. It replays the same requests under three profiles:
+- database: database sessions and Django's AuthenticationMiddleware, which load the session
+  row and the User row on every request;
+- cached_db: cached_db sessions and CachedAuthenticationMiddleware (the default settings);
+- cache: cache-only sessions and CachedAuthenticationMiddleware.
+
+Requests go through Django's test client in this process. For each profile and path, the
+report gives the queries one warm request runs and the p50/p95/p99 latency of --requests
+sequential requests, so the per-request query reduction can be read off directly.
+
+Usage:
+    python manage.py bench_sessions [--requests 500] [--path /play_quiz/1/ /]
+"""
+
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from quiz_app.benchmarking import ClientSession, benchmark_quiz, count_queries, summarize
+
+STOCK_AUTH = "django.contrib.auth.middleware.AuthenticationMiddleware"
+CACHED_AUTH = "quiz_app.middleware.CachedAuthenticationMiddleware"
+
+# Profile name -> (session engine, authentication middleware)
+PROFILES = {
+    "database": ("django.contrib.sessions.backends.db", STOCK_AUTH),
+    "cached_db": ("django.contrib.sessions.backends.cached_db", CACHED_AUTH),
+    "cache": ("django.contrib.sessions.backends.cache", CACHED_AUTH),
+}
+
+
+class Command(BaseCommand):
+    help = "Compares the per-request queries and latency of the session/auth profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Requests per profile and path."
+        )
+        parser.add_argument(
+            "--path", nargs="+", help="Paths to request (default: a play page and /)."
+        )
+        parser.add_argument(
+            "--profile", choices=list(PROFILES), nargs="+", default=list(PROFILES)
+        )
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        paths = options["path"] or [f"/play_quiz/{benchmark_quiz().id}/", "/"]
+        user, _ = User.objects.get_or_create(username="bench-player")
+
+        report = {"requests": options["requests"], "profiles": {}}
+        for name in options["profile"]:
+            with override_settings(**self._settings(*PROFILES[name])):
+                cache.clear()
+                report["profiles"][name] = {
+                    path: self._measure(user, path, options["requests"]) for path in paths
+                }
+            for path, result in report["profiles"][name].items():
+                self.stderr.write(
+                    f"{name} {path}: {result['queries_per_request']} queries, "
+                    f"p50 {result['p50_ms']} ms"
+                )
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                handle.write(output)
+        self.stdout.write(output)
+
+    def _settings(self, engine, middleware):
+        auth = {STOCK_AUTH, CACHED_AUTH}
+        return {
+            "SESSION_ENGINE": engine,
+            "MIDDLEWARE": [
+                middleware if entry in auth else entry for entry in settings.MIDDLEWARE
+            ],
+        }
+
+    def _measure(self, user, path, requests):
+        session = ClientSession(user)
+        session.get(path)  # Warm the caches
+        queries = count_queries(lambda: session.get(path))
+        session.latencies, session.errors = [], 0
+        for _ in range(requests):
+            session.get(path)
+        result = summarize(session.latencies, sum(session.latencies), session.errors)
+        return dict(result, queries_per_request=queries)
@@ -0,0 +1,230 @@
+"""
+File: bench_views.py
+
+Description: Management command that load-tests the main views one scenario at a time and
+prints a JSON report that can be diffed across commits. The scenarios are:
+- index: the home page;
+- play: the play page of a random quiz;
+- check: checking one answer of a random question;
+- submit: submitting a random answer sheet for a random quiz;
+- create: creating a 10-question quiz through the create_quiz form.
+
+Requests are sent through Django's test client in this process (--target client), or to a
+gunicorn server started on a local port (--target gunicorn). Each scenario runs at every
+--concurrency level with --players simulated players making --requests requests each.
+The report gives throughput and p50/p95/p99 latency per run, and the number of queries one
+warm request of each scenario runs, measured in-process.
+
+The submit and create scenarios write to the configured database, so point DATABASE_URL at
+a scratch copy (filled with generate_quiz_data) rather than production data.
+
+Usage:
+    python manage.py bench_views --target client --concurrency 1 8 32 --output before.json
+    python manage.py bench_views --target gunicorn --scenario play submit --workers 4
+"""
+
+import json
+import random
+import subprocess
+import sys
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from quiz_app import attempt_tokens
+from quiz_app.benchmarking import (
+    ClientSession,
+    HttpSession,
+    benchmark_quiz,
+    count_queries,
+    create_session,
+    run_players,
+    running_server,
+)
+from quiz_app.models import Answer, Question, Quiz, QuizAttempt
+
+HOST = "127.0.0.1"
+SCENARIOS = ["index", "play", "check", "submit", "create"]
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the main quiz views and reports throughput, latency and queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=["client", "gunicorn"], default="client")
+        parser.add_argument(
+            "--scenario", choices=SCENARIOS, nargs="+", default=SCENARIOS
+        )
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+        parser.add_argument("--players", type=int, default=32, help="Players per run.")
+        parser.add_argument(
+            "--requests", type=int, default=10, help="Requests made by each player."
+        )
+        parser.add_argument(
+            "--quizzes", type=int, default=50, help="Number of quizzes to play."
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--workers", type=int, default=2, help="gunicorn workers.")
+        parser.add_argument("--threads", type=int, default=8, help="Threads per worker.")
+        parser.add_argument("--port", type=int, default=8767)
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        self.quizzes = self._load_quizzes(options["quizzes"])
+        self.questions = [
+            (question_id, answer_ids)
+            for questions in self.quizzes.values()
+            for question_id, answer_ids in questions
+        ]
+        self.quiz_objects = Quiz.objects.in_bulk(list(self.quizzes))
+        user, _ = User.objects.get_or_create(username="bench-player")
+        self.user = user
+
+        if options["target"] == "gunicorn":
+            cookies = {settings.SESSION_COOKIE_NAME: create_session(user)}
+
+            def new_session():
+                session = HttpSession(HOST, options["port"], cookies)
+                session.get(f"/play_quiz/{next(iter(self.quizzes))}/")  # CSRF token
+                session.latencies, session.errors = [], 0
+                return session
+
+            server = running_server(
+                self._server_command(options), HOST, options["port"], cwd=settings.BASE_DIR
+            )
+        else:
+
+            def new_session():
+                return ClientSession(user)
+
+            server = nullcontext()
+
+        report = {
+            "revision": self._revision(),
+            "target": options["target"],
+            "dataset": {
+                "users": User.objects.count(),
+                "quizzes": Quiz.objects.count(),
+                "questions": Question.objects.count(),
+                "attempts": QuizAttempt.objects.count(),
+            },
+            "requests_per_player": options["requests"],
+            "scenarios": {},
+        }
+        with server:
+            for name in options["scenario"]:
+                scenario = getattr(self, f"_{name}")
+                result = {
+                    "queries_per_request": self._queries(scenario, user, options["seed"]),
+                    "runs": [],
+                }
+
+                def player(number, scenario=scenario):
+                    rng = random.Random(options["seed"] * 100003 + number)
+                    session = new_session()
+                    for _ in range(options["requests"]):
+                        scenario(session, rng)
+                    session.close()
+                    return session
+
+                for concurrency in options["concurrency"]:
+                    run = run_players(player, concurrency, options["players"])
+                    result["runs"].append(run)
+                    self.stderr.write(
+                        f"{name} c={concurrency}: {run['requests_per_s']} req/s, "
+                        f"p95 {run['p95_ms']} ms, {run['errors']} errors"
+                    )
+                report["scenarios"][name] = result
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                handle.write(output)
+        self.stdout.write(output)
+
+    def _index(self, session, rng):
+        session.get("/")
+
+    def _play(self, session, rng):
+        session.get(f"/play_quiz/{rng.choice(list(self.quizzes))}/")
+
+    def _check(self, session, rng):
+        question_id, answer_ids = rng.choice(self.questions)
+        session.post(f"/check_answer/{question_id}/", {"answer": rng.choice(answer_ids)})
+
+    def _submit(self, session, rng):
+        quiz_id = rng.choice(list(self.quizzes))
+        data = {
+            f"question_{question_id}": rng.choice(answer_ids)
+            for question_id, answer_ids in self.quizzes[quiz_id]
+        }
+        # Issued here rather than by a play_quiz request, which would be timed too
+        attempt = attempt_tokens.issue(self.quiz_objects[quiz_id], self.user)
+        data["attempt"] = attempt.sign()
+        session.post(f"/submit_quiz/{quiz_id}/", data)
+
+    def _create(self, session, rng):
+        data = {
+            "title": f"Benchmark quiz {rng.randrange(10**9)}",
+            "description": "Created by bench_views.",
+            "category": "Benchmark",
+            "difficulty": "Medium",
+        }
+        for i in range(10):
+            data[f"questions[{i}][text]"] = f"Benchmark question {i + 1}"
+            data[f"questions[{i}][points]"] = "1"
+            for j in range(4):
+                data[f"questions[{i}][answers][{j}][text]"] = f"Answer {j + 1}"
+            data[f"questions[{i}][answers][0][is_correct]"] = "on"
+        session.post("/create_quiz/", data)
+
+    def _queries(self, scenario, user, seed):
+        """
+        Returns the queries run by one warm request of a scenario, in this process.
+        """
+        session = ClientSession(user)
+        scenario(session, random.Random(seed))  # Warm the caches
+        return count_queries(lambda: scenario(session, random.Random(seed)))
+
+    def _load_quizzes(self, limit):
+        """
+        Returns quiz id -> [(question id, answer ids)] for up to limit quizzes.
+        """
+        quiz_ids = list(
+            Quiz.objects.filter(questions__isnull=False)
+            .distinct()
+            .order_by("id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if not quiz_ids:
+            quiz_ids = [benchmark_quiz().id]
+        questions = {}
+        rows = Answer.objects.filter(question__quiz_id__in=quiz_ids).values_list(
+            "question__quiz_id", "question_id", "id"
+        )
+        for quiz_id, question_id, answer_id in rows:
+            questions.setdefault(quiz_id, {}).setdefault(question_id, []).append(answer_id)
+        return {quiz_id: list(by_question.items()) for quiz_id, by_question in questions.items()}
+
+    def _server_command(self, options):
+        return [
+            sys.executable, "-m", "gunicorn",
+            "-b", f"{HOST}:{options['port']}",
+            "-w", str(options["workers"]),
+            "--threads", str(options["threads"]),
+            "quiz_project.wsgi",
+        ]
+
+    def _revision(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,64 @@
+"""
+File: export_attempts.py
+
+Description: Management command that exports quiz attempts, with every per-question
+response, as CSV or JSON Lines (see exports.py). Rows are streamed from the database and
+written as they are read, so memory use does not grow with the size of the export.
+
+Usage:
+    python manage.py export_attempts [--quiz 12 --quiz 13] [--owner alice] \
+        [--since 2024-01-01] [--until 2024-12-31] [--format jsonl] [--output attempts.jsonl]
+"""
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.exports import FORMATS, attempts_for_export, parse_export_filters, stream_export
+
+
+class Command(BaseCommand):
+    help = "Exports quiz attempts and their responses as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--quiz", action="append", help="Only export this quiz (repeatable)."
+        )
+        parser.add_argument("--owner", help="Only export the quizzes of this username.")
+        parser.add_argument("--since", help="First completion date or datetime (ISO).")
+        parser.add_argument("--until", help="Last completion date or datetime (ISO).")
+        parser.add_argument("--format", choices=list(FORMATS), default="csv")
+        parser.add_argument("--output", help="File to write (default: standard output).")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of attempts fetched from the database at a time.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_export_filters(
+                quiz_ids=options["quiz"],
+                since=options["since"],
+                until=options["until"],
+                export_format=options["format"],
+            )
+        except ValidationError as error:
+            raise CommandError(" ".join(error.messages))
+        if options["owner"]:
+            try:
+                filters["owner"] = User.objects.get(username=options["owner"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['owner']!r}.")
+
+        export_format = filters.pop("export_format")
+        chunks = stream_export(
+            attempts_for_export(**filters), export_format, options["chunk_size"]
+        )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as handle:
+                handle.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,240 @@
+"""
+File: generate_quiz_data.py
+
+Description: Management command that fills the database with synthetic users, quizzes,
+questions, answers and attempts for load testing. Every table is written with bulk_create in
+batches of --batch-size rows per INSERT, all in one transaction. Since bulk_create sends no
+signals, the command sets the question counters of the new quizzes, indexes them for search
+and announces the new attempts through attempts_recorded itself, like the other bulk write
+paths. Attempts are generated grouped by quiz, so each announced batch updates only a few
+leaderboards.
+
+Every question has exactly one correct answer. Attempts pick a random answer per question and
+are scored accordingly, with a UserAnswer row per question.
+
+Usage:
+    python manage.py generate_quiz_data --users 1000 --quizzes 500 --questions 20 \
+        --answers 4 --attempts 20000 [--seed 1] [--prefix load]
+"""
+
+import random
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from quiz_app import search
+from quiz_app.catalogue import invalidate_facet_counts
+from quiz_app.models import Answer, Question, Quiz, QuizAttempt, UserAnswer
+from quiz_app.signals import attempts_recorded
+
+CATEGORIES = ["Science", "Math", "History", "Geography", "Literature", "Music", "Sports"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+WORDS = (
+    "atom planet river empire theorem sonnet rhythm canyon equation dynasty glacier "
+    "melody orbit fossil treaty prism sprint harbor vector legend"
+).split()
+
+# Password of every generated user
+PASSWORD = "load-test-password"
+
+
+class Command(BaseCommand):
+    help = "Generates synthetic users, quizzes, questions, answers and attempts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--quizzes", type=int, default=100)
+        parser.add_argument("--questions", type=int, default=10, help="Per quiz.")
+        parser.add_argument("--answers", type=int, default=4, help="Per question.")
+        parser.add_argument("--attempts", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--prefix", default="load", help="Prefix of the generated usernames."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows per INSERT statement."
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 and options["quizzes"] + options["attempts"] > 0:
+            raise CommandError("Quizzes and attempts need at least one user.")
+        if options["answers"] < 1:
+            raise CommandError("Every question needs at least one answer.")
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            user_ids = self._create_users(options["users"], options["prefix"])
+            quiz_keys = self._create_quizzes(
+                user_ids, options["quizzes"], options["questions"], options["answers"]
+            )
+            attempts = self._create_attempts(user_ids, quiz_keys, options["attempts"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(user_ids)} users, {len(quiz_keys)} quizzes "
+                f"({options['questions']} questions x {options['answers']} answers each) "
+                f"and {attempts} attempts in {time.perf_counter() - started:.1f}s. "
+                f"Users log in with the password {PASSWORD!r}."
+            )
+        )
+
+    def _words(self, count):
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def _create_users(self, count, prefix):
+        first = User.objects.filter(username__startswith=f"{prefix}-").count()
+        password = make_password(PASSWORD)  # Hashing once keeps this fast
+        users = User.objects.bulk_create(
+            [
+                User(username=f"{prefix}-{first + i}", password=password)
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        return [user.pk for user in users]
+
+    def _create_quizzes(self, user_ids, count, questions_per_quiz, answers_per_question):
+        """
+        Creates the quizzes with their questions and answers.
+        Returns:
+            dict: Quiz id -> list of (question id, answer ids, correct answer id).
+        """
+        quiz_keys = {}
+        chunk = max(1, self.batch_size // max(1, questions_per_quiz))
+        for start in range(0, count, chunk):
+            quizzes = Quiz.objects.bulk_create(
+                [
+                    Quiz(
+                        title=f"{self._words(3).title()} quiz {start + i}",
+                        description=self._words(12),
+                        category=self.rng.choice(CATEGORIES),
+                        difficulty=self.rng.choice(DIFFICULTIES),
+                        owner_id=self.rng.choice(user_ids),
+                        # Every question is worth one point
+                        question_count=questions_per_quiz,
+                        total_points=questions_per_quiz,
+                    )
+                    for i in range(min(chunk, count - start))
+                ]
+            )
+            questions = Question.objects.bulk_create(
+                [
+                    Question(
+                        quiz=quiz,
+                        text=f"{self._words(8)}?",
+                        question_type=Question.SINGLE_CHOICE,
+                        points=1,
+                    )
+                    for quiz in quizzes
+                    for _ in range(questions_per_quiz)
+                ],
+                batch_size=self.batch_size,
+            )
+            answers = Answer.objects.bulk_create(
+                [
+                    Answer(question=question, text=self._words(2), is_correct=j == 0)
+                    for question in questions
+                    for j in range(answers_per_question)
+                ],
+                batch_size=self.batch_size,
+            )
+
+            for index, question in enumerate(questions):
+                answer_ids = [
+                    answer.pk
+                    for answer in answers[
+                        index * answers_per_question : (index + 1) * answers_per_question
+                    ]
+                ]
+                quiz_keys.setdefault(question.quiz_id, []).append(
+                    (question.pk, answer_ids, answer_ids[0])
+                )
+            for quiz in quizzes:
+                quiz_keys.setdefault(quiz.pk, [])
+            # bulk_create bypasses the signals that keep the search index in sync
+            search.index_quizzes([quiz.pk for quiz in quizzes])
+
+        invalidate_facet_counts()
+        return quiz_keys
+
+    def _create_attempts(self, user_ids, quiz_keys, count):
+        playable = [quiz_id for quiz_id, questions in quiz_keys.items() if questions]
+        if not playable:
+            playable = list(
+                Quiz.objects.filter(questions__isnull=False).distinct().values_list(
+                    "id", flat=True
+                )
+            )
+            # No new quizzes: play the existing ones
+            quiz_keys = self._load_keys(playable)
+            playable = list(quiz_keys)
+        if not playable or not count:
+            return 0
+
+        # Generate the attempts grouped by quiz, so each batch touches few leaderboards
+        per_quiz = Counter(self.rng.choice(playable) for _ in range(count))
+        rows = (
+            self._attempt(quiz_id, quiz_keys[quiz_id], user_ids)
+            for quiz_id in sorted(per_quiz)
+            for _ in range(per_quiz[quiz_id])
+        )
+        created = 0
+        per_chunk = max(1, self.batch_size // 10)
+        while chunk := list(islice(rows, per_chunk)):
+            attempts, responses = zip(*chunk)
+            attempts = QuizAttempt.objects.bulk_create(
+                list(attempts), batch_size=self.batch_size
+            )
+            UserAnswer.objects.bulk_create(
+                [
+                    UserAnswer(
+                        quiz_attempt=attempt,
+                        question_id=question_id,
+                        selected_answer_id=answer_id,
+                        is_correct=answer_id == correct,
+                    )
+                    for attempt, chosen in zip(attempts, responses)
+                    for question_id, answer_id, correct in chosen
+                ],
+                batch_size=self.batch_size,
+            )
+            # bulk_create sends no post_save, so announce the new attempts here
+            attempts_recorded.send(sender=QuizAttempt, attempts=attempts)
+            created += len(attempts)
+        return created
+
+    def _attempt(self, quiz_id, questions, user_ids):
+        chosen = [
+            (question_id, self.rng.choice(answer_ids), correct_id)
+            for question_id, answer_ids, correct_id in questions
+        ]
+        attempt = QuizAttempt(
+            user_id=self.rng.choice(user_ids),
+            quiz_id=quiz_id,
+            score=sum(answer_id == correct for _, answer_id, correct in chosen),
+            time_taken=self.rng.randint(10, 600),
+        )
+        return attempt, chosen
+
+    def _load_keys(self, quiz_ids):
+        quiz_keys = {}
+        rows = Answer.objects.filter(question__quiz_id__in=quiz_ids).values_list(
+            "question__quiz_id", "question_id", "id", "is_correct"
+        )
+        questions = {}
+        for quiz_id, question_id, answer_id, is_correct in rows.order_by("question_id", "id"):
+            entry = questions.setdefault(question_id, (quiz_id, [], []))
+            entry[1].append(answer_id)
+            if is_correct:
+                entry[2].append(answer_id)
+        for question_id, (quiz_id, answer_ids, correct_ids) in questions.items():
+            correct_id = correct_ids[0] if correct_ids else None
+            quiz_keys.setdefault(quiz_id, []).append((question_id, answer_ids, correct_id))
+        return quiz_keys
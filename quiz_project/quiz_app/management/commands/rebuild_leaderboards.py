@@ -0,0 +1,32 @@
+"""
+File: rebuild_leaderboards.py
+
+Description: Management command that recomputes every quiz leaderboard and score histogram
+from the QuizAttempt table in a single streaming pass. Use it after importing attempts in
+bulk or changing LEADERBOARD_SIZE.
+
+Usage:
+    python manage.py rebuild_leaderboards [--chunk-size 5000]
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz_app.leaderboards import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Recomputes all quiz leaderboards and score histograms from the attempts table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Number of attempts fetched from the database at a time.",
+        )
+
+    def handle(self, *args, **options):
+        quizzes, attempts = rebuild_all(chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {quizzes} leaderboards from {attempts} attempts.")
+        )
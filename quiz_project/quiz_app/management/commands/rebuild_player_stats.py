@@ -0,0 +1,27 @@
+"""
+File: rebuild_player_stats.py
+
+Description: Management command that recomputes the attempt history rollups of every player
+(attempts and best score per quiz, daily streaks) from the QuizAttempt table. Use it after
+importing attempts without sending attempts_recorded, or to backfill the rollups of the
+attempts recorded before they existed.
+
+Usage:
+    python manage.py rebuild_player_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz_app.history import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Recomputes the attempt history rollups of every player from the attempts table."
+
+    def handle(self, *args, **options):
+        quizzes, players = rebuild_all()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {quizzes} per-quiz rollups and the streaks of {players} players."
+            )
+        )
@@ -0,0 +1,29 @@
+"""
+File: rebuild_search_index.py
+
+Description: Management command that rebuilds the full-text quiz search index in bulk.
+Run it after loading data with raw SQL or fixtures, which bypass the signals that keep the
+index in sync.
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quiz_app.search import is_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of quizzes, questions and answers."
+
+    def handle(self, *args, **options):
+        if not is_enabled():
+            self.stdout.write(
+                self.style.WARNING("Full-text search requires SQLite; nothing to rebuild.")
+            )
+            return
+        with transaction.atomic():
+            count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} quizzes."))
@@ -0,0 +1,35 @@
+"""
+File: reconcile_quiz_counters.py
+
+Description: Management command that recomputes the denormalized counters of every quiz
+(question_count, total_points, attempt_count, score_sum; see counters.py) from the question
+and attempt tables in bulk, reports the counters that had drifted and corrects them. Run it
+after writing questions or attempts outside the application code, or with --dry-run to
+check that the counters are in sync.
+
+Usage:
+    python manage.py reconcile_quiz_counters [--dry-run]
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz_app.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recomputes the quiz counters and reports those that had drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report the drift, do not fix it."
+        )
+
+    def handle(self, *args, **options):
+        report = reconcile(fix=not options["dry_run"])
+        for quiz_id, field, stored, actual in report:
+            self.stdout.write(f"Quiz {quiz_id}: {field} was {stored}, actual {actual}")
+        quizzes = len({quiz_id for quiz_id, *_ in report})
+        verb = "Found" if options["dry_run"] else "Fixed"
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} {len(report)} drifted counters on {quizzes} quizzes.")
+        )
@@ -0,0 +1,65 @@
+"""
+File: sync_replicas.py
+
+Description: Management command that copies the primary SQLite database onto every replica
+listed in DATABASE_REPLICAS, using SQLite's online backup API. It stands in for replication
+when the router is tried locally with two database files: run it once, or with --interval to
+keep the replicas a few seconds behind the primary.
+
+Usage:
+    DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3 python manage.py sync_replicas
+    DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3 python manage.py sync_replicas --interval 2
+"""
+
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from quiz_app.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = "Copies the primary SQLite database onto the configured replicas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep copying every INTERVAL seconds instead of copying once.",
+        )
+
+    def handle(self, *args, **options):
+        databases = settings.DATABASES
+        replicas = replica_aliases()
+        if not replicas:
+            raise CommandError("No replicas configured; set DATABASE_REPLICA_URLS.")
+        for alias in [DEFAULT_DB_ALIAS, *replicas]:
+            if databases[alias]["ENGINE"] != "django.db.backends.sqlite3":
+                raise CommandError(f"Database '{alias}' is not SQLite.")
+
+        while True:
+            started = time.monotonic()
+            for alias in replicas:
+                self._copy(databases[DEFAULT_DB_ALIAS]["NAME"], databases[alias]["NAME"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Copied the primary to {len(replicas)} replica(s) in "
+                    f"{time.monotonic() - started:.3f}s."
+                )
+            )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
+
+    def _copy(self, source_name, target_name):
+        source = sqlite3.connect(source_name)
+        target = sqlite3.connect(target_name, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
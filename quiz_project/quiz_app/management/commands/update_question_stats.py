@@ -0,0 +1,50 @@
+"""
+File: update_question_stats.py
+
+Description: Management command that runs the question analytics job (see analytics.py).
+By default it only reads the answers recorded since the previous run, so it is cheap to run
+from cron every few minutes. --full recomputes every statistic from scratch, e.g. after
+attempts were deleted. On databases other than SQLite every run is a full recompute.
+
+Usage:
+    python manage.py update_question_stats [--full] [--chunk-size 50000]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.analytics import StatsConflict, update_question_stats
+
+
+class Command(BaseCommand):
+    help = "Updates the per-question answer statistics from the new user answers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute all statistics from scratch (always done on databases other "
+            "than SQLite).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=50000,
+            help="Number of user answers fetched from the database at a time.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            answers, questions = update_question_stats(
+                chunk_size=options["chunk_size"], full=options["full"]
+            )
+        except StatsConflict as error:
+            raise CommandError(str(error))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Read {answers} answers and updated the statistics of {questions} "
+                f"questions in {time.perf_counter() - started:.1f}s."
+            )
+        )
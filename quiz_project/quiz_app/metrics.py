@@ -0,0 +1,293 @@
+"""
+File: metrics.py
+
+Description: This file collects per-request performance metrics and renders them in the
+Prometheus text exposition format. For every request, RequestMetricsMiddleware (see
+middleware.py) records the following against the URL name that served it:
+- the wall time;
+- the number of database queries and the time spent in them, counted by an execute wrapper
+  installed on every database connection when it is opened;
+- the time spent rendering templates, measured by the InstrumentedDjangoTemplates backend.
+
+Values are kept in fixed-bucket histograms, so memory does not grow with traffic. Each
+server process keeps its own metrics.
+
+When QUIZ_SLOW_REQUEST_SECONDS is set, requests slower than that are logged to the
+"quiz_app.slow_requests" logger, together with their slowest SQL statements.
+
+Contents of this file:
+1. Histogram: Cumulative fixed-bucket histogram.
+2. RequestMetrics: The figures collected for one request.
+3. begin_request / end_request: Start and finish collecting for a request.
+4. InstrumentedDjangoTemplates: Template backend that times every render.
+5. render_prometheus: Returns every metric in Prometheus text format.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+slow_request_logger = logging.getLogger("quiz_app.slow_requests")
+
+# Bucket upper bounds, in seconds or queries
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+# Statements kept per request for the slow-request log
+SLOW_LOG_STATEMENTS = 10
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with a running sum and count, as exposed to Prometheus.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Returns (upper bound, observations <= bound) pairs, ending with "+Inf".
+        """
+        total, pairs = 0, []
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+# (name, help text, buckets) of the per-view histograms
+HISTOGRAMS = (
+    ("quiz_request_duration_seconds", "Wall time of requests.", DURATION_BUCKETS),
+    ("quiz_request_db_queries", "Database queries per request.", QUERY_BUCKETS),
+    ("quiz_request_db_duration_seconds", "Time spent in database queries.", DURATION_BUCKETS),
+    (
+        "quiz_request_template_duration_seconds",
+        "Time spent rendering templates.",
+        DURATION_BUCKETS,
+    ),
+)
+
+_lock = threading.Lock()
+_histograms = {name: {} for name, _, _ in HISTOGRAMS}
+_responses = defaultdict(int)  # (view, status) -> count
+
+
+class RequestMetrics:
+    """
+    Figures collected while a request is handled.
+
+    Attributes:
+        - queries: The number of database queries run.
+        - db_time: Seconds spent in those queries.
+        - template_time: Seconds spent rendering templates.
+        - statements: (seconds, alias, sql, params) of the slowest queries, kept only when
+          the slow-request log is enabled.
+    """
+
+    __slots__ = ("started", "queries", "db_time", "template_time", "statements", "keep_sql")
+
+    def __init__(self, keep_sql=False):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = []
+        self.keep_sql = keep_sql
+
+    def add_query(self, elapsed, alias, sql, params):
+        self.queries += 1
+        self.db_time += elapsed
+        if self.keep_sql:
+            self.statements.append((elapsed, alias, sql, params))
+            if len(self.statements) > SLOW_LOG_STATEMENTS * 2:
+                self.statements.sort(key=lambda statement: statement[0], reverse=True)
+                del self.statements[SLOW_LOG_STATEMENTS:]
+
+
+# A mutable object, so queries run in a sync_to_async worker thread are counted too
+_current = ContextVar("quiz_app_request_metrics", default=None)
+
+
+def _slow_request_seconds():
+    return getattr(settings, "QUIZ_SLOW_REQUEST_SECONDS", None)
+
+
+def begin_request():
+    """
+    Starts collecting metrics for the current request and returns the reset token.
+    """
+    return _current.set(RequestMetrics(keep_sql=_slow_request_seconds() is not None))
+
+
+def end_request(token, request, response):
+    """
+    Stops collecting for the current request and records its figures under its URL name.
+    """
+    metrics = _current.get()
+    _current.reset(token)
+    elapsed = time.perf_counter() - metrics.started
+
+    match = getattr(request, "resolver_match", None)
+    view = (match.url_name or match.view_name) if match else "unmatched"
+    status = response.status_code if response is not None else 500
+    values = (elapsed, metrics.queries, metrics.db_time, metrics.template_time)
+    with _lock:
+        for (name, _, buckets), value in zip(HISTOGRAMS, values):
+            histogram = _histograms[name].get(view)
+            if histogram is None:
+                histogram = _histograms[name][view] = Histogram(buckets)
+            histogram.observe(value)
+        _responses[(view, status)] += 1
+
+    threshold = _slow_request_seconds()
+    if threshold is not None and elapsed >= threshold:
+        _log_slow_request(request, view, status, elapsed, metrics)
+
+
+def _log_slow_request(request, view, status, elapsed, metrics):
+    statements = sorted(metrics.statements, key=lambda statement: statement[0], reverse=True)
+    lines = [
+        f"{seconds * 1000:.1f} ms [{alias}] {sql} {params!r}"
+        for seconds, alias, sql, params in statements[:SLOW_LOG_STATEMENTS]
+    ]
+    slow_request_logger.warning(
+        "Slow request %s %s (%s, status %s): %.1f ms, %d queries in %.1f ms, "
+        "templates %.1f ms. Slowest queries:\n%s",
+        request.method,
+        request.get_full_path(),
+        view,
+        status,
+        elapsed * 1000,
+        metrics.queries,
+        metrics.db_time * 1000,
+        metrics.template_time * 1000,
+        "\n".join(lines) or "(none)",
+    )
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Installs the query-timing wrapper on a newly opened database connection. Installing it
+    here rather than per request also covers connections opened in worker threads.
+    """
+    # The signal fires again each time a persistent connection is reopened
+    if not any(isinstance(w, _QueryTimer) for w in connection.execute_wrappers):
+        connection.execute_wrappers.append(_QueryTimer(connection.alias))
+
+
+class _QueryTimer:
+    __slots__ = ("alias",)
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        metrics = _current.get()
+        if metrics is None:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.add_query(time.perf_counter() - started, self.alias, sql, params)
+
+
+class _TimedTemplate:
+    """
+    Wraps a backend template so the time spent in render() is added to the request.
+    """
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self._template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, with the render time of every template recorded.
+    """
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+
+
+def _format_bound(bound):
+    return bound if isinstance(bound, str) else repr(float(bound))
+
+
+def render_prometheus():
+    """
+    Returns every metric of this process in Prometheus text exposition format (0.0.4).
+    """
+    with _lock:
+        snapshot = {
+            name: {
+                view: (histogram.cumulative(), histogram.sum, histogram.count)
+                for view, histogram in views.items()
+            }
+            for name, views in _histograms.items()
+        }
+        responses = dict(_responses)
+
+    lines = [
+        "# HELP quiz_requests_total Requests by URL name and response status.",
+        "# TYPE quiz_requests_total counter",
+    ]
+    for (view, status), count in sorted(responses.items()):
+        labels = _format_labels([("view", view), ("status", status)])
+        lines.append(f"quiz_requests_total{{{labels}}} {count}")
+
+    for name, help_text, _ in HISTOGRAMS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for view, (buckets, total, count) in sorted(snapshot[name].items()):
+            for bound, cumulative in buckets:
+                labels = _format_labels([("view", view), ("le", _format_bound(bound))])
+                lines.append(f"{name}_bucket{{{labels}}} {cumulative}")
+            labels = _format_labels([("view", view)])
+            lines.append(f"{name}_sum{{{labels}}} {total}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,126 @@
+"""
+File: middleware.py
+
+Description: This file contains the project's middleware.
+
+Middleware in this file:
+1. PrimaryPinningMiddleware: Keeps a user's reads on the primary database for a short
+   window after they wrote to it (see routers.py).
+2. RequestMetricsMiddleware: Records the wall time, database and template cost of each
+   request per URL name (see metrics.py).
+3. CachedAuthenticationMiddleware: AuthenticationMiddleware that loads request.user from
+   the user cache (see users.py).
+"""
+
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+from . import metrics, users
+from .routers import begin_request, end_request
+
+PIN_COOKIE = "quiz_primary_pin"
+
+
+class PrimaryPinningMiddleware:
+    """
+    Starts the routing state of each request. Requests carrying the pin cookie read from
+    the primary; requests that write to quiz_app data set the cookie for
+    QUIZ_PRIMARY_PIN_SECONDS so the user reads their own writes despite replica lag.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, "QUIZ_PRIMARY_PIN_SECONDS", 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = begin_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = end_request(token)
+        return self._set_cookie(response, state)
+
+    async def __acall__(self, request):
+        token = begin_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = end_request(token)
+        return self._set_cookie(response, state)
+
+    def _set_cookie(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=self.pin_seconds, httponly=True, samesite="Lax"
+            )
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Collects the metrics of each request. Place it first in MIDDLEWARE so the wall time
+    covers the other middleware too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = metrics.begin_request()
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token, request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = metrics.begin_request()
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token, request, response)
+        return response
+
+
+def _get_user(request):
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = users.get_user(request)
+    return request._cached_user
+
+
+async def _auser(request):
+    if not hasattr(request, "_acached_user"):
+        request._acached_user = await users.aget_user(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    Drop-in replacement for AuthenticationMiddleware that serves request.user and
+    request.auser() from the user cache instead of querying the User table.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _get_user(request))
+        request.auser = partial(_auser, request)
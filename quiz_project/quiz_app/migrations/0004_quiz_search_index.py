@@ -0,0 +1,52 @@
+# Creates the SQLite FTS5 index used by quiz_app/search.py
+
+from django.db import migrations
+
+CREATE_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS quiz_app_quizsearch USING fts5(
+        title, description, category, questions, answers,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+"""
+
+POPULATE_TABLE = """
+    INSERT INTO quiz_app_quizsearch (rowid, title, description, category, questions, answers)
+    SELECT
+        quiz.id,
+        quiz.title,
+        quiz.description,
+        quiz.category,
+        (SELECT group_concat(question.text, ' ')
+           FROM quiz_app_question AS question
+          WHERE question.quiz_id = quiz.id),
+        (SELECT group_concat(answer.text, ' ')
+           FROM quiz_app_answer AS answer
+           JOIN quiz_app_question AS question ON answer.question_id = question.id
+          WHERE question.quiz_id = quiz.id)
+    FROM quiz_app_quiz AS quiz
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE_TABLE)
+    schema_editor.execute(POPULATE_TABLE)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS quiz_app_quizsearch")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0003_quiz_catalogue_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:53
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def _aggregate(model, function, value="pk"):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(quiz_id=OuterRef("pk"))
+            .order_by()
+            .values("quiz_id")
+            .annotate(total=function(value))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    Quiz = apps.get_model("quiz_app", "Quiz")
+    Question = apps.get_model("quiz_app", "Question")
+    QuizAttempt = apps.get_model("quiz_app", "QuizAttempt")
+    Quiz.objects.update(
+        question_count=_aggregate(Question, Count),
+        total_points=_aggregate(Question, Sum, "points"),
+        attempt_count=_aggregate(QuizAttempt, Count),
+        score_sum=_aggregate(QuizAttempt, Sum, "score"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0007_question_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='attempt_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='score_sum',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='total_points',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Questions used to be saved with the "text" type and 0 points, and were all scored as one
+# point for a correct single answer. Make that explicit for the points-aware scoring engine
+# (see quiz_app/answer_keys.py), and refresh the counters and content versions it affects.
+
+from django.db import migrations
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def score_legacy_questions(apps, schema_editor):
+    Quiz = apps.get_model("quiz_app", "Quiz")
+    Question = apps.get_model("quiz_app", "Question")
+    legacy = Question.objects.filter(question_type="text") | Question.objects.filter(points=0)
+    quiz_ids = sorted(set(legacy.values_list("quiz_id", flat=True)))
+    Question.objects.filter(question_type="text").update(question_type="single")
+    Question.objects.filter(points=0).update(points=1)
+
+    total_points = Coalesce(
+        Subquery(
+            Question.objects.filter(quiz_id=OuterRef("pk"))
+            .order_by()
+            .values("quiz_id")
+            .annotate(total=Sum("points"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+    for start in range(0, len(quiz_ids), 900):
+        Quiz.objects.filter(pk__in=quiz_ids[start : start + 900]).update(
+            total_points=total_points,
+            content_version=F("content_version") + 1,
+            content_updated_at=timezone.now(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0008_quiz_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(score_legacy_questions, migrations.RunPython.noop),
+    ]
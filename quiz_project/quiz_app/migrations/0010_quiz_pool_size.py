@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0009_question_scoring'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='pool_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Questions drawn at random for each attempt. Leave empty to ask them all.', null=True),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('quiz_app', '0010_quiz_pool_size'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerQuizStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('best_score', models.IntegerField()),
+                ('last_completed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='player_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('current_streak', models.PositiveIntegerField(default=1)),
+                ('longest_streak', models.PositiveIntegerField(default=1)),
+                ('last_played_on', models.DateField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'completed_at', 'id'], name='attempt_user_completed_idx'),
+        ),
+        migrations.AddField(
+            model_name='playerquizstats',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='player_stats', to='quiz_app.quiz'),
+        ),
+        migrations.AddField(
+            model_name='playerquizstats',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='playerquizstats',
+            index=models.Index(fields=['user', '-last_completed_at'], name='player_quiz_recent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='playerquizstats',
+            constraint=models.UniqueConstraint(fields=('user', 'quiz'), name='unique_player_quiz_stats'),
+        ),
+    ]
@@ -17,6 +17,13 @@ description: this files define the database models for the Quiz application. The
             - difficulty: The difficulty level of the quiz (e.g., Easy, Medium, Hard).
             - owner: The user who created the quiz (ForeignKey to Django's User model).
             - created_at: The timestamp for when the quiz was created.
+            - content_version: Incremented whenever the quiz, its questions or their answers
+              change; keys the cached snapshot and rendered questions (see snapshots.py).
+            - content_updated_at: The timestamp of the last content change.
+            - question_count, total_points: The number of questions and the sum of their
+              points, maintained by counters.py.
+            - attempt_count, score_sum: The number of attempts and the sum of their
+              scores, maintained by counters.py.
         - Relationships:
             - One-to-Many with the Question model.
 2. Question:
@@ -24,7 +31,9 @@ description: this files define the database models for the Quiz application. The
         - Fields:
             - quiz: The quiz to which this question belongs (ForeignKey to Quiz).
             - text: The question text/content.
-            - question_type: The type of question (e.g., Multiple Choice, True/False).
+            - question_type: How the question is scored: "single" (one correct answer),
+              "multiple" (all correct answers must be selected), "multiple_partial"
+              (partial credit per correct answer) or "true_false". See answer_keys.py.
             - points: The number of points awarded for correctly answering the question.
         - Relationships:
             - One-to-Many with the Answer model.
@@ -46,6 +55,7 @@ description: this files define the database models for the Quiz application. The
             - completed_at: The timestamp for when the quiz attempt was completed.
         - Relationships:
             - Belongs to a single User and a single Quiz.
+        - Indexed on (user, completed_at, id) for the keyset-paginated attempt history.
 5. UserAnswer:
         - Tracks a user's answer to a specific question in a quiz attempt.
         - Fields:
@@ -55,10 +65,57 @@ description: this files define the database models for the Quiz application. The
             - is_correct: Boolean indicating whether the selected answer is correct.
         - Relationships:
             - Belongs to a single QuizAttempt and a single Question.
+6. LeaderboardEntry:
+        - One of the top attempts at a quiz, maintained incrementally by leaderboards.py.
+        - Fields:
+            - quiz: The quiz of the leaderboard (ForeignKey to Quiz).
+            - attempt: The attempt being ranked (OneToOne to QuizAttempt).
+            - user, score, time_taken, completed_at: Copied from the attempt for display.
+7. ScoreBucket:
+        - One bar of a quiz's score histogram, used for percentile lookups.
+        - Fields:
+            - quiz: The quiz of the histogram (ForeignKey to Quiz).
+            - score: The score this bucket counts.
+            - attempts: The number of attempts at the quiz that achieved this score.
+8. QuestionStats:
+        - Per-question answer statistics, maintained by the analytics job in analytics.py.
+        - Fields:
+            - question: The question described (OneToOne to Question, primary key).
+            - quiz: The quiz of the question (ForeignKey to Quiz).
+            - responses / correct: The number of answers given, and of correct ones.
+            - score_sum, score_squares, correct_score_sum: Sums of the attempt score, of its
+              square and of the score of the correct responses, from which the
+              discrimination index is derived.
+            - choice_counts: Answer id -> number of times it was selected.
+            - updated_at: When the statistics were last updated.
+9. StatsWatermark:
+        - The last UserAnswer id included in a batch job's results.
+        - Fields:
+            - name: The name of the job (primary key).
+            - last_id: The highest UserAnswer id processed so far.
+            - updated_at: When the job last completed.
+10. PlayerQuizStats:
+        - A player's rollup of their attempts at one quiz, maintained by history.py.
+        - Fields:
+            - user / quiz: The player and the quiz (unique together).
+            - attempts: The number of attempts of the player at the quiz.
+            - best_score: Their best score at the quiz.
+            - last_completed_at: When they last completed the quiz.
+11. PlayerStats:
+        - A player's daily play streaks, maintained by history.py.
+        - Fields:
+            - user: The player (OneToOne to User, primary key).
+            - current_streak: The number of consecutive days with an attempt, up to
+              last_played_on.
+            - longest_streak: The longest such run.
+            - last_played_on: The last day (in TIME_ZONE) with an attempt.
 """
 
+import math
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Quiz(models.Model):
@@ -68,12 +125,72 @@ class Quiz(models.Model):
     difficulty = models.CharField(max_length=50)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="quizzes")
     created_at = models.DateTimeField(auto_now_add=True)
+    content_version = models.PositiveIntegerField(default=1, editable=False)
+    content_updated_at = models.DateTimeField(default=timezone.now, editable=False)
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    total_points = models.IntegerField(default=0, editable=False)
+    attempt_count = models.PositiveIntegerField(default=0, editable=False)
+    score_sum = models.BigIntegerField(default=0, editable=False)
+    pool_size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Questions drawn at random for each attempt. Leave empty to ask them all.",
+    )
+
+    # Only ever changed with F() updates by snapshots.bump_content_version
+    CONTENT_FIELDS = ("content_version", "content_updated_at")
+    # Only ever changed with F() updates by counters.py
+    COUNTER_FIELDS = ("question_count", "total_points", "attempt_count", "score_sum")
+
+    class Meta:
+        # Composite indexes backing the keyset-paginated catalogue and its filters
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="quiz_created_idx"),
+            models.Index(
+                fields=["category", "created_at", "id"], name="quiz_category_created_idx"
+            ),
+            models.Index(
+                fields=["difficulty", "created_at", "id"],
+                name="quiz_difficulty_created_idx",
+            ),
+            models.Index(
+                fields=["category", "difficulty", "created_at", "id"],
+                name="quiz_cat_diff_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Never write back a content version read before the last bump, which would let
+        # a stale cached snapshot be served again for the reused version number, nor
+        # counters read before concurrent increments
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            derived = self.CONTENT_FIELDS + self.COUNTER_FIELDS
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in derived
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def average_score(self):
+        if not self.attempt_count:
+            return None
+        return self.score_sum / self.attempt_count
+
 
 class Question(models.Model):
+    SINGLE_CHOICE = "single"
+    MULTIPLE_CHOICE = "multiple"
+    MULTIPLE_CHOICE_PARTIAL = "multiple_partial"
+    TRUE_FALSE = "true_false"
+    QUESTION_TYPES = (SINGLE_CHOICE, MULTIPLE_CHOICE, MULTIPLE_CHOICE_PARTIAL, TRUE_FALSE)
+    # Types answered with checkboxes rather than radio buttons
+    MULTI_SELECT_TYPES = (MULTIPLE_CHOICE, MULTIPLE_CHOICE_PARTIAL)
+
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="questions")
     text = models.TextField()
     question_type = models.CharField(max_length=50)
@@ -101,6 +218,12 @@ class QuizAttempt(models.Model):
     time_taken = models.IntegerField()
     completed_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Backs the keyset-paginated attempt history of a player, newest first
+        indexes = [
+            models.Index(fields=["user", "completed_at", "id"], name="attempt_user_completed_idx")
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s attempt at {self.quiz.title}"
 
@@ -129,3 +252,144 @@ class UserAnswer(models.Model):
 
     def __str__(self):
         return f"{self.quiz_attempt.user.username}'s answer to '{self.question.text}'"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    One of the top-N attempts at a quiz.
+    """
+
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="leaderboard")
+    attempt = models.OneToOneField(QuizAttempt, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    score = models.IntegerField()
+    time_taken = models.IntegerField()
+    completed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-score", "time_taken", "completed_at", "attempt_id"]
+        indexes = [
+            models.Index(fields=["quiz", "-score", "time_taken"], name="leaderboard_rank_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.score} points on quiz {self.quiz_id}"
+
+
+class ScoreBucket(models.Model):
+    """
+    Number of attempts at a quiz that achieved a given score.
+    """
+
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="score_buckets")
+    score = models.IntegerField()
+    attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["quiz", "score"], name="unique_quiz_score_bucket")
+        ]
+
+    def __str__(self):
+        return f"{self.attempts} attempts scored {self.score} on quiz {self.quiz_id}"
+
+
+class QuestionStats(models.Model):
+    """
+    Answer statistics of a question, kept as sums so they can be updated incrementally.
+    """
+
+    question = models.OneToOneField(
+        Question, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="question_stats")
+    responses = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    score_squares = models.FloatField(default=0)
+    correct_score_sum = models.FloatField(default=0)
+    choice_counts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Statistics of question {self.question_id}"
+
+    @property
+    def percent_correct(self):
+        if not self.responses:
+            return None
+        return 100 * self.correct / self.responses
+
+    @property
+    def discrimination(self):
+        """
+        The point-biserial correlation between answering this question correctly and the
+        attempt score, or None while it is undefined (no responses, or no variation).
+        """
+        n, x, y = self.responses, self.correct, self.score_sum
+        numerator = n * self.correct_score_sum - x * y
+        denominator = (n * x - x * x) * (n * self.score_squares - y * y)
+        if denominator <= 0:
+            return None
+        return numerator / math.sqrt(denominator)
+
+
+class StatsWatermark(models.Model):
+    """
+    High-water mark of an incremental batch job over the UserAnswer table.
+    """
+
+    name = models.CharField(max_length=100, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} up to answer {self.last_id}"
+
+
+class PlayerQuizStats(models.Model):
+    """
+    Attempts and best score of a player at one quiz.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="quiz_stats")
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="player_stats")
+    attempts = models.PositiveIntegerField(default=0)
+    best_score = models.IntegerField()
+    last_completed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "quiz"], name="unique_player_quiz_stats")
+        ]
+        indexes = [
+            models.Index(fields=["user", "-last_completed_at"], name="player_quiz_recent_idx")
+        ]
+
+    def __str__(self):
+        return f"Attempts of user {self.user_id} at quiz {self.quiz_id}"
+
+
+class PlayerStats(models.Model):
+    """
+    Daily play streaks of a player.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="player_stats"
+    )
+    current_streak = models.PositiveIntegerField(default=1)
+    longest_streak = models.PositiveIntegerField(default=1)
+    last_played_on = models.DateField()
+
+    def __str__(self):
+        return f"Streaks of user {self.user_id}"
+
+    @property
+    def streak(self):
+        """
+        The current streak as of today: 0 once a whole day has passed without an attempt.
+        """
+        if (timezone.localdate() - self.last_played_on).days > 1:
+            return 0
+        return self.current_streak
@@ -0,0 +1,164 @@
+"""
+File: pagination.py
+
+Description: This file implements cursor (keyset) pagination. Instead of OFFSET, each page
+is selected with a "seek" condition on the ordering columns of the last row of the previous
+page, so with a matching composite index every page costs the same no matter how deep the
+user has scrolled. Cursors are opaque, URL-safe strings.
+
+Contents of this file:
+1. KeysetPage: The rows of one page and the cursor of the next page.
+2. encode_cursor / decode_cursor: Convert an ordering key to and from its string form.
+3. keyset_paginate: Returns one page of a queryset ordered newest first.
+   akeyset_paginate is its async counterpart.
+4. encode_id_cursor / decode_id_cursor / id_paginate: The same for a queryset in ascending
+   primary key order, such as the questions of a quiz. aid_paginate is the async counterpart.
+"""
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    A single page of results.
+
+    Attributes:
+        - object_list: The rows on this page.
+        - next_cursor: The cursor of the following page, or None on the last page.
+    """
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(timestamp, pk):
+    """
+    Encodes a (timestamp, primary key) ordering key as a URL-safe cursor.
+    """
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor into a (timestamp, primary key) tuple, or None if it is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _seek(queryset, cursor, page_size, field):
+    position = decode_cursor(cursor)
+    if position is not None:
+        timestamp, pk = position
+        queryset = queryset.filter(
+            Q(**{f"{field}__lt": timestamp}) | Q(**{field: timestamp, "id__lt": pk})
+        )
+    # Fetch one extra row to find out whether another page follows
+    return queryset.order_by(f"-{field}", "-id")[: page_size + 1]
+
+
+def _page(rows, page_size, field):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return KeysetPage(rows, next_cursor)
+
+
+def keyset_paginate(queryset, cursor, page_size, field="created_at"):
+    """
+    Returns one page of a queryset ordered by (field, id), newest first.
+    Parameters:
+        queryset: The filtered queryset to paginate.
+        cursor: The cursor string from the previous page, or None for the first page.
+        page_size: The number of rows per page.
+        field: The timestamp column that leads the ordering.
+    Returns:
+        KeysetPage: The rows of the page and the cursor of the next page.
+    """
+    rows = list(_seek(queryset, cursor, page_size, field))
+    return _page(rows, page_size, field)
+
+
+async def akeyset_paginate(queryset, cursor, page_size, field="created_at"):
+    """
+    Async version of keyset_paginate.
+    """
+    rows = [row async for row in _seek(queryset, cursor, page_size, field)]
+    return _page(rows, page_size, field)
+
+
+def encode_id_cursor(pk):
+    """
+    Encodes a primary key as a URL-safe cursor.
+    """
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip("=")
+
+
+def decode_id_cursor(cursor):
+    """
+    Decodes a cursor into a primary key, or None if it is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _seek_id(queryset, cursor, page_size):
+    after = decode_id_cursor(cursor)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    return queryset.order_by("id")[: page_size + 1]
+
+
+def _id_page(rows, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_id_cursor(rows[-1].pk)
+    return KeysetPage(rows, next_cursor)
+
+
+def id_paginate(queryset, cursor, page_size):
+    """
+    Returns one page of a queryset in ascending primary key order.
+    Parameters:
+        queryset: The filtered queryset to paginate.
+        cursor: The cursor string from the previous page, or None for the first page.
+        page_size: The number of rows per page.
+    Returns:
+        KeysetPage: The rows of the page and the cursor of the next page.
+    """
+    return _id_page(list(_seek_id(queryset, cursor, page_size)), page_size)
+
+
+async def aid_paginate(queryset, cursor, page_size):
+    """
+    Async version of id_paginate.
+    """
+    return _id_page([row async for row in _seek_id(queryset, cursor, page_size)], page_size)
@@ -0,0 +1,208 @@
+"""
+File: pools.py
+
+Description: This file draws the random question subsets of pooled quizzes. A quiz with a
+pool_size is played with that many questions picked at random from all of its questions,
+a different subset per attempt, without an ORDER BY RANDOM() that would sort the whole pool
+on every page view.
+
+The ids of a quiz's questions are cached as a compact array under the quiz's content version,
+so a change to its questions makes the next draw read a fresh array while the old one simply
+expires. A draw picks pool_size ids from that array with random.Random(seed).sample, and only
+the picked questions are fetched, with their answers prefetched.
+
+The seed is not stored anywhere: it travels in the signed attempt token of the attempt (see
+attempt_tokens.py) together with the content version and pool size it was drawn with, and
+submit_quiz replays the draw from the token to grade exactly the questions that were served.
+The questions of an older version are not kept, so an attempt started before the quiz was
+edited cannot be replayed and is rejected. For the same reason an id array is only cached
+when the quiz is still at the requested version after the ids were read.
+
+The "a"-prefixed functions are the async counterparts used by async_views.py.
+
+Functions in this file:
+1. question_ids: Returns the cached question id array of a quiz version.
+2. sample_question_ids: Picks the ids of a draw from the array with a seeded RNG.
+3. draw_questions: Fetches the questions drawn by a seed, in draw order.
+4. drawn_question_ids: Replays the draw of a submitted attempt.
+"""
+
+import random
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
+
+from .models import Answer, Question, Quiz
+
+# Ids per "IN (...)" lookup, below SQLite's bound parameter limit
+IN_BATCH = 900
+
+
+def _ids_key(quiz_id, version):
+    return f"quiz_app:question_ids:{quiz_id}:{version}"
+
+
+def _timeout():
+    return getattr(settings, "QUIZ_POOL_CACHE_TIMEOUT", 86400)
+
+
+def _id_rows(quiz_id):
+    # The array is cached for the lifetime of a version, so it is read from the primary
+    # rather than a possibly lagging replica
+    return (
+        Question.objects.using(DEFAULT_DB_ALIAS)
+        .filter(quiz_id=quiz_id)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def _version_row(quiz_id):
+    return (
+        Quiz.objects.using(DEFAULT_DB_ALIAS)
+        .filter(pk=quiz_id)
+        .values_list("content_version", flat=True)
+    )
+
+
+def question_ids(quiz_id, version):
+    """
+    Returns the ids of every question of a quiz, in id order, as an array of 64-bit ints.
+    Parameters:
+        quiz_id: The ID of the quiz.
+        version: The content version the caller read, usually quiz.content_version.
+    """
+    ids = cache.get(_ids_key(quiz_id, version))
+    if ids is None:
+        ids = array("q", _id_rows(quiz_id))
+        # Never cache the ids under a version other than the one they were read at
+        if _version_row(quiz_id).first() == version:
+            cache.set(_ids_key(quiz_id, version), ids, _timeout())
+    return ids
+
+
+async def aquestion_ids(quiz_id, version):
+    """
+    Async version of question_ids.
+    """
+    ids = await cache.aget(_ids_key(quiz_id, version))
+    if ids is None:
+        ids = array("q", [question_id async for question_id in _id_rows(quiz_id)])
+        if await _version_row(quiz_id).afirst() == version:
+            await cache.aset(_ids_key(quiz_id, version), ids, _timeout())
+    return ids
+
+
+def sample_question_ids(ids, pool_size, seed):
+    """
+    Returns pool_size ids picked at random from ids (all of them, shuffled, if there are
+    fewer), always the same ones for the same seed.
+    """
+    return random.Random(seed).sample(ids, min(pool_size, len(ids)))
+
+
+def _questions_queryset(ids):
+    answers = Answer.objects.only("id", "question_id", "text").order_by("id")
+    return (
+        Question.objects.filter(id__in=ids)
+        .only("id", "text", "question_type", "points")
+        .prefetch_related(Prefetch("answers", queryset=answers))
+    )
+
+
+def _as_snapshot(question):
+    # Same shape as the questions of a content snapshot, so _quiz_questions.html renders both
+    return {
+        "id": question.id,
+        "text": question.text,
+        "type": question.question_type,
+        "points": question.points,
+        "answers": [
+            {"id": answer.id, "text": answer.text} for answer in question.answers.all()
+        ],
+    }
+
+
+def _in_draw_order(ids, questions):
+    by_id = {question["id"]: question for question in questions}
+    # Questions deleted since the id array was cached are left out
+    return [by_id[question_id] for question_id in ids if question_id in by_id]
+
+
+def draw_questions(quiz, seed):
+    """
+    Draws the questions of a new attempt at a pooled quiz.
+    Parameters:
+        quiz: The Quiz being played, with a pool_size.
+        seed: The seed of the draw, from the attempt token.
+    Returns:
+        list: The drawn questions in draw order, as dicts shaped like the questions of a
+        content snapshot.
+    """
+    ids = sample_question_ids(
+        question_ids(quiz.id, quiz.content_version), quiz.pool_size, seed
+    )
+    questions = []
+    for start in range(0, len(ids), IN_BATCH):
+        questions.extend(
+            _as_snapshot(question)
+            for question in _questions_queryset(ids[start : start + IN_BATCH])
+        )
+    return _in_draw_order(ids, questions)
+
+
+async def adraw_questions(quiz, seed):
+    """
+    Async version of draw_questions.
+    """
+    ids = sample_question_ids(
+        await aquestion_ids(quiz.id, quiz.content_version), quiz.pool_size, seed
+    )
+    questions = []
+    for start in range(0, len(ids), IN_BATCH):
+        questions.extend(
+            [
+                _as_snapshot(question)
+                async for question in _questions_queryset(ids[start : start + IN_BATCH])
+            ]
+        )
+    return _in_draw_order(ids, questions)
+
+
+def _check_version(attempt, quiz):
+    if attempt.version != quiz.content_version:
+        raise ValidationError(
+            "This quiz has changed since your attempt started. Reload the quiz to start again."
+        )
+
+
+def drawn_question_ids(attempt, quiz):
+    """
+    Replays the draw of a submitted attempt.
+    Parameters:
+        attempt: The redeemed AttemptToken of the attempt.
+        quiz: The Quiz being submitted.
+    Returns:
+        list: The ids of the questions that were served, in draw order.
+    Raises:
+        ValidationError: If the quiz changed since the attempt started, so that the draw
+        cannot be replayed.
+    """
+    _check_version(attempt, quiz)
+    return sample_question_ids(
+        question_ids(attempt.quiz_id, attempt.version), attempt.pool_size, attempt.seed
+    )
+
+
+async def adrawn_question_ids(attempt, quiz):
+    """
+    Async version of drawn_question_ids.
+    """
+    _check_version(attempt, quiz)
+    return sample_question_ids(
+        await aquestion_ids(attempt.quiz_id, attempt.version), attempt.pool_size, attempt.seed
+    )
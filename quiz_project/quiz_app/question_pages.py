@@ -0,0 +1,152 @@
+"""
+File: question_pages.py
+
+Description: This file serves the questions of a quiz one page at a time, for quizzes too
+large to be rendered or downloaded in one document. Pages are keyset-paginated on the
+question id (see pagination.py), so every page costs the same two queries, one for the
+questions and one prefetching their answers, however deep the client has read.
+
+Pages are cached per (quiz, content version, cursor), like snapshots (see snapshots.py): a
+change to the quiz bumps its version, so the next request builds fresh pages and the old ones
+simply expire. The JSON form of a page uses short keys to keep large quizzes light:
+
+    {"v": content version,
+     "q": [{"i": question id, "t": text, "k": question type, "p": points,
+            "a": [[answer id, answer text], ...]}, ...],
+     "n": cursor of the next page, or null on the last page}
+
+The quiz_questions endpoint serves this document, and the progressive mode of play_quiz
+renders the first page on the server and lets static/play_quiz.js fetch the others.
+
+Contents of this file:
+1. QuestionPage: One cached page of questions.
+2. get_question_page: Returns a page of a quiz's questions, building and caching it on a miss.
+   aget_question_page is its async counterpart.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Prefetch
+
+from .models import Answer, Question
+from .pagination import aid_paginate, decode_id_cursor, id_paginate
+
+
+class QuestionPage:
+    """
+    One page of the questions of a quiz version.
+
+    Attributes:
+        - version: The content version the page was requested for.
+        - questions: The questions of the page, in their compact form.
+        - next_cursor: The cursor of the next page, or None on the last page.
+    """
+
+    __slots__ = ("version", "questions", "next_cursor")
+
+    def __init__(self, version, questions, next_cursor):
+        self.version = version
+        self.questions = questions
+        self.next_cursor = next_cursor
+
+    @property
+    def body(self):
+        document = {"v": self.version, "q": self.questions, "n": self.next_cursor}
+        return json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode()
+
+    def expanded(self):
+        """
+        Returns the questions shaped like the questions of a content snapshot, for
+        fragments.render_questions.
+        """
+        return [
+            {
+                "id": question["i"],
+                "text": question["t"],
+                "type": question["k"],
+                "points": question["p"],
+                "answers": [
+                    {"id": answer_id, "text": text} for answer_id, text in question["a"]
+                ],
+            }
+            for question in self.questions
+        ]
+
+
+def _page_size():
+    return getattr(settings, "QUIZ_QUESTION_PAGE_SIZE", 50)
+
+
+def _cache_key(quiz_id, version, cursor):
+    # Keyed on the decoded cursor, so that arbitrary client input never ends up in a key
+    after = decode_id_cursor(cursor)
+    return f"quiz_app:question_page:{quiz_id}:{version}:{_page_size()}:{after or 0}"
+
+
+def _timeout():
+    return getattr(settings, "QUIZ_SNAPSHOT_CACHE_TIMEOUT", 86400)
+
+
+def _questions(quiz_id):
+    # Pages are cached for the lifetime of a version, so they are read from the primary
+    # rather than a possibly lagging replica
+    answers = Answer.objects.only("id", "question_id", "text").order_by("id")
+    return (
+        Question.objects.using(DEFAULT_DB_ALIAS)
+        .filter(quiz_id=quiz_id)
+        .only("id", "text", "question_type", "points")
+        .prefetch_related(Prefetch("answers", queryset=answers))
+    )
+
+
+def _compact(version, page):
+    return QuestionPage(
+        version,
+        [
+            {
+                "i": question.id,
+                "t": question.text,
+                "k": question.question_type,
+                "p": question.points,
+                "a": [[answer.id, answer.text] for answer in question.answers.all()],
+            }
+            for question in page
+        ],
+        page.next_cursor,
+    )
+
+
+def get_question_page(quiz_id, version, cursor=None):
+    """
+    Returns one page of the questions of a quiz, from the cache when possible.
+    Parameters:
+        quiz_id: The ID of the quiz.
+        version: The content version the caller read, usually quiz.content_version.
+        cursor: The cursor of the page, or None for the first page. Malformed cursors are
+            treated as None.
+    Returns:
+        QuestionPage: The page, empty if the quiz has no (more) questions.
+    """
+    key = _cache_key(quiz_id, version, cursor)
+    page = cache.get(key)
+    if page is None:
+        page = _compact(version, id_paginate(_questions(quiz_id), cursor, _page_size()))
+        cache.set(key, page, _timeout())
+    return page
+
+
+async def aget_question_page(quiz_id, version, cursor=None):
+    """
+    Async version of get_question_page.
+    """
+    key = _cache_key(quiz_id, version, cursor)
+    page = await cache.aget(key)
+    if page is None:
+        page = _compact(
+            version, await aid_paginate(_questions(quiz_id), cursor, _page_size())
+        )
+        await cache.aset(key, page, _timeout())
+    return page
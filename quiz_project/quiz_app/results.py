@@ -0,0 +1,124 @@
+"""
+File: results.py
+
+Description: This file builds the per-question breakdown shown on the results page of a quiz
+attempt: for every question that was served, the answers the player selected, the correct
+answers and the points earned. The page is addressed by attempt id and shows what was
+stored when the attempt was recorded, so the score cannot be forged through the URL.
+
+The breakdown is loaded with a fixed query plan, whatever the size of the quiz: one query for
+the responses of the attempt with their question and selected answer (select_related), and
+one prefetching the correct answers of those questions. Whether each selected answer was
+right is the is_correct stored with the response. Only the score of the attempt is stored,
+so the points earned per question are recomputed with the quiz's cached answer key (see
+answer_keys.py), and the correct answers are the current ones. Both can contradict the
+attempt once the quiz has been edited: the per-question points are then only shown if they
+still add up to the stored score.
+
+The rendered breakdown is cached per attempt and content version of its quiz, so an edit to
+the quiz makes the next view render it again. Entries of deleted attempts are never read,
+since the results view only looks them up for existing attempts, and simply expire.
+
+Functions in this file:
+1. attempt_breakdown: Loads the per-question breakdown of an attempt.
+2. results_fragment: Returns the rendered breakdown of an attempt, using the cache.
+   aresults_fragment is its async counterpart.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+
+from .answer_keys import answer_keys
+from .models import Answer
+
+
+def _cache_key(attempt):
+    return f"quiz_app:attempt_results:{attempt.id}:{attempt.quiz.content_version}"
+
+
+def _timeout():
+    return getattr(settings, "QUIZ_RESULTS_CACHE_TIMEOUT", 86400)
+
+
+def _responses(attempt):
+    correct = Answer.objects.filter(is_correct=True).order_by("id")
+    return (
+        attempt.user_answers.select_related("question", "selected_answer")
+        .prefetch_related(
+            Prefetch("question__answers", queryset=correct, to_attr="correct")
+        )
+        .order_by("id")
+    )
+
+
+def attempt_breakdown(attempt):
+    """
+    Returns the per-question breakdown of an attempt.
+    Parameters:
+        attempt: The QuizAttempt, with its quiz loaded.
+    Returns:
+        tuple: The rows of the breakdown, one dict per question in the order they were
+        answered (question, selected (answer, is_correct) pairs, correct answers, points
+        earned), the total points of the questions served, and whether the points
+        recomputed with the current answer key add up to the stored score. When they do
+        not, the quiz was edited since the attempt and the points of each row are None.
+    """
+    rows = {}
+    selections = {}
+    for response in _responses(attempt):
+        question = response.question
+        row = rows.get(question.id)
+        if row is None:
+            row = rows[question.id] = {
+                "question": question,
+                "selected": [],
+                "correct": question.correct,
+            }
+            selections[f"question_{question.id}"] = []
+        if response.selected_answer is not None:
+            row["selected"].append((response.selected_answer, response.is_correct))
+            selections[f"question_{question.id}"].append(str(response.selected_answer_id))
+
+    answer_key = answer_keys.get(attempt.quiz_id, attempt.quiz.content_version)
+    earned = answer_key.points_by_question(selections, list(rows))
+    consistent = sum(earned.values()) == attempt.score
+    for question_id, row in rows.items():
+        row["earned"] = earned.get(question_id, 0) if consistent else None
+    return list(rows.values()), answer_key.max_score_for(list(rows)), consistent
+
+
+def _render(attempt):
+    breakdown, total, consistent = attempt_breakdown(attempt)
+    return render_to_string(
+        "_attempt_breakdown.html",
+        {"attempt": attempt, "breakdown": breakdown, "total": total, "consistent": consistent},
+    )
+
+
+def results_fragment(attempt):
+    """
+    Returns the rendered score and per-question breakdown of an attempt.
+    Parameters:
+        attempt: The QuizAttempt, with its quiz loaded.
+    Returns:
+        str: The HTML of the breakdown, served from the cache when possible.
+    """
+    html = cache.get(_cache_key(attempt))
+    if html is None:
+        html = _render(attempt)
+        cache.set(_cache_key(attempt), html, _timeout())
+    return html
+
+
+async def aresults_fragment(attempt):
+    """
+    Async version of results_fragment.
+    """
+    html = await cache.aget(_cache_key(attempt))
+    if html is None:
+        html = await sync_to_async(_render)(attempt)
+        await cache.aset(_cache_key(attempt), html, _timeout())
+    return html
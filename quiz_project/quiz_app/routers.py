@@ -0,0 +1,118 @@
+"""
+File: routers.py
+
+Description: This file implements the database router that spreads quiz browsing over read
+replicas. Reads of quiz content (Quiz, Question and Answer) go to one of the aliases listed in
+the DATABASE_REPLICAS setting; every write, and every read of any other model, goes to the
+primary ("default") database.
+
+Replicas may lag behind the primary, so reads are pinned to the primary:
+- inside a transaction on the primary, so a transaction sees its own writes;
+- for the rest of a request after it wrote to quiz_app data;
+- for QUIZ_PRIMARY_PIN_SECONDS after such a request, through a cookie set by
+  PrimaryPinningMiddleware (see middleware.py), so the user's next page views see the
+  quiz they just created or the attempt they just submitted.
+
+Code that fills long-lived caches from quiz content reads from the primary explicitly, so a
+lagging replica cannot be cached.
+
+Contents of this file:
+1. RoutingState: Per-request pinning state, held in a context variable.
+2. begin_request / end_request: Set up and tear down the state around a request.
+3. PrimaryReplicaRouter: The router listed in DATABASE_ROUTERS.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Models whose reads may be served by a replica
+REPLICATED_MODELS = {"quiz_app.quiz", "quiz_app.question", "quiz_app.answer"}
+
+
+class RoutingState:
+    """
+    Routing state of one request.
+
+    Attributes:
+        - pinned: Whether reads go to the primary.
+        - wrote: Whether the request wrote quiz_app data, so the pin cookie must be set.
+    """
+
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# The state is a mutable object, so writes made in a sync_to_async worker thread are
+# visible to the middleware that set it.
+_state = ContextVar("quiz_app_routing_state", default=None)
+
+
+def begin_request(pinned=False):
+    """
+    Starts a new routing state for the current request and returns the reset token.
+    """
+    return _state.set(RoutingState(pinned))
+
+
+def end_request(token):
+    """
+    Ends the routing state started by begin_request and returns it.
+    """
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def primary_pinned():
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+def replica_aliases():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+class PrimaryReplicaRouter:
+    """
+    Routes reads of quiz content to a random replica and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in REPLICATED_MODELS:
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Follow relations on the database the instance was loaded from
+            return instance._state.db
+        replicas = replica_aliases()
+        if (
+            not replicas
+            or primary_pinned()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == "quiz_app":
+            state = _state.get()
+            if state is not None:
+                state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary through replication
+        return db == DEFAULT_DB_ALIAS
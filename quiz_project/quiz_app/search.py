@@ -0,0 +1,175 @@
+"""
+File: search.py
+
+Description: This file implements full-text search over quizzes using an SQLite FTS5 virtual
+table. Each quiz has one row in the index, keyed by the quiz id, holding its title,
+description, category and the concatenated text of its questions and answers. Results are
+ranked with bm25, weighting title matches highest, and the last search term is matched as a
+prefix so that results appear while the user is still typing.
+
+The index is kept in sync incrementally: signals.py reindexes a quiz whenever the quiz, one
+of its questions or one of their answers is saved or deleted, and the bulk authoring pipeline
+reindexes the quiz it has just written. The rebuild_search_index management command rebuilds
+the whole index with a single INSERT ... SELECT.
+
+On databases other than SQLite the index is not maintained and search falls back to a
+case-insensitive match on the quiz title and description.
+
+Functions in this file:
+1. index_quizzes: Rebuilds the index rows of the given quizzes, removing deleted ones.
+2. rebuild_index: Rebuilds the whole index in bulk.
+3. search_quizzes: Returns the ranked quizzes matching a query.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Quiz
+
+TABLE = "quiz_app_quizsearch"
+
+# bm25 weights of the title, description, category, questions and answers columns
+BM25_WEIGHTS = (10.0, 4.0, 2.0, 2.0, 1.0)
+
+TERM_RE = re.compile(r"\w+\*?", re.UNICODE)
+
+# Snippet delimiters that cannot appear in user text; replaced by <mark> after escaping
+MARK_OPEN, MARK_CLOSE = "\x02", "\x03"
+
+# Aggregates one index row per quiz; shared by incremental updates and full rebuilds
+DOCUMENT_SELECT = f"""
+    SELECT
+        quiz.id,
+        quiz.title,
+        quiz.description,
+        quiz.category,
+        (SELECT group_concat(question.text, ' ')
+           FROM quiz_app_question AS question
+          WHERE question.quiz_id = quiz.id),
+        (SELECT group_concat(answer.text, ' ')
+           FROM quiz_app_answer AS answer
+           JOIN quiz_app_question AS question ON answer.question_id = question.id
+          WHERE question.quiz_id = quiz.id)
+    FROM quiz_app_quiz AS quiz
+"""
+
+
+class SearchResult:
+    """
+    A quiz matched by a search.
+
+    Attributes:
+        - quiz: The matching Quiz.
+        - rank: The bm25 score (lower is better), or None for fallback results.
+        - snippet: Highlighted HTML excerpt of the best-matching text.
+    """
+
+    def __init__(self, quiz, rank=None, snippet=""):
+        self.quiz = quiz
+        self.rank = rank
+        self.snippet = snippet
+
+
+def is_enabled():
+    return connection.vendor == "sqlite"
+
+
+def index_quizzes(quiz_ids):
+    """
+    Rebuilds the index rows of the given quizzes from their current content.
+    Parameters:
+        quiz_ids: The IDs of the quizzes to reindex. Deleted quizzes are removed.
+    """
+    quiz_ids = [quiz_id for quiz_id in quiz_ids if quiz_id is not None]
+    if not quiz_ids or not is_enabled():
+        return
+    placeholders = ", ".join(["%s"] * len(quiz_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", quiz_ids)
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, title, description, category, questions, answers) "
+            f"{DOCUMENT_SELECT} WHERE quiz.id IN ({placeholders})",
+            quiz_ids,
+        )
+
+
+def rebuild_index():
+    """
+    Rebuilds the whole search index in bulk and optimizes it.
+    Returns:
+        int: The number of quizzes indexed.
+    """
+    if not is_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, title, description, category, questions, answers) "
+            f"{DOCUMENT_SELECT}"
+        )
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+def build_match_query(query):
+    """
+    Turns user input into an FTS5 MATCH expression.
+
+    Every term is quoted so that FTS5 operators typed by the user are treated as text. The
+    last term, and any term ending in "*", is matched as a prefix.
+    """
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return None
+    parts = []
+    for position, term in enumerate(terms):
+        word = term.rstrip("*")
+        prefix = term.endswith("*") or position == len(terms) - 1
+        parts.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(parts)
+
+
+def _highlight(snippet):
+    html = escape(snippet or "")
+    return mark_safe(html.replace(MARK_OPEN, "<mark>").replace(MARK_CLOSE, "</mark>"))
+
+
+def search_quizzes(query, limit=20):
+    """
+    Returns the quizzes matching a query, best match first.
+    Parameters:
+        query: The text typed by the user.
+        limit: The maximum number of results.
+    Returns:
+        list: SearchResult objects.
+    """
+    if not is_enabled():
+        quizzes = Quiz.objects.filter(
+            Q(title__icontains=query) | Q(description__icontains=query)
+        ).order_by("-created_at", "-id")[:limit]
+        return [SearchResult(quiz) for quiz in quizzes] if query.strip() else []
+
+    match = build_match_query(query)
+    if match is None:
+        return []
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, bm25({TABLE}, {weights}) AS rank, "
+            f"snippet({TABLE}, -1, %s, %s, '…', 12) "
+            f"FROM {TABLE} WHERE {TABLE} MATCH %s ORDER BY rank LIMIT %s",
+            [MARK_OPEN, MARK_CLOSE, match, limit],
+        )
+        rows = cursor.fetchall()
+
+    quizzes = Quiz.objects.in_bulk([row[0] for row in rows])
+    return [
+        SearchResult(quizzes[quiz_id], rank, _highlight(snippet))
+        for quiz_id, rank, snippet in rows
+        if quiz_id in quizzes
+    ]
@@ -0,0 +1,128 @@
+"""
+File: signals.py
+
+Description: This file connects model signals to the caches and indexes that depend on quiz
+content. Whenever a quiz, one of its questions, or one of their answers is saved or deleted,
+the derived data held for that quiz is invalidated so the next request rebuilds it, and the
+quiz's full-text search row is rebuilt.
+
+Rows deleted in a cascade from their quiz or question are skipped, since the handler for the
+parent covers them; deleting a large quiz therefore triggers a single refresh.
+
+It also defines the attempts_recorded signal, sent with the list of new QuizAttempt rows
+whenever attempts are saved. Code that inserts attempts with bulk_create must send it itself.
+
+Receivers in this file:
+1. quiz_changed: Refreshes derived data and catalogue facet counts when a Quiz is saved or deleted.
+2. question_changed: Refreshes derived data and the question counters of the question's quiz.
+3. answer_changed: Refreshes derived data of the answer's quiz.
+4. attempt_saved / attempt_deleted: Forward QuizAttempt inserts and deletes, and recompute
+   the history rollups of the player of a deleted attempt.
+5. update_leaderboards: Adds recorded attempts to leaderboards and score histograms.
+6. user_changed: Drops a saved or deleted user from the user cache.
+7. update_attempt_counters: Adds recorded attempts to the counters of their quizzes.
+8. update_player_history: Adds recorded attempts to the history rollups of their players.
+"""
+
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import counters, history, leaderboards, search
+from .answer_keys import answer_keys
+from .catalogue import invalidate_facet_counts
+from .models import Answer, Question, Quiz, QuizAttempt
+from .snapshots import bump_content_version
+from .users import invalidate_user
+
+# Sent with attempts=[QuizAttempt, ...] after new attempts have been saved
+attempts_recorded = Signal()
+
+
+def quiz_content_changed(quiz_id):
+    """
+    Drops every cached artefact derived from the content of a quiz and reindexes it.
+    Code that writes questions or answers without signals (such as bulk_create) must
+    call this itself.
+    """
+    if quiz_id is not None:
+        answer_keys.invalidate(quiz_id)
+        bump_content_version(quiz_id)
+        search.index_quizzes([quiz_id])
+
+
+def _quiz_id_for_question(question_id):
+    return (
+        Question.objects.filter(pk=question_id).values_list("quiz_id", flat=True).first()
+    )
+
+
+def _deleted_with(kwargs, *parents):
+    """
+    Returns True if a post_delete signal comes from deleting one of the parent models.
+    """
+    origin = kwargs.get("origin")
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in parents
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    invalidate_facet_counts()
+    quiz_content_changed(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    if _deleted_with(kwargs, Quiz):
+        return
+    if kwargs["signal"] is post_delete:
+        counters.add_questions(instance.quiz_id, -1, -instance.points)
+    elif kwargs["created"]:
+        counters.add_questions(instance.quiz_id, 1, instance.points)
+    else:
+        # The points may have changed, and the old value is unknown
+        counters.refresh_question_counters(instance.quiz_id)
+    quiz_content_changed(instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    if not _deleted_with(kwargs, Quiz, Question):
+        quiz_content_changed(_quiz_id_for_question(instance.question_id))
+
+
+@receiver(post_save, sender=QuizAttempt)
+def attempt_saved(sender, instance, created, **kwargs):
+    if created:
+        attempts_recorded.send(sender=QuizAttempt, attempts=[instance])
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def attempt_deleted(sender, instance, **kwargs):
+    if not _deleted_with(kwargs, Quiz):
+        leaderboards.forget_attempt(instance)
+        counters.forget_attempt(instance)
+    if not _deleted_with(kwargs, Quiz, User):
+        history.forget_attempt(instance)
+
+
+@receiver(attempts_recorded)
+def update_leaderboards(sender, attempts, **kwargs):
+    leaderboards.record_attempts(attempts)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(attempts_recorded)
+def update_attempt_counters(sender, attempts, **kwargs):
+    counters.record_attempts(attempts)
+
+
+@receiver(attempts_recorded)
+def update_player_history(sender, attempts, **kwargs):
+    history.record_attempts(attempts)
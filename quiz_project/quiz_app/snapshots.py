@@ -0,0 +1,208 @@
+"""
+File: snapshots.py
+
+Description: This file maintains the versioned content snapshots of quizzes. Each quiz
+carries a content_version that signals.py increments (with an F() update) whenever the quiz,
+one of its questions or one of their answers changes. A snapshot is the whole quiz tree
+serialized as compact JSON, without the correct answers, and optionally gzip-compressed
+ahead of time. Snapshots are cached per (quiz, version), so a snapshot never has to be
+invalidated: a change bumps the version, and the old entry simply expires.
+
+The snapshot is served by the quiz_snapshot JSON endpoint with an ETag and Last-Modified
+derived from the version, so clients and proxies can revalidate without a transfer, and it
+is what the play_quiz question block is rendered from (see fragments.py).
+
+The "a"-prefixed functions are the async counterparts used by async_views.py.
+
+Functions in this file:
+1. bump_content_version: Increments the content version of a quiz.
+2. build_snapshot: Builds the current snapshot of a quiz from the database.
+3. get_snapshot: Returns the snapshot of a quiz, building and caching it on a miss.
+4. content_state: Returns the (version, updated_at) of a quiz with one query, for
+   conditional requests.
+"""
+
+import gzip
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Answer, Question, Quiz
+
+
+class Snapshot:
+    """
+    Serialized content of one quiz version.
+
+    Attributes:
+        - quiz_id, version, updated_at: The quiz and content version it was built from.
+        - body: The JSON document, as UTF-8 bytes.
+        - gzipped: The gzip-compressed body, or None when QUIZ_SNAPSHOT_GZIP is off.
+    """
+
+    __slots__ = ("quiz_id", "version", "updated_at", "body", "gzipped")
+
+    def __init__(self, quiz_id, version, updated_at, body, gzipped=None):
+        self.quiz_id = quiz_id
+        self.version = version
+        self.updated_at = updated_at
+        self.body = body
+        self.gzipped = gzipped
+
+    @property
+    def data(self):
+        return json.loads(self.body)
+
+    @property
+    def etag(self):
+        return f"{self.quiz_id}-{self.version}"
+
+
+def bump_content_version(quiz_id):
+    """
+    Marks the content of a quiz as changed, so its snapshot and rendered questions are
+    rebuilt on the next request.
+    """
+    Quiz.objects.filter(pk=quiz_id).update(
+        content_version=F("content_version") + 1, content_updated_at=timezone.now()
+    )
+
+
+def _cache_key(quiz_id, version):
+    return f"quiz_app:snapshot:{quiz_id}:{version}"
+
+
+def _timeout():
+    return getattr(settings, "QUIZ_SNAPSHOT_CACHE_TIMEOUT", 86400)
+
+
+def _querysets(quiz_id):
+    # Snapshots are cached for the lifetime of a version, so they are built from the
+    # primary rather than a possibly lagging replica
+    primary = DEFAULT_DB_ALIAS
+    return (
+        Quiz.objects.using(primary)
+        .filter(pk=quiz_id)
+        .values_list(
+            "content_version",
+            "content_updated_at",
+            "title",
+            "description",
+            "category",
+            "difficulty",
+        ),
+        Question.objects.using(primary)
+        .filter(quiz_id=quiz_id)
+        .order_by("id")
+        .values_list("id", "text", "question_type", "points"),
+        Answer.objects.using(primary)
+        .filter(question__quiz_id=quiz_id)
+        .order_by("id")
+        .values_list("id", "question_id", "text"),
+    )
+
+
+def _serialize(quiz_id, quiz_row, question_rows, answer_rows):
+    version, updated_at, title, description, category, difficulty = quiz_row
+    answers = {}
+    for answer_id, question_id, text in answer_rows:
+        answers.setdefault(question_id, []).append({"id": answer_id, "text": text})
+    document = {
+        "id": quiz_id,
+        "version": version,
+        "updated_at": updated_at.isoformat(),
+        "title": title,
+        "description": description,
+        "category": category,
+        "difficulty": difficulty,
+        "questions": [
+            {
+                "id": question_id,
+                "text": text,
+                "type": question_type,
+                "points": points,
+                "answers": answers.get(question_id, []),
+            }
+            for question_id, text, question_type, points in question_rows
+        ],
+    }
+    body = json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode()
+    gzipped = None
+    if getattr(settings, "QUIZ_SNAPSHOT_GZIP", True):
+        gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+    return Snapshot(quiz_id, version, updated_at, body, gzipped)
+
+
+def build_snapshot(quiz_id):
+    """
+    Builds the current snapshot of a quiz from the database with three queries.
+    Returns:
+        Snapshot or None: None if the quiz does not exist.
+    """
+    quiz_rows, questions, answers = _querysets(quiz_id)
+    quiz_row = quiz_rows.first()
+    if quiz_row is None:
+        return None
+    return _serialize(quiz_id, quiz_row, list(questions), list(answers))
+
+
+async def abuild_snapshot(quiz_id):
+    """
+    Async version of build_snapshot.
+    """
+    quiz_rows, questions, answers = _querysets(quiz_id)
+    quiz_row = await quiz_rows.afirst()
+    if quiz_row is None:
+        return None
+    return _serialize(
+        quiz_id,
+        quiz_row,
+        [row async for row in questions],
+        [row async for row in answers],
+    )
+
+
+def get_snapshot(quiz_id, version):
+    """
+    Returns the snapshot of a quiz at the given content version, from the cache when
+    possible.
+    Parameters:
+        quiz_id: The ID of the quiz.
+        version: The content version the caller read, usually quiz.content_version.
+    Returns:
+        Snapshot or None: The snapshot, or None if the quiz does not exist. If the
+        version has moved on since the caller read it, the current snapshot is returned.
+    """
+    snapshot = cache.get(_cache_key(quiz_id, version))
+    if snapshot is None:
+        snapshot = build_snapshot(quiz_id)
+        if snapshot is not None:
+            cache.set(_cache_key(quiz_id, snapshot.version), snapshot, _timeout())
+    return snapshot
+
+
+async def aget_snapshot(quiz_id, version):
+    """
+    Async version of get_snapshot.
+    """
+    snapshot = await cache.aget(_cache_key(quiz_id, version))
+    if snapshot is None:
+        snapshot = await abuild_snapshot(quiz_id)
+        if snapshot is not None:
+            await cache.aset(_cache_key(quiz_id, snapshot.version), snapshot, _timeout())
+    return snapshot
+
+
+def content_state(quiz_id):
+    """
+    Returns (content_version, content_updated_at) of a quiz, or None if it does not exist.
+    """
+    return (
+        Quiz.objects.filter(pk=quiz_id)
+        .values_list("content_version", "content_updated_at")
+        .first()
+    )
@@ -0,0 +1,129 @@
+/*
+File: play_quiz.js
+
+Description: Progressive loading of the questions of large quizzes on the play_quiz page.
+The server renders the first page of questions; this script fetches the following pages
+from the quiz_questions JSON endpoint (see quiz_app/question_pages.py) as the player scrolls
+towards the end of the loaded questions, and renders them with the same markup as
+_quiz_questions.html. Submitting the form before every page is loaded first loads the rest,
+so submit_quiz always receives the full answer set.
+*/
+(function () {
+    'use strict';
+
+    const pages = document.getElementById('question-pages');
+    if (!pages) {
+        return;
+    }
+    const form = pages.closest('form');
+    const status = document.getElementById('question-pages-status');
+    const multiSelectTypes = pages.dataset.multiSelect.split(' ');
+    let nextCursor = pages.dataset.next;
+    let number = form.querySelectorAll('.question').length;
+    let loading = null;
+
+    function element(tag, attributes, text) {
+        const node = document.createElement(tag);
+        Object.entries(attributes || {}).forEach(([name, value]) => node.setAttribute(name, value));
+        if (text !== undefined) {
+            node.textContent = text;
+        }
+        return node;
+    }
+
+    // Mirrors _quiz_questions.html; texts are set with textContent, never parsed as HTML
+    function renderQuestion(question) {
+        number += 1;
+        const multiSelect = multiSelectTypes.includes(question.k);
+        const block = element('div', { class: 'question' });
+        block.append(
+            element('h4', {}, `Question ${number} (${question.p} point${question.p === 1 ? '' : 's'})`),
+            element('p', {}, question.t)
+        );
+        if (multiSelect) {
+            block.append(element('p', { class: 'form-text' }, 'Select all correct answers.'));
+        }
+        question.a.forEach(([answerId, text]) => {
+            const check = element('div', { class: 'form-check' });
+            const input = element('input', {
+                type: multiSelect ? 'checkbox' : 'radio',
+                name: `question_${question.i}`,
+                id: `answer_${answerId}`,
+                value: answerId,
+                class: 'form-check-input',
+            });
+            input.required = !multiSelect;
+            check.append(input, element('label', { class: 'form-check-label', for: `answer_${answerId}` }, text));
+            block.append(check);
+        });
+        return [block, element('hr')];
+    }
+
+    // Resolves to true once the next page is rendered, or to false if it could not be loaded
+    function loadNextPage() {
+        if (loading) {
+            return loading;
+        }
+        if (!nextCursor) {
+            return Promise.resolve(true);
+        }
+        status.textContent = 'Loading more questions…';
+        const url = `${pages.dataset.url}?cursor=${encodeURIComponent(nextCursor)}`;
+        loading = fetch(url, { headers: { Accept: 'application/json' }, credentials: 'same-origin' })
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then((page) => {
+                const fragment = document.createDocumentFragment();
+                page.q.forEach((question) => fragment.append(...renderQuestion(question)));
+                pages.before(fragment);
+                nextCursor = page.n;
+                status.textContent = '';
+                return true;
+            })
+            .catch(() => {
+                status.textContent = 'Could not load more questions. Submit the quiz to try again.';
+                return false;
+            })
+            .finally(() => {
+                loading = null;
+            });
+        return loading;
+    }
+
+    function loadAllPages() {
+        return loadNextPage().then((loaded) => (loaded && nextCursor ? loadAllPages() : loaded));
+    }
+
+    // Load the next page while the end of the loaded questions is close to the viewport
+    const observer = new IntersectionObserver((entries) => {
+        if (!entries.some((entry) => entry.isIntersecting)) {
+            return;
+        }
+        loadNextPage().then((loaded) => {
+            observer.unobserve(pages);
+            if (loaded && nextCursor) {
+                // Observing again reports the current intersection, in case it is still visible
+                observer.observe(pages);
+            }
+        });
+    }, { rootMargin: '0px 0px 800px 0px' });
+    observer.observe(pages);
+
+    form.addEventListener('submit', (event) => {
+        if (!nextCursor) {
+            return;
+        }
+        event.preventDefault();
+        status.textContent = 'Loading the remaining questions…';
+        loadAllPages().then((loaded) => {
+            if (loaded) {
+                // Validates the questions just loaded before submitting
+                form.requestSubmit();
+            }
+        });
+    });
+})();
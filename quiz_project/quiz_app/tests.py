@@ -1,3 +1,1501 @@
-from django.test import TestCase
+import importlib.util
+import json
+import re
+import time
+from dataclasses import astuple, replace
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, OperationalError, connection
+from django.http import HttpResponse, QueryDict
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+
+from . import (
+    analytics,
+    async_views,
+    attempt_tokens,
+    catalogue,
+    counters,
+    exports,
+    fragments,
+    history,
+    leaderboards,
+    pools,
+    routers,
+    search,
+    users,
+    views,
+    write_behind,
+)
+from .analytics import update_question_stats
+from .answer_keys import AnswerKeyCache, answer_keys
+from .attempts import build_user_answers, record_attempt
+from .authoring import (
+    AnswerDraft,
+    QuestionDraft,
+    parse_form_questions,
+    parse_json_questions,
+    save_quiz,
+)
+from .middleware import PIN_COOKIE, PrimaryPinningMiddleware
+from .models import (
+    Answer,
+    LeaderboardEntry,
+    PlayerQuizStats,
+    PlayerStats,
+    Question,
+    QuestionStats,
+    Quiz,
+    QuizAttempt,
+    ScoreBucket,
+    UserAnswer,
+)
+from .write_behind import AttemptWriteFailed
+
+
+def make_quiz(owner, questions=(), **fields):
+    """
+    Saves a quiz with its questions, given as QuestionDrafts, and returns it as play_quiz
+    loads it, with the content version bumped by the save.
+    """
+    defaults = {"title": "Quiz", "description": "", "category": "Test", "difficulty": "Easy"}
+    quiz = save_quiz(Quiz(owner=owner, **{**defaults, **fields}), list(questions))
+    quiz.refresh_from_db()
+    return quiz
+
+
+class QuizTestCase(TestCase):
+    """
+    Starts every test with empty caches, since they outlive the rolled back transaction of
+    the previous test.
+    """
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+
+    def login(self, username="player"):
+        """
+        Creates a user, logs the test client in as that user and returns it.
+        """
+        user = User.objects.create_user(username, password="secret")
+        self.client.login(username=username, password="secret")
+        return user
+
+
+class AnswerKeyCacheTests(QuizTestCase):
+    """
+    An edit must reach the answer keys held by every worker process, not only this one.
+    """
+
+    def test_other_process_serves_the_new_version(self):
+        quiz = make_quiz(
+            User.objects.create_user("owner"),
+            [QuestionDraft(text="Question", answers=[AnswerDraft("A", True), AnswerDraft("B")])],
+        )
+        a, b = quiz.questions.get().answers.order_by("id")
+        # The LRU of another worker, which the signals of this process never reach
+        worker = AnswerKeyCache()
+        self.assertTrue(worker.get(quiz.id, quiz.content_version).check(a.question_id, a.id))
+
+        b.is_correct, a.is_correct = True, False
+        a.save()
+        b.save()
+        cache.clear()  # The default cache backend is per process too
+        quiz.refresh_from_db()
+        key = worker.get(quiz.id, quiz.content_version)
+        self.assertEqual(key.version, quiz.content_version)
+        self.assertFalse(key.check(a.question_id, a.id))
+        self.assertTrue(key.check(b.question_id, b.id))
+
+
+class AuthoringTests(QuizTestCase):
+    """
+    Quizzes are parsed into an in-memory tree and written in one transaction.
+    """
+
+    def test_failed_answer_insert_rolls_back_the_quiz(self):
+        drafts = [QuestionDraft(text="Question", answers=[AnswerDraft("A", True)])]
+        with mock.patch.object(Answer.objects, "bulk_create", side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                make_quiz(User.objects.create_user("owner"), drafts)
+        self.assertFalse(Quiz.objects.exists())
+        self.assertFalse(Question.objects.exists())
+
+    def test_form_indices_need_not_be_contiguous(self):
+        drafts = parse_form_questions(
+            {
+                "questions[7][text]": "Last",
+                "questions[7][answers][4][text]": "Second",
+                "questions[7][answers][1][text]": "First",
+                "questions[7][answers][1][is_correct]": "on",
+                "questions[2][text]": "First question",
+                "questions[2][points]": "3",
+            }
+        )
+        self.assertEqual([draft.text for draft in drafts], ["First question", "Last"])
+        self.assertEqual(
+            drafts[1].answers, [AnswerDraft("First", True), AnswerDraft("Second", False)]
+        )
+        self.assertEqual(drafts[0].points, 3)
+
+    def test_default_points(self):
+        # Questions are worth one point unless told otherwise; zero stays allowed
+        form = parse_form_questions(
+            {"questions[0][text]": "Q", "questions[1][text]": "Q", "questions[1][points]": "0"}
+        )
+        self.assertEqual([draft.points for draft in form], [1, 0])
+        document = parse_json_questions([{"text": "Q"}, {"text": "Q", "points": 0}])
+        self.assertEqual([draft.points for draft in document], [1, 0])
+        with self.assertRaises(ValidationError):
+            parse_json_questions([{"text": "Q", "points": -1}])
+
+    def test_is_correct_must_be_a_boolean(self):
+        answers = [{"text": "A", "is_correct": True}, {"text": "B", "is_correct": False}]
+        (draft,) = parse_json_questions([{"text": "Q", "answers": answers + [{"text": "C"}]}])
+        self.assertEqual([answer.is_correct for answer in draft.answers], [True, False, False])
+        for value in ("false", "0", 1, None):
+            with self.assertRaises(ValidationError):
+                parse_json_questions(
+                    [{"text": "Q", "answers": [{"text": "A", "is_correct": value}]}]
+                )
+
+
+class QuestionFragmentTests(QuizTestCase):
+    """
+    The question block of play_quiz is cached per content version, so an edit renders a
+    fresh block instead of serving the cached one.
+    """
+
+    def test_fragment_follows_the_content_version(self):
+        user = self.login()
+        quiz = make_quiz(
+            user,
+            [QuestionDraft(text="Question", answers=[AnswerDraft("Old", True), AnswerDraft("B")])],
+        )
+        self.assertIn("Old", fragments.questions_fragment(quiz))
+        old_key = fragments._fragment_key(quiz.id, quiz.content_version)
+        self.assertIn("Old", cache.get(old_key))
+
+        # Served from the cache: neither the snapshot nor the template is needed
+        with mock.patch.object(fragments, "get_snapshot", side_effect=AssertionError):
+            with self.assertNumQueries(0):
+                self.assertIn("Old", fragments.questions_fragment(quiz))
+
+        answer = Answer.objects.get(text="Old")
+        answer.text = "New"
+        answer.save()
+        quiz.refresh_from_db()
+        new_key = fragments._fragment_key(quiz.id, quiz.content_version)
+        self.assertNotEqual(new_key, old_key)
+        html = fragments.questions_fragment(quiz)
+        self.assertIn("New", html)
+        self.assertNotIn("Old", html)
+        self.assertEqual(cache.get(new_key), html)
+
+        response = self.client.get(f"/play_quiz/{quiz.id}/")
+        self.assertContains(response, "New")
+        self.assertNotContains(response, "Old")
+
+
+class CatalogueTests(QuizTestCase):
+    """
+    The catalogue pages through quizzes with a keyset cursor and caches its facet counts.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user("owner")
+
+    def walk(self, **filters):
+        """
+        Follows the next cursor from the first page to the last and returns the quiz ids.
+        """
+        ids, cursor = [], None
+        while True:
+            page = catalogue.catalogue_page(cursor=cursor, **filters)
+            ids.extend(quiz.id for quiz in page)
+            if not page.has_next:
+                return ids
+            cursor = page.next_cursor
+
+    @override_settings(QUIZ_CATALOGUE_PAGE_SIZE=3)
+    def test_pages_are_stable_with_tied_timestamps(self):
+        quizzes = [make_quiz(self.owner, title=f"Quiz {i}") for i in range(8)]
+        # Quizzes created in the same instant are ordered by id, across page boundaries too
+        tied = timezone.now() - timedelta(days=1)
+        Quiz.objects.filter(id__in=[quiz.id for quiz in quizzes[1:6]]).update(created_at=tied)
+
+        expected = list(Quiz.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        ids = self.walk()
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(set(ids)), len(quizzes))
+
+    @override_settings(QUIZ_CATALOGUE_PAGE_SIZE=3)
+    def test_new_quiz_does_not_shift_later_pages(self):
+        for i in range(7):
+            make_quiz(self.owner, title=f"Quiz {i}")
+        expected = list(Quiz.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        first = catalogue.catalogue_page()
+        make_quiz(self.owner, title="Newest")
+
+        ids = [quiz.id for quiz in first]
+        cursor = first.next_cursor
+        while cursor:
+            page = catalogue.catalogue_page(cursor=cursor)
+            ids.extend(quiz.id for quiz in page)
+            cursor = page.next_cursor
+        self.assertEqual(ids, expected)
+
+    @override_settings(QUIZ_CATALOGUE_PAGE_SIZE=2)
+    def test_filters(self):
+        for category, difficulty in [
+            ("Maths", "Easy"),
+            ("Maths", "Hard"),
+            ("History", "Easy"),
+            ("Maths", "Easy"),
+            ("Maths", "Easy"),
+        ]:
+            make_quiz(self.owner, category=category, difficulty=difficulty)
+        expected = list(
+            Quiz.objects.filter(category="Maths", difficulty="Easy")
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(len(expected), 3)
+        self.assertEqual(self.walk(category="Maths", difficulty="Easy"), expected)
+        self.assertEqual(len(self.walk(difficulty="Easy")), 4)
+
+        # The link to the next page keeps the filters
+        response = self.client.get("/", {"category": "Maths", "difficulty": "Easy"})
+        self.assertEqual([quiz.id for quiz in response.context["quizzes"]], expected[:2])
+        params = QueryDict(response.context["next_query"])
+        self.assertEqual(params["category"], "Maths")
+        response = self.client.get("/?" + response.context["next_query"])
+        self.assertEqual([quiz.id for quiz in response.context["quizzes"]], expected[2:])
+        self.assertIsNone(response.context["next_query"])
+
+    def test_facet_counts(self):
+        make_quiz(self.owner, category="Maths", difficulty="Easy")
+        make_quiz(self.owner, category="Maths", difficulty="Hard")
+        quiz = make_quiz(self.owner, category="History", difficulty="Easy")
+        self.assertEqual(
+            catalogue.facet_counts(),
+            {
+                "category": [("History", 1), ("Maths", 2)],
+                "difficulty": [("Easy", 2), ("Hard", 1)],
+            },
+        )
+        with self.assertNumQueries(0):
+            catalogue.facet_counts()
+
+        # Saving or deleting a quiz drops the cached counts
+        quiz.category = "Maths"
+        quiz.save()
+        self.assertEqual(catalogue.facet_counts()["category"], [("Maths", 3)])
+        quiz.delete()
+        self.assertEqual(
+            catalogue.facet_counts(),
+            {"category": [("Maths", 2)], "difficulty": [("Easy", 1), ("Hard", 1)]},
+        )
+
+
+class SearchTests(QuizTestCase):
+    """
+    Full-text search ranks title matches first and matches the last term as a prefix; other
+    databases fall back to a case-insensitive match on the title and description.
+    """
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user("owner")
+        self.in_title, self.in_answers, self.deleted = (
+            make_quiz(
+                user,
+                [QuestionDraft(text="Which language?", answers=[AnswerDraft(answer, True)])],
+                title=title,
+                description="A quiz",
+            )
+            for title, answer in (
+                ("Python basics", "Rust"),
+                ("Programming languages", "Python"),
+                ("Python internals", "C"),
+            )
+        )
+        self.deleted.delete()
+
+    def test_ranking_and_prefix(self):
+        results = search.search_quizzes("pyth")
+        self.assertEqual([result.quiz for result in results], [self.in_title, self.in_answers])
+        self.assertIn("<mark>", results[0].snippet)
+        # Only the last term is a prefix
+        self.assertEqual(search.search_quizzes("pyth basics"), [])
+        self.assertEqual(
+            [result.quiz for result in search.search_quizzes("python bas")], [self.in_title]
+        )
+
+    def test_fallback_without_fts(self):
+        with mock.patch.object(search, "is_enabled", return_value=False):
+            results = search.search_quizzes("PROGRAMMING")
+            self.assertEqual([result.quiz for result in results], [self.in_answers])
+            self.assertIsNone(results[0].rank)
+            self.assertEqual(search.search_quizzes("  "), [])
+
+
+@override_settings(LEADERBOARD_SIZE=3)
+class LeaderboardTests(QuizTestCase):
+    """
+    Leaderboards and score histograms maintained attempt by attempt must match the ones
+    rebuilt from the attempts table, and a leaderboard never grows past LEADERBOARD_SIZE.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("player")
+        self.quiz = make_quiz(self.user)
+
+    def _play(self, score, time_taken=10):
+        return QuizAttempt.objects.create(
+            user=self.user, quiz=self.quiz, score=score, time_taken=time_taken
+        )
+
+    def _boards(self):
+        return (
+            list(LeaderboardEntry.objects.values_list("quiz_id", "attempt_id", "score")),
+            # Buckets emptied by a deletion are kept until a rebuild
+            sorted(
+                ScoreBucket.objects.filter(attempts__gt=0).values_list(
+                    "quiz_id", "score", "attempts"
+                )
+            ),
+        )
+
+    def test_incremental_matches_rebuild(self):
+        other = make_quiz(self.user, title="Other")
+        for score, time_taken in [(3, 20), (5, 30), (3, 10), (1, 5), (5, 25), (4, 40)]:
+            self._play(score, time_taken)
+            QuizAttempt.objects.create(user=self.user, quiz=other, score=score, time_taken=1)
+        self._play(2).delete()
+        incremental = self._boards()
+        self.assertEqual(leaderboards.rebuild_all(), (2, 12))
+        self.assertEqual(incremental, self._boards())
+        self.assertEqual(
+            [entry.score for entry in leaderboards.top_attempts(self.quiz.id)], [5, 5, 4]
+        )
+
+    def test_concurrent_merge_is_trimmed(self):
+        for score in (1, 2, 3):
+            self._play(score)
+        # Written by another merge between this merge's read and its write
+        (competitor,) = QuizAttempt.objects.bulk_create(
+            [QuizAttempt(user=self.user, quiz=self.quiz, score=9, time_taken=10)]
+        )
+        bulk_create = LeaderboardEntry.objects.bulk_create
+
+        def racing(entries, **kwargs):
+            bulk_create([leaderboards._entry_from_attempt(competitor)])
+            return bulk_create(entries, **kwargs)
+
+        with mock.patch.object(LeaderboardEntry.objects, "bulk_create", side_effect=racing):
+            self._play(4)
+        self.assertEqual(
+            [entry.score for entry in leaderboards.top_attempts(self.quiz.id)], [9, 4, 3]
+        )
+
+    def test_percentile_rank(self):
+        self.assertIsNone(leaderboards.percentile_rank(self.quiz.id, 3))
+        for score in (1, 2, 2, 3):
+            self._play(score)
+        for score, percentile in ((0, 0), (1, 0), (2, 25), (3, 75), (4, 100)):
+            self.assertEqual(leaderboards.percentile_rank(self.quiz.id, score), percentile)
+        self.assertEqual(async_to_sync(leaderboards.apercentile_rank)(self.quiz.id, 3), 75)
+        # A deleted attempt leaves the histogram
+        QuizAttempt.objects.filter(score=1).get().delete()
+        self.assertEqual(leaderboards.percentile_rank(self.quiz.id, 3), 67)
+
+
+class SubmitQueryTests(QuizTestCase):
+    """
+    A submission is graded against the answer key and saved with one bulk INSERT, so the
+    number of queries does not grow with the number of questions.
+    """
+
+    def _submit(self, size):
+        """
+        Returns a new quiz of the given size and a function that submits its right answers
+        as a new player, so that both submissions start from the same state.
+        """
+        user = self.login(f"player{size}")
+        quiz = make_quiz(
+            user,
+            [
+                QuestionDraft(text=f"Q{i}", answers=[AnswerDraft("A", True), AnswerDraft("B")])
+                for i in range(size)
+            ],
+        )
+        data = {"attempt": attempt_tokens.issue(quiz, user).sign()}
+        for answer in Answer.objects.filter(question__quiz=quiz, is_correct=True):
+            data[f"question_{answer.question_id}"] = answer.id
+        return quiz, lambda: self.client.post(f"/submit_quiz/{quiz.id}/", data)
+
+    def test_constant_number_of_queries(self):
+        quiz, submit = self._submit(3)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(submit().status_code, 302)
+
+        quiz, submit = self._submit(100)
+        with self.assertNumQueries(len(queries)):
+            self.assertEqual(submit().status_code, 302)
+        attempt = QuizAttempt.objects.get(quiz=quiz)
+        self.assertEqual(attempt.score, 100)
+        self.assertEqual(attempt.user_answers.filter(is_correct=True).count(), 100)
+
+
+class CheckAnswersTests(QuizTestCase):
+    """
+    Answers are checked against the cached answer key, one or many per request.
+    """
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user("owner")
+        answers = [AnswerDraft("A", True), AnswerDraft("B")]
+        drafts = [QuestionDraft(text="Question", answers=answers)]
+        self.question, self.other = (
+            make_quiz(user, drafts, title=title).questions.get() for title in ("First", "Second")
+        )
+        self.right, self.wrong = self.question.answers.order_by("id")
+        self.foreign = self.other.answers.first()
+
+    def _check_many(self, pairs):
+        return self.client.post(
+            "/check_answers/",
+            json.dumps({"answers": [{"question": q, "answer": a} for q, a in pairs]}),
+            content_type="application/json",
+        )
+
+    def test_check_answer(self):
+        url = f"/check_answer/{self.question.id}/"
+        for answer, correct in ((self.right, True), (self.wrong, False)):
+            response = self.client.post(url, {"answer": answer.id})
+            self.assertEqual(response.json(), {"correct": correct})
+        # An answer of another question, or no answer at all, is not found
+        self.assertEqual(self.client.post(url, {"answer": self.foreign.id}).status_code, 404)
+        self.assertEqual(self.client.post(url, {"answer": 999999}).status_code, 404)
+        self.assertEqual(self.client.post("/check_answer/999999/", {"answer": 1}).status_code, 404)
+
+    def test_check_answers_reports_the_key(self):
+        pairs = [
+            (self.question.id, self.right.id),
+            (self.question.id, self.wrong.id),
+            (self.other.id, self.foreign.id),
+            (self.question.id, self.foreign.id),
+            (999999, self.right.id),
+        ]
+        response = self._check_many(pairs)
+        self.assertEqual(response.status_code, 200)
+        # Foreign and unknown answers are reported as null rather than failing the batch
+        self.assertEqual(
+            [result["correct"] for result in response.json()["results"]],
+            [True, False, True, None, None],
+        )
+
+    def test_check_answers_cap(self):
+        pairs = [(self.question.id, self.right.id)] * (views.MAX_CHECKED_ANSWERS + 1)
+        self.assertEqual(self._check_many(pairs).status_code, 400)
+        self.assertEqual(self._check_many(pairs[1:]).status_code, 200)
+
+
+def async_urlconf():
+    """
+    Returns a fresh copy of quiz_app.urls loaded with QUIZ_ASYNC_VIEWS enabled, since the
+    flag is read when the URLconf is imported.
+    """
+    spec = importlib.util.find_spec("quiz_app.urls")
+    module = importlib.util.module_from_spec(spec)
+    with override_settings(QUIZ_ASYNC_VIEWS=True):
+        spec.loader.exec_module(module)
+    return module
+
+
+class AsyncViewTests(QuizTestCase):
+    """
+    With QUIZ_ASYNC_VIEWS, the play path is served by the native async views, which behave
+    like their sync counterparts.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(
+            override_settings(QUIZ_ASYNC_VIEWS=True, ROOT_URLCONF=async_urlconf())
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("player")
+        self.async_client.force_login(self.user)
+        self.quiz = make_quiz(
+            self.user,
+            [
+                QuestionDraft(
+                    text=f"Question {i}",
+                    points=2,
+                    answers=[AnswerDraft("Right", True), AnswerDraft("Wrong")],
+                )
+                for i in range(3)
+            ],
+            title="Async quiz",
+        )
+        self.questions = list(self.quiz.questions.order_by("id"))
+
+    def test_views_are_async(self):
+        for path, view in (
+            ("/", async_views.index),
+            (f"/play_quiz/{self.quiz.id}/", async_views.play_quiz),
+            (f"/check_answer/{self.questions[0].id}/", async_views.check_answer),
+            (f"/submit_quiz/{self.quiz.id}/", async_views.submit_quiz),
+            ("/quiz_results/1/", async_views.quiz_results),
+        ):
+            self.assertIs(resolve(path).func, view)
+
+    async def test_index(self):
+        response = await self.async_client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([quiz.id for quiz in response.context["quizzes"]], [self.quiz.id])
+        self.assertContains(response, "Async quiz")
+
+    async def test_play_submit_and_results(self):
+        response = await self.async_client.get(f"/play_quiz/{self.quiz.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Question 2")
+        token = response.context["attempt_token"]
+
+        # Right, wrong, and no answer
+        right = await self.questions[0].answers.aget(is_correct=True)
+        wrong = await self.questions[1].answers.aget(is_correct=False)
+        data = {
+            "attempt": token,
+            f"question_{self.questions[0].id}": right.id,
+            f"question_{self.questions[1].id}": wrong.id,
+        }
+        response = await self.async_client.post(f"/submit_quiz/{self.quiz.id}/", data)
+        attempt = await QuizAttempt.objects.aget()
+        self.assertRedirects(
+            response, f"/quiz_results/{attempt.id}/", fetch_redirect_response=False
+        )
+        self.assertEqual(attempt.score, 2)
+        self.assertEqual(await UserAnswer.objects.filter(quiz_attempt=attempt).acount(), 3)
+
+        response = await self.async_client.get(f"/quiz_results/{attempt.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "2 out of 6 points")
+
+        # The token is redeemed once
+        response = await self.async_client.post(f"/submit_quiz/{self.quiz.id}/", data)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_results_of_other_users_are_hidden(self):
+        other = await User.objects.acreate(username="other")
+        attempt = await QuizAttempt.objects.acreate(
+            user=other, quiz=self.quiz, score=0, time_taken=1
+        )
+        response = await self.async_client.get(f"/quiz_results/{attempt.id}/")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_check_answer(self):
+        question, other = self.questions[:2]
+        right, wrong = [answer async for answer in question.answers.order_by("id")]
+        foreign = await other.answers.afirst()
+        url = f"/check_answer/{question.id}/"
+        for answer, correct in ((right, True), (wrong, False)):
+            response = await self.async_client.post(url, {"answer": answer.id})
+            self.assertEqual(response.json(), {"correct": correct})
+        response = await self.async_client.post(url, {"answer": foreign.id})
+        self.assertEqual(response.status_code, 404)
+
+
+class WriteBehindTests(QuizTestCase):
+    """
+    The write-behind buffer commits queued attempts in batches, falls back to writing on the
+    request thread when full, retries a failed batch attempt by attempt and flushes on exit.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.login()
+        self.quiz = make_quiz(
+            self.user, [QuestionDraft(text="Question", answers=[AnswerDraft("A", True)])]
+        )
+        self.question = self.quiz.questions.get()
+        # Without its flusher thread, the buffer only writes when told to
+        self.buffer = write_behind.AttemptWriteBuffer(
+            max_queue=2, batch_size=10, flush_interval=0.01, put_timeout=0.01
+        )
+
+    def _submit(self, score=1):
+        attempt = QuizAttempt(user=self.user, quiz=self.quiz, score=score, time_taken=5)
+        responses = [(self.question.id, None, False)]
+        return self.buffer.submit(attempt, build_user_answers(attempt, responses))
+
+    def test_full_queue_writes_synchronously(self):
+        queued = [self._submit(), self._submit()]
+        direct = self._submit()
+        self.assertTrue(direct.wait(0))
+        self.assertIsNotNone(direct.attempt.pk)
+        self.assertFalse(any(pending.wait(0) for pending in queued))
+        stats = self.buffer.stats()
+        self.assertEqual(
+            (stats["enqueued"], stats["synchronous_writes"], stats["queue_depth"]), (2, 1, 2)
+        )
+
+    def test_shutdown_flushes_the_queue(self):
+        with mock.patch.object(write_behind.threading, "Thread"), mock.patch(
+            "atexit.register"
+        ) as register:
+            self.buffer.start()
+        register.assert_called_once_with(self.buffer.shutdown)
+
+        queued = [self._submit(), self._submit()]
+        self.buffer.shutdown()
+        self.assertTrue(all(pending.attempt.pk for pending in queued))
+        self.assertEqual(UserAnswer.objects.filter(quiz_attempt__quiz=self.quiz).count(), 2)
+        stats = self.buffer.stats()
+        self.assertEqual((stats["flushed"], stats["batches"], stats["queue_depth"]), (2, 1, 0))
+
+    def test_failed_batch_is_retried_one_by_one(self):
+        good = self._submit(score=1)
+        bad = self._submit(score=2)
+        bad.attempt.user_id = None  # Violates NOT NULL, failing the whole batch
+        with self.assertLogs(write_behind.logger, "ERROR"):
+            self.buffer.flush()
+        self.assertIsNotNone(good.attempt.pk)
+        self.assertFalse(good.failed)
+        self.assertTrue(bad.failed)
+        self.assertIsNone(bad.attempt.pk)
+        self.assertEqual(list(QuizAttempt.objects.values_list("score", flat=True)), [1])
+        stats = self.buffer.stats()
+        # The batch of two, then the bad attempt on its own
+        self.assertEqual((stats["failed_batches"], stats["flushed"], stats["batches"]), (2, 1, 1))
+
+    def test_submit_outcomes(self):
+        options = {**write_behind.DEFAULTS, "ENABLED": True, "WAIT_TIMEOUT": 0.01}
+        token = attempt_tokens.issue(self.quiz, self.user)
+        with self.settings(QUIZ_WRITE_BEHIND=options), mock.patch(
+            "quiz_app.attempts.get_buffer", return_value=self.buffer
+        ):
+            # Still queued after WAIT_TIMEOUT: written later, so not to be submitted again
+            response = self.client.post(f"/submit_quiz/{self.quiz.id}/", {"attempt": token.sign()})
+            self.assertRedirects(response, "/history/?pending=1")
+            self.assertContains(self.client.get(response.url), "will appear here in a moment")
+            self.buffer.flush()
+            self.assertEqual(QuizAttempt.objects.count(), 1)
+
+            # A failed write is reported
+            self.buffer.put_timeout = 0
+            self._submit()
+            self._submit()
+            with mock.patch.object(
+                UserAnswer.objects, "bulk_create", side_effect=IntegrityError
+            ), self.assertLogs(write_behind.logger, "ERROR"):
+                token = attempt_tokens.issue(self.quiz, self.user)
+                response = self.client.post(
+                    f"/submit_quiz/{self.quiz.id}/", {"attempt": token.sign()}
+                )
+            self.assertEqual(response.status_code, 503)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTests(QuizTestCase):
+    """
+    Quiz content is read from a replica unless the request wrote quiz data, in this request
+    or in one shortly before (the pin cookie), or the read happens inside a transaction.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.router = routers.PrimaryReplicaRouter()
+        # Tests run inside a transaction, which pins every read to the primary
+        idle = {DEFAULT_DB_ALIAS: mock.Mock(in_atomic_block=False)}
+        patcher = mock.patch.object(routers, "connections", idle)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_and_writes(self):
+        self.assertEqual(self.router.db_for_read(Quiz), "replica1")
+        self.assertEqual(self.router.db_for_read(Answer), "replica1")
+        self.assertIsNone(self.router.db_for_read(QuizAttempt))
+        self.assertEqual(self.router.db_for_write(Quiz), DEFAULT_DB_ALIAS)
+        # Outside a request nothing is pinned
+        self.assertEqual(self.router.db_for_read(Quiz), "replica1")
+        routers.connections[DEFAULT_DB_ALIAS].in_atomic_block = True
+        self.assertEqual(self.router.db_for_read(Quiz), DEFAULT_DB_ALIAS)
+
+    def _middleware(self, view):
+        seen = []
+
+        def get_response(request):
+            seen.append(self.router.db_for_read(Quiz))
+            view(request)
+            seen.append(self.router.db_for_read(Quiz))
+            return HttpResponse()
+
+        return PrimaryPinningMiddleware(get_response), seen
+
+    def test_write_pins_the_request_and_sets_the_cookie(self):
+        middleware, seen = self._middleware(lambda request: self.router.db_for_write(Quiz))
+        response = middleware(RequestFactory().post("/"))
+        self.assertEqual(seen, ["replica1", DEFAULT_DB_ALIAS])
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.QUIZ_PRIMARY_PIN_SECONDS)
+        self.assertTrue(cookie["httponly"])
+
+        # The next request of the user reads from the primary, without extending the pin
+        middleware, seen = self._middleware(lambda request: None)
+        request = RequestFactory().get("/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        response = middleware(request)
+        self.assertEqual(seen, [DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        # Writes outside quiz_app do not pin
+        middleware, seen = self._middleware(lambda request: self.router.db_for_write(User))
+        response = middleware(RequestFactory().post("/"))
+        self.assertEqual(seen, ["replica1", "replica1"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_async_write_in_a_worker_thread_pins_the_request(self):
+        seen = []
+
+        async def get_response(request):
+            # The state set by the middleware reaches the thread through the ContextVar
+            await sync_to_async(self.router.db_for_write)(QuizAttempt)
+            seen.append(self.router.db_for_read(Quiz))
+            return HttpResponse()
+
+        middleware = PrimaryPinningMiddleware(get_response)
+        response = async_to_sync(middleware)(RequestFactory().post("/"))
+        self.assertEqual(seen, [DEFAULT_DB_ALIAS])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+
+class MetricsTests(QuizTestCase):
+    """
+    /metrics is only served to staff members, or to scrapers holding QUIZ_METRICS_TOKEN,
+    in the Prometheus text exposition format.
+    """
+
+    SAMPLE = re.compile(r'^([a-z_]+)(?:\{((?:[a-z_]+="[^"]*",?)*)\})? (\S+)$')
+
+    def _parse(self, text):
+        """
+        Returns the families declared by the # TYPE lines and the (name, labels, value) of
+        every sample, failing on any line that is not valid exposition format.
+        """
+        families, samples = {}, []
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                continue
+            if line.startswith("# TYPE "):
+                name, kind = line[7:].split(" ")
+                families[name] = kind
+                continue
+            match = self.SAMPLE.match(line)
+            self.assertIsNotNone(match, line)
+            name, labels, value = match.groups()
+            family = re.sub(r"_(bucket|sum|count)$", "", name)
+            self.assertIn(name if name in families else family, families, line)
+            labels = dict(re.findall(r'([a-z_]+)="([^"]*)"', labels or ""))
+            samples.append((name, labels, float(value)))
+        return families, samples
+
+    def test_access(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        user = self.login()
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+        with self.settings(QUIZ_METRICS_TOKEN="scrape"):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            self.client.logout()
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape")
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer other")
+            self.assertEqual(response.status_code, 403)
+
+    @override_settings(QUIZ_METRICS_TOKEN="scrape")
+    def test_exposition_format(self):
+        self.client.get("/")
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape")
+        self.assertEqual(
+            response.headers["Content-Type"], "text/plain; version=0.0.4; charset=utf-8"
+        )
+        families, samples = self._parse(response.content.decode())
+        self.assertEqual(families["quiz_requests_total"], "counter")
+        self.assertEqual(families["quiz_request_duration_seconds"], "histogram")
+        self.assertEqual(families["quiz_request_db_queries"], "histogram")
+        self.assertIn(
+            ("quiz_requests_total", {"view": "index", "status": "200"}),
+            [(name, labels) for name, labels, _ in samples],
+        )
+
+        # Buckets are cumulative and end with +Inf, which equals the count
+        name = "quiz_request_db_queries"
+        buckets = [
+            (labels["le"], value)
+            for sample, labels, value in samples
+            if sample == f"{name}_bucket" and labels["view"] == "index"
+        ]
+        counts = [value for _, value in buckets]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(buckets[-1][0], "+Inf")
+        (count,) = [
+            value
+            for sample, labels, value in samples
+            if sample == f"{name}_count" and labels == {"view": "index"}
+        ]
+        self.assertEqual(buckets[-1][1], count)
+
+
+class QuizSnapshotTests(QuizTestCase):
+    """
+    The snapshot endpoint answers a matching If-None-Match with an empty 304, and its ETag
+    follows the content version of the quiz.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(
+            User.objects.create_user("owner"),
+            [QuestionDraft(text="Question", answers=[AnswerDraft("A", True), AnswerDraft("B")])],
+        )
+        self.url = f"/api/quizzes/{self.quiz.id}/snapshot/"
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+        self.assertEqual(etag, f'"{self.quiz.id}-{self.quiz.content_version}"')
+        self.assertNotIn("is_correct", response.content.decode())
+
+        # Only the content version is read
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        # The compressed representation has its own ETag
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["ETag"], etag[:-1] + '-gzip"')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_etag_changes_with_the_content_version(self):
+        etag = self.client.get(self.url).headers["ETag"]
+        answer = Answer.objects.get(text="B")
+        answer.text = "C"
+        answer.save()
+        self.quiz.refresh_from_db()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.headers["ETag"], f'"{self.quiz.id}-{self.quiz.content_version}"')
+        self.assertIn('"C"', response.content.decode())
+        self.assertEqual(self.client.get("/api/quizzes/999999/snapshot/").status_code, 404)
+
+
+class CachedUserTests(QuizTestCase):
+    """
+    Logged-in users are served from the cache, which a save of the user clears, and a
+    session whose auth hash no longer matches the user is logged out as Django would.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.login()
+        self.key = users._cache_key(self.user.pk)
+
+    def _user(self, client=None):
+        return (client or self.client).get("/history/").wsgi_request.user
+
+    def test_user_is_cached_until_saved(self):
+        self.assertTrue(self._user().is_authenticated)
+        self.assertIsNotNone(cache.get(self.key))
+        # The page of attempts, the totals, the streaks and the best scores; no user lookup
+        with self.assertNumQueries(4):
+            self.client.get("/history/")
+
+        self.user.first_name = "Renamed"
+        self.user.save()
+        self.assertIsNone(cache.get(self.key))
+        self.assertEqual(self._user().first_name, "Renamed")
+
+    def test_password_change_logs_other_sessions_out(self):
+        self._user()
+        self.user.set_password("changed")
+        self.user.save()
+        self.assertIsNone(cache.get(self.key))
+        self.assertFalse(self._user().is_authenticated)
+
+    def test_stale_session_hash_is_logged_out(self):
+        self._user()
+        other = Client()
+        other.login(username="player", password="secret")
+        self.user.set_password("changed")
+        self.user.save()
+        # A new session caches the user with the new password again
+        self.client.login(username="player", password="changed")
+        self.assertTrue(self._user().is_authenticated)
+        self.assertIsNotNone(cache.get(self.key))
+        # The cached user no longer matches the hash stored in the older session
+        response = other.get("/history/")
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(self._user(other).is_authenticated)
+
+
+class QuestionStatsTests(QuizTestCase):
+    """
+    The analytics job must count one response per (attempt, question), even for multi-select
+    questions that store one UserAnswer row per selected answer.
+    """
+
+    def test_multi_select_responses(self):
+        user = User.objects.create_user("player")
+        quiz = make_quiz(
+            user,
+            [
+                QuestionDraft(
+                    text="Pick both",
+                    question_type=Question.MULTIPLE_CHOICE,
+                    answers=[AnswerDraft("A", True), AnswerDraft("B", True), AnswerDraft("C")],
+                ),
+                QuestionDraft(
+                    text="Pick one", answers=[AnswerDraft("Yes", True), AnswerDraft("No")]
+                ),
+            ],
+        )
+        multiple, single = quiz.questions.order_by("id")
+        a, b, c = multiple.answers.order_by("id")
+        yes = single.answers.get(is_correct=True)
+        answer_key = answer_keys.get(quiz.id, quiz.content_version)
+        for selection in ([a, b], [a], [a, b, c]):
+            score, responses = answer_key.score(
+                {
+                    f"question_{multiple.id}": [str(answer.id) for answer in selection],
+                    f"question_{single.id}": [str(yes.id)],
+                }
+            )
+            record_attempt(user, quiz, responses, score=score, time_taken=10)
+        self.assertEqual(UserAnswer.objects.filter(question=multiple).count(), 6)
+
+        # A chunk size of 1 splits every attempt across chunks
+        update_question_stats(chunk_size=1, full=True)
+        stats = QuestionStats.objects.get(question=multiple)
+        self.assertEqual((stats.responses, stats.correct), (3, 1))
+        self.assertEqual(stats.choice_counts, {str(a.id): 3, str(b.id): 2, str(c.id): 1})
+        stats = QuestionStats.objects.get(question=single)
+        self.assertEqual((stats.responses, stats.correct), (3, 3))
+
+        # Incremental runs add nothing twice; where ids may commit out of order, every run
+        # recomputes everything
+        self.assertEqual(update_question_stats(), (0, 0))
+        with mock.patch.object(analytics, "incremental_supported", return_value=False):
+            self.assertEqual(update_question_stats()[0], 9)
+        self.assertEqual(QuestionStats.objects.get(question=multiple).responses, 3)
+
+
+class ExportFilterTests(QuizTestCase):
+    """
+    The since and until bounds of an export are both inclusive, given as dates or datetimes.
+    """
+
+    def test_until_is_inclusive(self):
+        user = User.objects.create_user("player")
+        quiz = make_quiz(user, [QuestionDraft(text="Question")])
+        moment = datetime(2024, 6, 1, 12, 30, tzinfo=dt_timezone.utc)
+        for offset in (0, 1):
+            attempt = QuizAttempt.objects.create(user=user, quiz=quiz, score=0, time_taken=5)
+            QuizAttempt.objects.filter(pk=attempt.pk).update(
+                completed_at=moment + timedelta(seconds=offset)
+            )
+
+        def exported(**filters):
+            filters = exports.parse_export_filters(**filters)
+            filters.pop("export_format")
+            return [attempt.completed_at for attempt in exports.attempts_for_export(**filters)]
+
+        self.assertEqual(exported(until="2024-06-01T12:30:00+00:00"), [moment])
+        self.assertEqual(
+            exported(since="2024-06-01T12:30:01+00:00"), [moment + timedelta(seconds=1)]
+        )
+        self.assertEqual(len(exported(since="2024-06-01", until="2024-06-01")), 2)
+        self.assertEqual(exported(until="2024-05-31"), [])
+
+
+class CounterTests(QuizTestCase):
+    """
+    reconcile reports the quiz counters that drifted from the question and attempt tables,
+    and repairs them.
+    """
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        user = User.objects.create_user("owner")
+        quiz = make_quiz(user, [QuestionDraft(text="Question", points=3)])
+        QuizAttempt.objects.create(user=user, quiz=quiz, score=2, time_taken=5)
+        self.assertEqual(counters.reconcile(fix=False), [])
+
+        # Writes that skip the signals, like a failure between a row and its counter update
+        Question.objects.bulk_create([Question(quiz=quiz, text="Unseen", points=2)])
+        Quiz.objects.filter(pk=quiz.pk).update(score_sum=7)
+
+        expected = [
+            (quiz.id, "question_count", 1, 2),
+            (quiz.id, "total_points", 3, 5),
+            (quiz.id, "score_sum", 7, 2),
+        ]
+        self.assertEqual(counters.reconcile(fix=False), expected)
+        self.assertEqual(counters.reconcile(fix=False), expected)  # Only reported
+        self.assertEqual(counters.reconcile(), expected)
+        self.assertEqual(counters.reconcile(fix=False), [])
+        quiz.refresh_from_db()
+        self.assertEqual(
+            (quiz.question_count, quiz.total_points, quiz.attempt_count, quiz.score_sum),
+            (2, 5, 1, 2),
+        )
+
+
+class ScoringTests(QuizTestCase):
+    """
+    The compiled answer key grades every question type from the submitted answer ids alone.
+    """
+
+    def setUp(self):
+        super().setUp()
+        drafts = [
+            QuestionDraft(
+                text=question_type,
+                question_type=question_type,
+                points=4,
+                answers=[AnswerDraft("A", True), AnswerDraft("B", True), AnswerDraft("C")],
+            )
+            for question_type in (
+                Question.SINGLE_CHOICE,
+                Question.MULTIPLE_CHOICE,
+                Question.MULTIPLE_CHOICE_PARTIAL,
+            )
+        ]
+        drafts.append(
+            QuestionDraft(
+                text="true_false",
+                question_type=Question.TRUE_FALSE,
+                points=4,
+                answers=[AnswerDraft("True", True), AnswerDraft("False")],
+            )
+        )
+        quiz = make_quiz(User.objects.create_user("owner"), drafts)
+        self.key = answer_keys.get(quiz.id, quiz.content_version)
+        self.answers = {
+            question.text: (question.id, [answer.id for answer in question.answers.order_by("id")])
+            for question in quiz.questions.all()
+        }
+
+    def _score(self, question_type, *picks):
+        """
+        Grades only the question of the given type, with the answers at the given indices.
+        """
+        question_id, answer_ids = self.answers[question_type]
+        data = {f"question_{question_id}": [str(answer_ids[pick]) for pick in picks]}
+        return self.key.score(data, (question_id,))
+
+    def test_single_choice(self):
+        # Either of two correct answers earns the points; only the first selection counts
+        for picks, points in (((0,), 4), ((1,), 4), ((2,), 0), ((2, 0), 0), ((), 0)):
+            self.assertEqual(self._score(Question.SINGLE_CHOICE, *picks)[0], points, picks)
+        question_id, (_, b, _) = self.answers[Question.SINGLE_CHOICE]
+        self.assertEqual(self._score(Question.SINGLE_CHOICE, 1), (4, [(question_id, b, True)]))
+        self.assertEqual(self._score(Question.SINGLE_CHOICE), (0, [(question_id, None, False)]))
+
+    def test_true_false(self):
+        self.assertEqual(self._score(Question.TRUE_FALSE, 0)[0], 4)
+        self.assertEqual(self._score(Question.TRUE_FALSE, 1)[0], 0)
+
+    def test_all_or_nothing(self):
+        for picks, points in (((0, 1), 4), ((0,), 0), ((0, 1, 2), 0), ((), 0)):
+            self.assertEqual(self._score(Question.MULTIPLE_CHOICE, *picks)[0], points, picks)
+
+    def test_partial_credit(self):
+        # points * (right - wrong) / correct answers, never below zero
+        for picks, points in (((0, 1), 4), ((0,), 2), ((0, 2), 0), ((2,), 0), ((0, 1, 2), 2)):
+            self.assertEqual(
+                self._score(Question.MULTIPLE_CHOICE_PARTIAL, *picks)[0], points, picks
+            )
+
+    def test_unknown_answer_ids_are_ignored(self):
+        question_id, (a, b, _) = self.answers[Question.MULTIPLE_CHOICE]
+        _, other_answers = self.answers[Question.SINGLE_CHOICE]
+        # Ids of another question, of no answer at all, non-numeric values and repeats
+        field = f"question_{question_id}"
+        data = {field: [str(other_answers[0]), "999999", "x", str(a), str(b), str(a)]}
+        score, responses = self.key.score(data, (question_id,))
+        self.assertEqual(score, 4)
+        self.assertEqual(responses, [(question_id, a, True), (question_id, b, True)])
+        score, responses = self.key.score({field: ["999999"]}, (question_id,))
+        self.assertEqual((score, responses), (0, [(question_id, None, False)]))
+        self.assertIsNone(self.key.check(question_id, other_answers[0]))
+
+
+class PooledQuizTests(QuizTestCase):
+    """
+    A submitted pooled attempt must be graded on the questions it was served, or rejected.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.login()
+        self.quiz = make_quiz(
+            self.user,
+            [
+                QuestionDraft(text=f"Question {i}", answers=[AnswerDraft("Right", True)])
+                for i in range(5)
+            ],
+            title="Pool",
+            pool_size=2,
+        )
+
+    def test_edit_between_play_and_submit_is_rejected(self):
+        token = attempt_tokens.issue(self.quiz, self.user)
+        Question.objects.create(quiz=self.quiz, text="New question", points=1)
+        response = self.client.post(
+            f"/submit_quiz/{self.quiz.id}/", {"attempt": token.sign()}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+        # The ids read at the new version were not cached under the old one
+        pools.question_ids(self.quiz.id, token.version)
+        self.assertIsNone(cache.get(pools._ids_key(self.quiz.id, token.version)))
+
+    def test_unchanged_quiz_is_graded_on_the_draw(self):
+        token = attempt_tokens.issue(self.quiz, self.user)
+        drawn = pools.draw_questions(self.quiz, token.seed)
+        data = {
+            f"question_{question['id']}": question["answers"][0]["id"] for question in drawn
+        }
+        response = self.client.post(
+            f"/submit_quiz/{self.quiz.id}/", {"attempt": token.sign(), **data}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(QuizAttempt.objects.get().score, 2)
+
+
+class AttemptTokenTests(QuizTestCase):
+    """
+    submit_quiz only accepts a signed attempt token once, before it expires, for the quiz
+    and user it was issued to.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.login()
+        drafts = [QuestionDraft(text="Question", answers=[AnswerDraft("A", True)])]
+        self.quiz, self.other_quiz = (
+            make_quiz(self.user, drafts, title=title) for title in ("Quiz", "Other")
+        )
+
+    def _submit(self, token, quiz=None):
+        return self.client.post(f"/submit_quiz/{(quiz or self.quiz).id}/", {"attempt": token})
+
+    def test_token_is_redeemed_once(self):
+        token = attempt_tokens.issue(self.quiz, self.user).sign()
+        self.assertEqual(self._submit(token).status_code, 302)
+        response = self._submit(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("already been submitted", response.json()["errors"]["__all__"][0])
+        self.assertEqual(QuizAttempt.objects.count(), 1)
+
+    def test_token_survives_a_failed_save(self):
+        token = attempt_tokens.issue(self.quiz, self.user).sign()
+        with mock.patch.object(views, "record_attempt", side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                self._submit(token)
+        with mock.patch.object(views, "record_attempt", side_effect=AttemptWriteFailed):
+            self.assertEqual(self._submit(token).status_code, 503)
+        # Nothing was saved, so the retry is accepted, once
+        self.assertEqual(self._submit(token).status_code, 302)
+        self.assertEqual(self._submit(token).status_code, 400)
+        self.assertEqual(QuizAttempt.objects.count(), 1)
+
+    def test_expired_token(self):
+        token = attempt_tokens.issue(self.quiz, self.user).sign()
+        later = time.time() + settings.QUIZ_ATTEMPT_TOKEN_MAX_AGE + 1
+        with mock.patch("django.core.signing.time.time", return_value=later):
+            response = self._submit(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("expired", response.json()["errors"]["__all__"][0])
+
+    def test_tampered_or_missing_token(self):
+        token = attempt_tokens.issue(self.quiz, self.user)
+        # A longer time taken, signed with another key
+        forged = signing.dumps(
+            astuple(replace(token, started_at=0)), key="not-the-secret", salt=attempt_tokens.SALT
+        )
+        for value in (forged, token.sign()[:-2] + "xx", ""):
+            self.assertEqual(self._submit(value).status_code, 400)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+    def test_token_of_another_user_or_quiz(self):
+        other = User.objects.create_user("other")
+        for token, quiz in (
+            (attempt_tokens.issue(self.quiz, other), self.quiz),
+            (attempt_tokens.issue(self.other_quiz, self.user), self.quiz),
+        ):
+            self.assertEqual(self._submit(token.sign(), quiz).status_code, 400)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+
+@override_settings(QUIZ_QUESTION_PAGE_SIZE=2, QUIZ_PROGRESSIVE_PLAY_THRESHOLD=3)
+class QuestionPageTests(QuizTestCase):
+    """
+    The paged question API keeps the compact keys play_quiz.js reads, walks the questions
+    in order through the "n" cursor and never reveals which answers are correct.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(
+            User.objects.create_user("owner"),
+            [
+                QuestionDraft(
+                    text=f"Text {i}",
+                    points=i,
+                    answers=[AnswerDraft(f"Right {i}", True), AnswerDraft(f"Wrong {i}")],
+                )
+                for i in range(5)
+            ],
+        )
+        self.url = f"/api/quizzes/{self.quiz.id}/questions/"
+
+    def test_pages_follow_the_cursor(self):
+        questions, cursor, sizes = [], None, []
+        while True:
+            # The content version, the questions and their answers
+            with self.assertNumQueries(3):
+                response = self.client.get(self.url, {"cursor": cursor} if cursor else {})
+            page = response.json()
+            self.assertEqual(set(page), {"v", "q", "n"})
+            self.assertEqual(page["v"], self.quiz.content_version)
+            sizes.append(len(page["q"]))
+            questions.extend(page["q"])
+            cursor = page["n"]
+            if cursor is None:
+                break
+        self.assertEqual(sizes, [2, 2, 1])
+
+        expected = list(self.quiz.questions.order_by("id").prefetch_related("answers"))
+        self.assertEqual([question["i"] for question in questions], [q.id for q in expected])
+        for question, model in zip(questions, expected):
+            self.assertEqual(set(question), {"i", "t", "k", "p", "a"})
+            self.assertEqual(
+                (question["t"], question["k"], question["p"]),
+                (model.text, model.question_type, model.points),
+            )
+            # [id, text] pairs only, with no trace of the correct answer
+            self.assertEqual(
+                question["a"], [[answer.id, answer.text] for answer in model.answers.all()]
+            )
+        self.assertNotIn(b"true", self.client.get(self.url).content)
+
+        # A malformed cursor starts over; an unknown quiz is not found
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.json()["q"][0]["i"], expected[0].id)
+        self.assertEqual(self.client.get("/api/quizzes/999999/questions/").status_code, 404)
+
+    def test_progressive_play_renders_the_first_page(self):
+        self.login()
+        response = self.client.get(f"/play_quiz/{self.quiz.id}/")
+        self.assertContains(response, "Text 1")
+        self.assertNotContains(response, "Text 2")
+        first_page = self.client.get(self.url).json()
+        self.assertEqual(response.context["next_page"], first_page["n"])
+        self.assertContains(response, f'data-next="{first_page["n"]}"')
+
+
+class QuizResultsTests(QuizTestCase):
+    """
+    The results page of an attempt must load its per-question breakdown with a fixed number
+    of queries, whatever the size of the quiz, and serve it from the cache afterwards.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.login()
+        # Loads the session and the user into their caches
+        self.client.get("/")
+
+    def _attempt(self, questions):
+        types = [Question.SINGLE_CHOICE, Question.MULTIPLE_CHOICE, Question.MULTIPLE_CHOICE_PARTIAL]
+        quiz = make_quiz(
+            self.user,
+            [
+                QuestionDraft(
+                    text=f"Question {i}",
+                    question_type=types[i % 3],
+                    points=2,
+                    answers=[
+                        AnswerDraft("Right", True),
+                        AnswerDraft("Also right", i % 3 != 0),
+                        AnswerDraft("Wrong"),
+                    ],
+                )
+                for i in range(questions)
+            ],
+        )
+        answer_key = answer_keys.get(quiz.id, quiz.content_version)
+        # Select the first answer of every question
+        data = {
+            field: [next(iter(choices))]
+            for _, field, _, _, choices, _, _ in answer_key.questions
+        }
+        score, responses = answer_key.score(data)
+        attempt = record_attempt(self.user, quiz, responses, score=score, time_taken=30)
+        # The results page starts with a cold answer key
+        answer_keys.invalidate(quiz.id)
+        cache.delete(AnswerKeyCache.cache_key(quiz.id, quiz.content_version))
+        return attempt
+
+    def test_breakdown_query_plan_is_fixed(self):
+        for questions in (3, 60):
+            attempt = self._attempt(questions)
+            # Attempt and quiz, responses with their questions and selected answers, correct
+            # answers, answer key and percentile
+            with self.assertNumQueries(5):
+                response = self.client.get(f"/quiz_results/{attempt.id}/")
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, "<tr>", count=questions + 1)
+
+            # The breakdown is cached: only the attempt and the percentile are read
+            with self.assertNumQueries(2):
+                self.client.get(f"/quiz_results/{attempt.id}/")
+
+    def test_points_per_question(self):
+        attempt = self._attempt(3)
+        response = self.client.get(f"/quiz_results/{attempt.id}/")
+        # Single choice: right; all or nothing: one of two; partial credit: one of two
+        self.assertContains(response, "2 / 2")
+        self.assertContains(response, "0 / 2")
+        self.assertContains(response, "1 / 2")
+        self.assertContains(response, f"{attempt.score} out of 6 points")
+
+    def test_breakdown_after_quiz_edit(self):
+        attempt = self._attempt(3)
+        self.assertContains(self.client.get(f"/quiz_results/{attempt.id}/"), "2 / 2")
+
+        # The answer selected on the first question is no longer the correct one
+        question = attempt.quiz.questions.order_by("id").first()
+        question.answers.filter(text="Right").update(is_correct=False)
+        answer = question.answers.get(text="Wrong")
+        answer.is_correct = True
+        answer.save()
+
+        response = self.client.get(f"/quiz_results/{attempt.id}/")
+        self.assertContains(response, "This quiz has been edited since this attempt")
+        self.assertNotContains(response, "2 / 2")
+        self.assertContains(response, f"<strong>Your Score:</strong> {attempt.score}</p>")
+
+    def test_attempts_of_other_users_are_hidden(self):
+        attempt = self._attempt(3)
+        self.login("other")
+        self.assertEqual(self.client.get(f"/quiz_results/{attempt.id}/").status_code, 404)
+
+
+class AttemptHistoryTests(QuizTestCase):
+    """
+    The attempt history dashboard must cost the same number of queries however many attempts
+    a player has, and its rollups must match the ones rebuilt from the attempts table.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.login()
+        self.client.get("/")
+        self.quizzes = [make_quiz(self.user, title=f"Quiz {i}") for i in range(3)]
+
+    def _play(self, quiz, score, day):
+        now = datetime(2026, 3, day, 12, tzinfo=dt_timezone.utc)
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            return QuizAttempt.objects.create(
+                user=self.user, quiz=quiz, score=score, time_taken=10
+            )
+
+    def _rollups(self):
+        return (
+            sorted(
+                PlayerQuizStats.objects.values_list(
+                    "user_id", "quiz_id", "attempts", "best_score", "last_completed_at"
+                )
+            ),
+            list(
+                PlayerStats.objects.values_list(
+                    "user_id", "current_streak", "longest_streak", "last_played_on"
+                )
+            ),
+        )
+
+    def test_dashboard_query_count_is_constant(self):
+        for attempts in (1, 45):
+            for i in range(attempts):
+                self._play(self.quizzes[i % 3], i, 1 + i % 28)
+            # The page of attempts with their quiz, the totals, the streaks and the best scores
+            with self.assertNumQueries(4):
+                response = self.client.get("/history/")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context["attempts"].has_next or attempts == 1)
+
+        # The next page follows the keyset cursor
+        cursor = response.context["next_cursor"]
+        with self.assertNumQueries(4):
+            response = self.client.get("/history/", {"cursor": cursor})
+        self.assertEqual(len(response.context["attempts"]), 20)
+
+    def test_rollups_match_rebuild(self):
+        for quiz, score, day in [
+            (self.quizzes[0], 3, 1),
+            (self.quizzes[0], 7, 2),
+            (self.quizzes[1], 5, 2),
+            (self.quizzes[0], 4, 3),
+            (self.quizzes[2], 1, 6),
+            (self.quizzes[2], 2, 7),
+        ]:
+            self._play(quiz, score, day)
+        incremental = self._rollups()
+        history.rebuild_all()
+        self.assertEqual(incremental, self._rollups())
+
+        stats = PlayerStats.objects.get(user=self.user)
+        self.assertEqual((stats.current_streak, stats.longest_streak), (2, 3))
+        best = PlayerQuizStats.objects.get(user=self.user, quiz=self.quizzes[0])
+        self.assertEqual((best.attempts, best.best_score), (3, 7))
+
+    def test_deleting_an_attempt_recomputes_rollups(self):
+        attempts = [self._play(self.quizzes[0], score, day) for score, day in [(9, 1), (4, 2)]]
+        attempts[0].delete()
+        best = PlayerQuizStats.objects.get(user=self.user, quiz=self.quizzes[0])
+        self.assertEqual((best.attempts, best.best_score), (1, 4))
+        self.assertEqual(PlayerStats.objects.get(user=self.user).longest_streak, 1)
+
+        attempts[1].delete()
+        self.assertEqual(self._rollups(), ([], []))
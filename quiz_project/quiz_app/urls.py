@@ -8,6 +8,9 @@ It maps specific URL patterns to their corresponding view functions, enabling
 users to interact with different features of the application. The urlpatterns list
 is used by Django to match incoming HTTP requests with appropriate views.
 
+When the QUIZ_ASYNC_VIEWS setting is enabled, index, play_quiz, check_answer, submit_quiz
+and quiz_results are served by the async views in async_views.py.
+
 URL Patterns:
 1. index: Root view of the application (home page).
 2. sign_up: URL for user registration.
@@ -16,10 +19,24 @@ URL Patterns:
 5. create_quiz: URL for quiz creation.
 6. play_quiz: URL to play a specific quiz, identified by quiz_id.
 7. check_answer: URL to check the user's answer for a specific question, identified by question_id.
+   check_answers: URL to check many (question, answer) pairs in one request.
 8. submit_quiz: URL to submit answers for a quiz, identified by quiz_id.
-9. quiz_results: URL to display quiz results, showing the quiz_id, the user's score, and the total score.
+9. quiz_results: URL to display the results of a quiz attempt, identified by attempt_id.
+10. answer_key_stats: URL exposing the answer-key cache counters to staff users.
+11. create_quiz_api: JSON endpoint for creating a quiz with its questions and answers.
+12. search: URL for the full-text quiz search page.
+13. search_api: JSON endpoint for full-text quiz search.
+14. leaderboard: URL to display the top attempts at a quiz, identified by quiz_id.
+15. write_behind_stats: URL exposing the attempt write-behind metrics to staff users.
+16. metrics: URL exposing the per-view request metrics in Prometheus text format.
+17. quiz_snapshot: JSON endpoint serving the versioned snapshot of a quiz, identified by quiz_id.
+18. quiz_stats: URL to display the per-question statistics of a quiz to its owner.
+19. export_attempts: URL streaming the attempts at the user's quizzes as CSV or JSON Lines.
+20. quiz_questions: JSON endpoint serving the questions of a quiz one cursor-paginated page at a time.
+21. attempt_history: URL to display the user's past attempts and their rollups.
 """
 
+from django.conf import settings
 from django.urls import path
 from .views import (
     sign_up,
@@ -28,11 +45,34 @@ from .views import (
     create_quiz,
     play_quiz,
     check_answer,
+    check_answers,
     index,
     submit_quiz,
     quiz_results,
+    answer_key_stats,
+    create_quiz_api,
+    search,
+    search_api,
+    leaderboard,
+    write_behind_stats,
+    metrics,
+    quiz_snapshot,
+    quiz_stats,
+    export_attempts,
+    quiz_questions,
+    attempt_history,
 )
 
+# On ASGI deployments, serve the play path from the native async views instead
+if settings.QUIZ_ASYNC_VIEWS:
+    from .async_views import (  # noqa: F811
+        index,
+        play_quiz,
+        check_answer,
+        submit_quiz,
+        quiz_results,
+    )
+
 # Define urlpatterns to map URLs to their corresponding view functions
 urlpatterns = [
     path("", index, name="index"),  # Root view for the app
@@ -46,12 +86,41 @@ urlpatterns = [
     path(
         "check_answer/<int:question_id>/", check_answer, name="check_answer"
     ),  # Endpoint to check answers
+    path(
+        "check_answers/", check_answers, name="check_answers"
+    ),  # Endpoint to check many answers at once
     path(
         "submit_quiz/<int:quiz_id>/", submit_quiz, name="submit_quiz"
     ),  # Endpoint to submit quiz answers
     path(
-        "quiz_results/<int:quiz_id>/<int:score>/<int:total>/",
+        "quiz_results/<int:attempt_id>/",
         quiz_results,
         name="quiz_results",
     ),  # Display quiz results
+    path(
+        "answer_key_stats/", answer_key_stats, name="answer_key_stats"
+    ),  # Answer-key cache counters
+    path(
+        "api/quizzes/", create_quiz_api, name="create_quiz_api"
+    ),  # JSON endpoint to create a quiz
+    path("search/", search, name="search"),  # Full-text quiz search page
+    path("api/search/", search_api, name="search_api"),  # JSON quiz search
+    path(
+        "leaderboard/<int:quiz_id>/", leaderboard, name="leaderboard"
+    ),  # Top attempts at a quiz
+    path(
+        "write_behind_stats/", write_behind_stats, name="write_behind_stats"
+    ),  # Attempt write-behind metrics
+    path("metrics", metrics, name="metrics"),  # Prometheus scrape endpoint
+    path(
+        "api/quizzes/<int:quiz_id>/snapshot/", quiz_snapshot, name="quiz_snapshot"
+    ),  # Versioned quiz content with ETag support
+    path("quiz_stats/<int:quiz_id>/", quiz_stats, name="quiz_stats"),  # Owner analytics
+    path(
+        "export_attempts/", export_attempts, name="export_attempts"
+    ),  # CSV/JSONL download of the attempts at the user's quizzes
+    path(
+        "api/quizzes/<int:quiz_id>/questions/", quiz_questions, name="quiz_questions"
+    ),  # Paged question JSON for progressive play
+    path("history/", attempt_history, name="attempt_history"),  # The user's past attempts
 ]
@@ -0,0 +1,98 @@
+"""
+File: users.py
+
+Description: This file caches the logged-in User objects looked up by
+CachedAuthenticationMiddleware (see middleware.py), so an authenticated request does not
+load its user from the database. Cached users are checked against the session's auth hash
+exactly like django.contrib.auth.get_user does, so changing a password still logs out other
+sessions. signals.py drops a user's entry whenever the User row is saved or deleted, and
+entries expire after USER_CACHE_TIMEOUT seconds in any case (covering group and permission
+changes, which do not save the user).
+
+Functions in this file:
+1. get_user: Returns the user of a request, from the cache when possible.
+   aget_user is its async counterpart.
+2. invalidate_user: Drops a user's cache entry.
+"""
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+
+def _cache_key(user_id):
+    return f"quiz_app:user:{user_id}"
+
+
+def _timeout():
+    return getattr(settings, "USER_CACHE_TIMEOUT", 60)
+
+
+def _session_user(user_id, backend_path):
+    """
+    Returns (user id, backend path) from the session, or None if the session is not
+    logged in with a configured backend.
+    """
+    if user_id is None or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return None
+    return user_id, backend_path
+
+
+def _verified(user, session_hash, backend_path):
+    """
+    Returns the cached user if the session's auth hash still matches it, else None.
+    """
+    if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+        user.backend = backend_path
+        return user
+    # Let Django decide: the hash may match a SECRET_KEY_FALLBACKS key, or the session
+    # must be flushed
+    return None
+
+
+def get_user(request):
+    """
+    Returns the user logged in to a request's session, or an AnonymousUser.
+    """
+    session = request.session
+    session_user = _session_user(session.get(SESSION_KEY), session.get(BACKEND_SESSION_KEY))
+    if session_user is None:
+        return auth.get_user(request)
+    user_id, backend_path = session_user
+
+    user = cache.get(_cache_key(user_id))
+    if user is not None:
+        user = _verified(user, session.get(HASH_SESSION_KEY), backend_path)
+    if user is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache.set(_cache_key(user_id), user, _timeout())
+    return user
+
+
+async def aget_user(request):
+    """
+    Async version of get_user.
+    """
+    session = request.session
+    session_user = _session_user(
+        await session.aget(SESSION_KEY), await session.aget(BACKEND_SESSION_KEY)
+    )
+    if session_user is None:
+        return await auth.aget_user(request)
+    user_id, backend_path = session_user
+
+    user = await cache.aget(_cache_key(user_id))
+    if user is not None:
+        user = _verified(user, await session.aget(HASH_SESSION_KEY), backend_path)
+    if user is None:
+        user = await auth.aget_user(request)
+        if user.is_authenticated:
+            await cache.aset(_cache_key(user_id), user, _timeout())
+    return user
+
+
+def invalidate_user(user_id):
+    cache.delete(_cache_key(user_id))
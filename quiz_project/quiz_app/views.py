@@ -9,38 +9,105 @@ Each view corresponds to a specific functionality, such as user authentication,
 playing a quiz, and displaying results.
 
 Views in this file:
-1. index: Displays the list of available quizzes on the home page.
+1. index: Displays a filterable, paginated list of quizzes on the home page.
 2. sign_up: Handles user registration.
 3. sign_in: Handles user login.
 4. sign_out: Logs out the user and redirects to the login page.
 5. create_quiz: Allows authenticated users to create a quiz with questions and answers.
-6. play_quiz: Fetches and displays a specific quiz for the user to attempt.
+6. play_quiz: Fetches and displays a specific quiz for the user to attempt, with a signed
+   attempt token, drawing a random subset of its questions if it has a pool size. Large quizzes
+   are played progressively: the first page of questions is rendered and the rest fetched.
 7. check_answer: Verifies if a selected answer is correct and returns the result as JSON.
-8. submit_quiz: Processes user-submitted answers, calculates the score, and saves the attempt.
-9. quiz_results: Displays the results of a quiz attempt.
+   check_answers does the same for many (question, answer) pairs in one request.
+8. submit_quiz: Processes user-submitted answers, calculates the score, and saves the attempt
+   together with every per-question response. The attempt token gives the time taken, and the
+   questions drawn from a pooled quiz.
+9. quiz_results: Displays the results of a quiz attempt, with the answers selected and the points
+   earned on each question.
+10. answer_key_stats: Returns the answer-key cache counters as JSON (staff only).
+11. create_quiz_api: Creates a quiz with questions and answers from a JSON document.
+12. search: Displays the quizzes matching a full-text query.
+13. search_api: Returns the quizzes matching a full-text query as JSON.
+14. leaderboard: Displays the top attempts at a quiz.
+15. write_behind_stats: Returns the attempt write-behind queue metrics as JSON (staff only).
+16. metrics: Returns the per-view request metrics in Prometheus text format (staff or token).
+17. quiz_snapshot: Returns the versioned JSON snapshot of a quiz, with conditional GET support.
+18. quiz_stats: Displays the per-question answer statistics of a quiz to its owner.
+19. export_attempts: Streams the attempts at the user's quizzes, with their responses, as CSV
+    or JSON Lines.
+20. quiz_questions: Returns one cursor-paginated page of the questions of a quiz as JSON.
+21. attempt_history: Displays the user's past attempts, newest first, with their totals, streaks
+    and best score per quiz.
 """
 
+import json
+import re
+
 from django.contrib.auth.models import User
 from django.contrib.auth import login, logout, authenticate
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from .models import Question, Answer, Quiz, QuizAttempt
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.views.decorators.http import condition, require_POST
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.urls import reverse
+from .models import Question, Quiz, QuizAttempt, StatsWatermark
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from .answer_keys import answer_keys
+from .fragments import questions_fragment, render_questions
+from .pools import draw_questions, drawn_question_ids
+from .question_pages import get_question_page
+from .results import results_fragment
+from .history import attempt_history as history_page, player_summary
+from . import attempt_tokens
+from .catalogue import catalogue_page, facet_counts
+from .search import search_quizzes
+from .leaderboards import percentile_rank, top_attempts
+
+from .attempts import record_attempt
+from .write_behind import AttemptWriteFailed, get_buffer, write_behind_settings
+from .metrics import render_prometheus
+from .snapshots import content_state, get_snapshot
+from .analytics import WATERMARK, quiz_question_stats
+from .exports import FORMATS, attempts_for_export, parse_export_filters, stream_export
+from .authoring import parse_form_questions, parse_json_questions, save_quiz
 from .forms import CustomUserCreationForm, QuizForm, QuestionFormSet, AnswerFormSet
 from django.contrib.auth.forms import AuthenticationForm
 
+# Upper bound on the (question, answer) pairs accepted by check_answers
+MAX_CHECKED_ANSWERS = 1000
+
 
 def index(request):
     """
-    Displays the list of available quizzes on the home page.
+    Displays one page of the quiz catalogue on the home page.
     Parameters:
-        request: The HTTP request object.
+        request: The HTTP request object. The optional "category" and "difficulty"
+            query parameters filter the quizzes, and "cursor" selects the page.
     Returns:
-        HttpResponse: Renders the 'index.html' template with all quizzes and the user object.
+        HttpResponse: Renders the 'index.html' template with the page of quizzes,
+        the facet counts, the link to the next page and the user object.
     """
-    quizzes = Quiz.objects.all()
+    category = request.GET.get("category", "")
+    difficulty = request.GET.get("difficulty", "")
+    page = catalogue_page(category, difficulty, request.GET.get("cursor"))
+
+    next_query = None
+    if page.has_next:
+        params = request.GET.copy()
+        params["cursor"] = page.next_cursor
+        next_query = params.urlencode()
+
     context = {
-        "quizzes": quizzes,
+        "quizzes": page,
+        "facets": facet_counts(),
+        "category": category,
+        "difficulty": difficulty,
+        "next_query": next_query,
         "user": request.user,  # Pass the user object to the template
     }
     return render(request, "index.html", context)
@@ -113,64 +180,18 @@ def create_quiz(request):
         or redirects to 'index' upon successful quiz creation.
     """
     if request.method == "POST":
-        print(request.POST)  # Debugging: Print all POST data
-
         quiz_form = QuizForm(request.POST)
         if quiz_form.is_valid():
-            # Save the quiz
             quiz = quiz_form.save(commit=False)
             quiz.owner = request.user
-            quiz.save()
-
-            # Loop through the questions provided in the form
-            question_index = 0
-            while f"questions[{question_index}][text]" in request.POST:
-                question_text = request.POST.get(f"questions[{question_index}][text]")
-                print(f"Question: {question_text}")  # Debugging
-
-                # Create a new question
-                question = Question.objects.create(
-                    quiz=quiz,
-                    text=question_text,
-                    question_type=request.POST.get(
-                        f"questions[{question_index}][question_type]", "text"
-                    ),
-                    points=int(
-                        request.POST.get(f"questions[{question_index}][points]", 0)
-                    ),
-                )
-
-                # Loop through answers for the question
-                answer_index = 0
-                while (
-                    f"questions[{question_index}][answers][{answer_index}][text]"
-                    in request.POST
-                ):
-                    answer_text = request.POST.get(
-                        f"questions[{question_index}][answers][{answer_index}][text]"
-                    )
-                    is_correct = (
-                        request.POST.get(
-                            f"questions[{question_index}][answers][{answer_index}][is_correct]",
-                            "off",
-                        )
-                        == "on"
-                    )
-                    print(
-                        f"Answer {answer_index}: {answer_text}, Is Correct: {is_correct}"
-                    )  # Debugging
-
-                    # Create the answer
-                    Answer.objects.create(
-                        question=question,
-                        text=answer_text,
-                        is_correct=is_correct,
-                    )
-                    answer_index += 1
-
-                question_index += 1
-
-            return redirect("index")  # Redirect to the homepage
+            try:
+                # Parse every question and answer first, then write them in one transaction
+                drafts = parse_form_questions(request.POST)
+                save_quiz(quiz, drafts)
+            except ValidationError as error:
+                quiz_form.add_error(None, error)
+            else:
+                return redirect("index")  # Redirect to the homepage
     else:
         # Load an empty quiz form for GET requests
         quiz_form = QuizForm()
@@ -185,15 +206,25 @@ def play_quiz(request, quiz_id):
         request: The HTTP request object.
         quiz_id: The ID of the quiz to be played.
     Returns:
-        HttpResponse: Renders the 'play_quiz.html' template with the quiz and its questions.
+        HttpResponse: Renders the 'play_quiz.html' template with the quiz and its cached questions.
     """
     quiz = get_object_or_404(Quiz, id=quiz_id)  # Fetch the quiz
-    questions = quiz.questions.all()  # Get all questions for the quiz
 
-    context = {
-        "quiz": quiz,
-        "questions": questions,  # Pass all questions to the template
-    }
+    # Signed token recording when the attempt started, so that nothing is written yet
+    attempt = attempt_tokens.issue(quiz, request.user)
+    context = {"quiz": quiz, "attempt_token": attempt.sign()}
+    if quiz.pool_size:
+        # A random subset per attempt, drawn from the seed in the token
+        context["questions_html"] = render_questions(draw_questions(quiz, attempt.seed))
+    elif quiz.question_count > settings.QUIZ_PROGRESSIVE_PLAY_THRESHOLD:
+        # Large quizzes: render the first page, play_quiz.js fetches the others
+        page = get_question_page(quiz.id, quiz.content_version)
+        context["questions_html"] = render_questions(page.expanded())
+        context["next_page"] = page.next_cursor
+        context["multi_select_types"] = " ".join(Question.MULTI_SELECT_TYPES)
+    else:
+        # Rendered question block, cached per quiz content version
+        context["questions_html"] = questions_fragment(quiz)
     return render(request, "play_quiz.html", context)
 
 
@@ -201,16 +232,58 @@ def check_answer(request, question_id):
     """
     Verifies if the selected answer for a question is correct.
     Parameters:
-        request: The HTTP request object.
+        request: The HTTP request object with the selected answer id in "answer".
         question_id: The ID of the question being answered.
     Returns:
         JsonResponse: A JSON response indicating whether the answer is correct.
+    Raises:
+        Http404: If the question does not exist or the answer does not belong to it.
+    """
+    answer_key = answer_keys.for_questions([question_id]).get(question_id)
+    is_correct = None
+    if answer_key is not None:
+        is_correct = answer_key.check(question_id, request.POST.get("answer"))
+    if is_correct is None:
+        raise Http404("No such answer for this question.")
+    return JsonResponse({"correct": is_correct})
+
+
+@require_POST
+def check_answers(request):
+    """
+    Verifies many selected answers at once.
+    Parameters:
+        request: The HTTP request object whose body is a JSON object of the form
+            {"answers": [{"question": <id>, "answer": <id>}, ...]}.
+    Returns:
+        JsonResponse: {"results": [{"question", "answer", "correct"}, ...]} in request
+        order, where "correct" is null if the answer does not belong to the question.
     """
-    question = Question.objects.get(id=question_id)
-    selected_answer_id = request.POST.get("answer")
-    selected_answer = Answer.objects.get(id=selected_answer_id)
-    is_correct = selected_answer.is_correct
-    return JsonResponse({"correccreatet": is_correct})
+    try:
+        pairs = json.loads(request.body)["answers"]
+        pairs = [(int(pair["question"]), pair["answer"]) for pair in pairs]
+    except (UnicodeDecodeError, ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {"error": "Expected a JSON object with a list of question/answer pairs."},
+            status=400,
+        )
+    if len(pairs) > MAX_CHECKED_ANSWERS:
+        return JsonResponse(
+            {"error": f"At most {MAX_CHECKED_ANSWERS} answers per request."}, status=400
+        )
+
+    answer_keys_by_question = answer_keys.for_questions(qid for qid, _ in pairs)
+    results = []
+    for question_id, answer_id in pairs:
+        answer_key = answer_keys_by_question.get(question_id)
+        results.append(
+            {
+                "question": question_id,
+                "answer": answer_id,
+                "correct": answer_key.check(question_id, answer_id) if answer_key else None,
+            }
+        )
+    return JsonResponse({"results": results})
 
 
 @login_required
@@ -221,53 +294,389 @@ def submit_quiz(request, quiz_id):
         request: The HTTP request object.
         quiz_id: The ID of the quiz being submitted.
     Returns:
-        HttpResponseRedirect: Redirects to the quiz results page.
+        HttpResponseRedirect: Redirects to the quiz results page, or to the attempt history
+        if the attempt is still queued by the write-behind buffer.
     """
     quiz = get_object_or_404(Quiz, id=quiz_id)
-    questions = quiz.questions.all()  # Get all questions for the quiz
-    total_questions = questions.count()
-    correct_answers = 0
-
-    # Calculate the score based on user responses
-    for question in questions:
-        user_answer_id = request.POST.get(
-            f"question_{question.id}"
-        )  # Fetch user's answer for this question
-        if user_answer_id:
-            user_answer = Answer.objects.filter(id=user_answer_id).first()
-            if user_answer and user_answer.is_correct:
-                correct_answers += 1
-
-    # Save the attempt
-    QuizAttempt.objects.create(
-        user=request.user,
-        quiz=quiz,
-        score=correct_answers,
-        time_taken=0,  # Placeholder for future time tracking
-    )
+
+    # Verify the attempt token issued by play_quiz and reject replays
+    try:
+        attempt = attempt_tokens.redeem(quiz, request.user, request.POST.get("attempt"))
+        question_ids = None
+        if attempt.pool_size:
+            # Only the questions drawn for this attempt, replayed from the seed in its token
+            question_ids = drawn_question_ids(attempt, quiz)
+    except ValidationError as error:
+        return JsonResponse({"errors": {"__all__": error.messages}}, status=400)
+
+    try:
+        # Grade against the cached answer key instead of querying each answer
+        answer_key = answer_keys.get(quiz.id, quiz.content_version)
+        # Points-aware grading in one pass over the compiled key, without queries
+        score, responses = answer_key.score(request.POST, question_ids)
+
+        # Save the attempt and every response in one transaction
+        saved = record_attempt(
+            request.user,
+            quiz,
+            responses,
+            score=score,
+            time_taken=attempt.time_taken(),
+            wait=True,  # The results page is addressed by the attempt id
+        )
+    except AttemptWriteFailed:
+        # Nothing was saved, so the same token can be submitted again
+        attempt_tokens.release(attempt)
+        return JsonResponse(
+            {"errors": {"__all__": ["Your attempt could not be saved, please try again."]}},
+            status=503,
+        )
+    except Exception:
+        attempt_tokens.release(attempt)
+        raise
+    if saved.pk is None:
+        # Still queued, and written later: the history lists it once it is
+        return redirect(reverse("attempt_history") + "?pending=1")
 
     # Redirect to results page
-    return redirect(
-        "quiz_results", quiz_id=quiz.id, score=correct_answers, total=total_questions
+    return redirect("quiz_results", attempt_id=saved.pk)
+
+
+@login_required
+def quiz_results(request, attempt_id):
+    """
+    Displays the results of one of the user's quiz attempts, with its per-question breakdown.
+    Parameters:
+        request: The HTTP request object.
+        attempt_id: The ID of the QuizAttempt.
+    Returns:
+        HttpResponse: Renders the 'quiz_results.html' template with the attempt, its cached
+        breakdown and the percentage of attempts that scored lower.
+    Raises:
+        Http404: If the attempt does not exist or belongs to another user.
+    """
+    attempt = get_object_or_404(
+        QuizAttempt.objects.select_related("quiz"), id=attempt_id, user=request.user
     )
+    context = {
+        "quiz": attempt.quiz,
+        "attempt": attempt,
+        # Rendered once per attempt and quiz content version
+        "breakdown_html": results_fragment(attempt),
+        # Share of attempts at this quiz that scored lower, from the score histogram
+        "percentile": percentile_rank(attempt.quiz_id, attempt.score),
+    }
+    return render(request, "quiz_results.html", context)
+
+
+@staff_member_required
+def answer_key_stats(request):
+    """
+    Returns the hit/miss counters of the answer-key cache.
+    Parameters:
+        request: The HTTP request object.
+    Returns:
+        JsonResponse: The cache counters and current size for this process.
+    """
+    return JsonResponse(answer_keys.stats())
 
 
 @login_required
-def quiz_results(request, quiz_id, score, total):
+@require_POST
+def create_quiz_api(request):
+    """
+    Creates a quiz from a JSON document using the same pipeline as create_quiz.
+    Parameters:
+        request: The HTTP request object whose body is a JSON object with the quiz
+            fields (title, description, category, difficulty) and a "questions" list.
+    Returns:
+        JsonResponse: The new quiz id and question count (201), or the errors (400).
+    """
+    try:
+        payload = json.loads(request.body)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return JsonResponse({"errors": {"__all__": ["Invalid JSON body."]}}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"errors": {"__all__": ["Expected a JSON object."]}}, status=400)
+
+    quiz_form = QuizForm(payload)
+    if not quiz_form.is_valid():
+        return JsonResponse({"errors": quiz_form.errors}, status=400)
+
+    quiz = quiz_form.save(commit=False)
+    quiz.owner = request.user
+    try:
+        drafts = parse_json_questions(payload.get("questions", []))
+        save_quiz(quiz, drafts)
+    except ValidationError as error:
+        return JsonResponse({"errors": {"__all__": error.messages}}, status=400)
+
+    return JsonResponse({"id": quiz.id, "questions": len(drafts)}, status=201)
+
+
+def search(request):
+    """
+    Displays the quizzes matching a full-text query, best match first.
+    Parameters:
+        request: The HTTP request object with the query in the "q" parameter.
+    Returns:
+        HttpResponse: Renders the 'search.html' template with the ranked results.
+    """
+    query = request.GET.get("q", "").strip()
+    context = {
+        "query": query,
+        "results": search_quizzes(query) if query else [],
+    }
+    return render(request, "search.html", context)
+
+
+def search_api(request):
     """
-    Displays the results of a quiz attempt.
+    Returns the quizzes matching a full-text query as JSON.
+    Parameters:
+        request: The HTTP request object with the query in "q" and an optional "limit".
+    Returns:
+        JsonResponse: The ranked results with their quiz fields and bm25 rank.
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    results = search_quizzes(query, limit) if query else []
+    return JsonResponse(
+        {
+            "query": query,
+            "results": [
+                {
+                    "id": result.quiz.id,
+                    "title": result.quiz.title,
+                    "category": result.quiz.category,
+                    "difficulty": result.quiz.difficulty,
+                    "rank": result.rank,
+                }
+                for result in results
+            ],
+        }
+    )
+
+
+def leaderboard(request, quiz_id):
+    """
+    Displays the top attempts at a quiz.
     Parameters:
         request: The HTTP request object.
         quiz_id: The ID of the quiz.
-        score: The score achieved by the user.
-        total: The total number of questions in the quiz.
     Returns:
-        HttpResponse: Renders the 'quiz_results.html' template with the quiz and score details.
+        HttpResponse: Renders the 'leaderboard.html' template with the ranked entries.
     """
     quiz = get_object_or_404(Quiz, id=quiz_id)
     context = {
         "quiz": quiz,
-        "score": score,
-        "total": total,
+        "entries": top_attempts(quiz.id),
     }
-    return render(request, "quiz_results.html", context)
+    return render(request, "leaderboard.html", context)
+
+
+@staff_member_required
+def write_behind_stats(request):
+    """
+    Returns the queue depth and flush latency metrics of the attempt write-behind buffer.
+    Parameters:
+        request: The HTTP request object.
+    Returns:
+        JsonResponse: The metrics for this process, or {"enabled": false}.
+    """
+    if not write_behind_settings()["ENABLED"]:
+        return JsonResponse({"enabled": False})
+    return JsonResponse(dict(get_buffer().stats(), enabled=True))
+
+
+def metrics(request):
+    """
+    Exposes the request metrics of this process for Prometheus to scrape.
+    Parameters:
+        request: The HTTP request object. When QUIZ_METRICS_TOKEN is set, it must carry
+            the header "Authorization: Bearer <token>"; otherwise it must come from a
+            logged-in staff member.
+    Returns:
+        HttpResponse: The metrics in Prometheus text format, or 403 if access is denied.
+    """
+    token = settings.QUIZ_METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(
+        render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+GZIP_RE = re.compile(r"\bgzip\b")
+
+
+def _serves_gzip(request):
+    return settings.QUIZ_SNAPSHOT_GZIP and bool(
+        GZIP_RE.search(request.headers.get("Accept-Encoding", ""))
+    )
+
+
+def _snapshot_state(request, quiz_id):
+    # condition() asks for the ETag and the Last-Modified date separately; look both up
+    # with a single query
+    if not hasattr(request, "quiz_content_state"):
+        request.quiz_content_state = content_state(quiz_id)
+    return request.quiz_content_state
+
+
+def _snapshot_etag(request, quiz_id):
+    state = _snapshot_state(request, quiz_id)
+    if state is None:
+        return None
+    # The gzip and identity encodings are different representations
+    return f"{quiz_id}-{state[0]}" + ("-gzip" if _serves_gzip(request) else "")
+
+
+def _snapshot_last_modified(request, quiz_id):
+    state = _snapshot_state(request, quiz_id)
+    return state[1] if state is not None else None
+
+
+@condition(etag_func=_snapshot_etag, last_modified_func=_snapshot_last_modified)
+def quiz_snapshot(request, quiz_id):
+    """
+    Returns the JSON snapshot of a quiz's current content version (see snapshots.py).
+    Requests whose If-None-Match or If-Modified-Since matches the current version get an
+    empty 304 response without the snapshot being loaded.
+    Parameters:
+        request: The HTTP request object.
+        quiz_id: The ID of the quiz.
+    Returns:
+        HttpResponse: The snapshot, gzip-compressed if the client accepts it.
+    Raises:
+        Http404: If the quiz does not exist.
+    """
+    state = _snapshot_state(request, quiz_id)
+    snapshot = get_snapshot(quiz_id, state[0]) if state is not None else None
+    if snapshot is None:
+        raise Http404("No such quiz.")
+
+    gzipped = snapshot.gzipped is not None and _serves_gzip(request)
+    response = HttpResponse(
+        snapshot.gzipped if gzipped else snapshot.body, content_type="application/json"
+    )
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    # Describe the snapshot actually sent, which is newer if the quiz changed meanwhile
+    response.headers["ETag"] = f'"{snapshot.etag}{"-gzip" if gzipped else ""}"'
+    response.headers["Last-Modified"] = http_date(snapshot.updated_at.timestamp())
+    patch_vary_headers(response, ["Accept-Encoding"])
+    patch_cache_control(response, public=True, max_age=settings.QUIZ_SNAPSHOT_MAX_AGE)
+    return response
+
+
+def _content_etag(request, quiz_id):
+    state = _snapshot_state(request, quiz_id)
+    return f"{quiz_id}-{state[0]}" if state is not None else None
+
+
+@condition(etag_func=_content_etag, last_modified_func=_snapshot_last_modified)
+def quiz_questions(request, quiz_id):
+    """
+    Returns one page of the questions and answers of a quiz as compact JSON (see
+    question_pages.py), without the correct answers.
+    Parameters:
+        request: The HTTP request object, with the "cursor" of the page in the query string
+            (omitted for the first page).
+        quiz_id: The ID of the quiz.
+    Returns:
+        HttpResponse: The page, whose "n" member is the cursor of the next page.
+    Raises:
+        Http404: If the quiz does not exist.
+    """
+    state = _snapshot_state(request, quiz_id)
+    if state is None:
+        raise Http404("No such quiz.")
+    page = get_question_page(quiz_id, state[0], request.GET.get("cursor"))
+    response = HttpResponse(page.body, content_type="application/json")
+    patch_cache_control(response, public=True, max_age=settings.QUIZ_SNAPSHOT_MAX_AGE)
+    return response
+
+
+@login_required
+def quiz_stats(request, quiz_id):
+    """
+    Displays the percentage of correct answers, the discrimination index and the answer
+    distribution of every question of a quiz, as computed by the update_question_stats job.
+    Parameters:
+        request: The HTTP request object.
+        quiz_id: The ID of the quiz.
+    Returns:
+        HttpResponse: Renders the 'quiz_stats.html' template.
+    Raises:
+        Http404: If the quiz does not exist or is not owned by the user.
+    """
+    quiz = get_object_or_404(Quiz, id=quiz_id, owner=request.user)
+    context = {
+        "quiz": quiz,
+        "questions": quiz_question_stats(quiz),
+        "watermark": StatsWatermark.objects.filter(name=WATERMARK).first(),
+    }
+    return render(request, "quiz_stats.html", context)
+
+
+@login_required
+def export_attempts(request):
+    """
+    Streams every attempt at the user's quizzes, with its per-question responses.
+    Parameters:
+        request: The HTTP request object, with optional "quiz" (repeatable), "since" and
+            "until" (ISO dates or datetimes) filters and a "format" of csv or jsonl.
+    Returns:
+        StreamingHttpResponse: The export as a file download, or a JsonResponse with the
+        errors (400) if a filter is invalid.
+    """
+    try:
+        filters = parse_export_filters(
+            quiz_ids=request.GET.getlist("quiz"),
+            since=request.GET.get("since"),
+            until=request.GET.get("until"),
+            export_format=request.GET.get("format"),
+        )
+    except ValidationError as error:
+        return JsonResponse({"errors": {"__all__": error.messages}}, status=400)
+
+    export_format = filters.pop("export_format")
+    attempts = attempts_for_export(owner=request.user, **filters)
+    response = StreamingHttpResponse(
+        stream_export(attempts, export_format), content_type=FORMATS[export_format]
+    )
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="quiz-attempts.{export_format}"'
+    )
+    return response
+
+
+@login_required
+def attempt_history(request):
+    """
+    Displays one page of the user's attempts, newest first, below their rollups.
+    Parameters:
+        request: The HTTP request object, with an optional "cursor" selecting the page and
+            "pending" set by submit_quiz when the attempt it saved is still queued.
+    Returns:
+        HttpResponse: Renders the 'attempt_history.html' template with the page of attempts,
+        the link to the next page and the user's totals, streaks and best scores.
+    """
+    page = history_page(request.user, request.GET.get("cursor"))
+    context = {
+        "attempts": page,
+        "next_cursor": page.next_cursor,
+        "pending": "pending" in request.GET,
+        **player_summary(request.user),
+    }
+    return render(request, "attempt_history.html", context)
@@ -0,0 +1,282 @@
+"""
+File: write_behind.py
+
+Description: This file implements the optional write-behind mode for quiz attempts. When it
+is enabled (QUIZ_WRITE_BEHIND["ENABLED"]), submit_quiz grades the attempt and hands it to an
+in-process bounded queue instead of writing it. A background flusher thread commits queued
+attempts and their responses in batches, either when BATCH_SIZE attempts are waiting or
+FLUSH_INTERVAL seconds after the first one arrived. Many submissions then share one SQLite
+write transaction instead of queueing for the writer lock one by one.
+
+submit_quiz waits for the batch holding its attempt to be committed, since the results page
+is addressed by the attempt id: requests still share write transactions, but each one takes
+up to FLUSH_INTERVAL seconds longer. If the write fails, record_attempt raises
+AttemptWriteFailed. If it is still queued after WAIT_TIMEOUT seconds, it will be written
+later, so submit_quiz sends the player to their attempt history instead of asking them to
+submit again.
+
+Back-pressure: when the queue is full, a submitting request waits up to PUT_TIMEOUT seconds
+for room, then writes its attempt synchronously. Every queued attempt is flushed when the
+process exits.
+
+Note that completed_at is set by auto_now_add when the batch is written, so it can be up to
+FLUSH_INTERVAL seconds later than the actual submission.
+
+Contents of this file:
+1. AttemptWriteFailed: Raised when a queued attempt could not be written.
+2. PendingAttempt: Handle for a queued attempt; wait() blocks until it is saved.
+3. AttemptWriteBuffer: The queue, the flusher thread and their metrics.
+4. get_buffer: Returns the process-wide buffer, starting it on first use.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import QuizAttempt, UserAnswer
+from .signals import attempts_recorded
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": False,
+    "MAX_QUEUE": 10000,  # Attempts held in memory before producers are slowed down
+    "BATCH_SIZE": 200,  # Attempts committed per transaction
+    "FLUSH_INTERVAL": 0.25,  # Seconds the oldest queued attempt may wait
+    "PUT_TIMEOUT": 2.0,  # Seconds a full queue blocks a request before it writes itself
+    "WAIT_TIMEOUT": 10.0,  # Seconds a request waits for its attempt to be committed
+}
+
+
+def write_behind_settings():
+    return {**DEFAULTS, **getattr(settings, "QUIZ_WRITE_BEHIND", {})}
+
+
+class AttemptWriteFailed(Exception):
+    """
+    Raised when the background writer could not save a queued attempt.
+    """
+
+
+class PendingAttempt:
+    """
+    A graded attempt waiting in the write-behind queue.
+
+    Attributes:
+        - attempt: The unsaved QuizAttempt; its pk is set once the batch is committed.
+        - user_answers: The unsaved UserAnswer rows of the attempt.
+        - failed: Whether the attempt could not be written; it is then dropped.
+    """
+
+    def __init__(self, attempt, user_answers):
+        self.attempt = attempt
+        self.user_answers = user_answers
+        self.enqueued_at = time.monotonic()
+        self.failed = False
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the attempt has been written or has failed. Returns False if it is
+        still queued after timeout seconds.
+        """
+        return self._done.wait(timeout)
+
+    def mark_saved(self):
+        self._done.set()
+
+    def mark_failed(self):
+        self.failed = True
+        self._done.set()
+
+
+class AttemptWriteBuffer:
+    """
+    Bounded queue of graded attempts with a background batch flusher.
+    """
+
+    def __init__(self, max_queue, batch_size, flush_interval, put_timeout):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            "enqueued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "synchronous_writes": 0,
+            "last_flush_s": 0.0,
+            "max_flush_s": 0.0,
+            "total_flush_s": 0.0,
+            "max_wait_s": 0.0,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="quiz-attempt-flusher", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def submit(self, attempt, user_answers):
+        """
+        Queues a graded attempt for writing.
+        Parameters:
+            attempt: The unsaved QuizAttempt.
+            user_answers: Its unsaved UserAnswer rows.
+        Returns:
+            PendingAttempt: The queued attempt, or an already saved one if the queue
+            stayed full for PUT_TIMEOUT seconds and the attempt was written directly.
+        """
+        pending = PendingAttempt(attempt, user_answers)
+        try:
+            self._queue.put(pending, timeout=self.put_timeout)
+        except queue.Full:
+            self._write([pending])
+            self._count("synchronous_writes")
+            return pending
+        self._count("enqueued")
+        return pending
+
+    def flush(self):
+        """
+        Writes every attempt currently queued, in batches, on the calling thread.
+        """
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def shutdown(self, timeout=10):
+        """
+        Stops the flusher thread and writes whatever is still queued.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        """
+        Returns the queue depth and flush metrics of this process.
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        batches = metrics["batches"]
+        metrics["queue_depth"] = self._queue.qsize()
+        metrics["queue_capacity"] = self._queue.maxsize
+        metrics["avg_flush_s"] = metrics["total_flush_s"] / batches if batches else 0.0
+        return metrics
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # Collect more attempts until the batch is full or the oldest one is due
+            batch = [first]
+            deadline = first.enqueued_at + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            connection.close_if_unusable_or_obsolete()
+
+    def _write(self, batch):
+        started = time.monotonic()
+        try:
+            with transaction.atomic():
+                attempts = QuizAttempt.objects.bulk_create(
+                    [pending.attempt for pending in batch]
+                )
+                user_answers = []
+                for pending in batch:
+                    for user_answer in pending.user_answers:
+                        user_answer.quiz_attempt = pending.attempt
+                    user_answers.extend(pending.user_answers)
+                UserAnswer.objects.bulk_create(user_answers, batch_size=500)
+                # bulk_create sends no post_save, so announce the new attempts here
+                attempts_recorded.send(sender=QuizAttempt, attempts=attempts)
+        except Exception:
+            self._count("failed_batches")
+            if len(batch) > 1:
+                # Retry one by one so a single bad attempt does not lose the whole batch
+                for pending in batch:
+                    pending.attempt.pk = None
+                    self._write([pending])
+                return
+            logger.exception(
+                "Failed to write quiz attempt of user %s", batch[0].attempt.user_id
+            )
+            # The insert was rolled back, so the pk it may have returned does not exist
+            batch[0].attempt.pk = None
+            batch[0].mark_failed()
+            return
+
+        for pending in batch:
+            pending.mark_saved()
+
+        elapsed = time.monotonic() - started
+        oldest = min(pending.enqueued_at for pending in batch)
+        with self._lock:
+            self._metrics["flushed"] += len(batch)
+            self._metrics["batches"] += 1
+            self._metrics["last_flush_s"] = elapsed
+            self._metrics["total_flush_s"] += elapsed
+            self._metrics["max_flush_s"] = max(self._metrics["max_flush_s"], elapsed)
+            self._metrics["max_wait_s"] = max(
+                self._metrics["max_wait_s"], time.monotonic() - oldest
+            )
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """
+    Returns the process-wide attempt buffer, creating and starting it on first use.
+    """
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            options = write_behind_settings()
+            _buffer = AttemptWriteBuffer(
+                max_queue=options["MAX_QUEUE"],
+                batch_size=options["BATCH_SIZE"],
+                flush_interval=options["FLUSH_INTERVAL"],
+                put_timeout=options["PUT_TIMEOUT"],
+            )
+            _buffer.start()
+    return _buffer
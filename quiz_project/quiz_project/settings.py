@@ -13,9 +13,16 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 
+import environ
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Deployment settings are read from the environment, or from an optional .env file
+# next to manage.py. Variables already set in the environment take precedence.
+env = environ.Env()
+environ.Env.read_env(BASE_DIR / ".env")
+
 
 # Login url
 LOGIN_URL = "/sign_in/"
@@ -45,12 +52,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "quiz_app.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "quiz_app.middleware.PrimaryPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # AuthenticationMiddleware that reads request.user from the cache (quiz_app/users.py)
+    "quiz_app.middleware.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -59,7 +69,8 @@ ROOT_URLCONF = "quiz_project.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # The stock Django backend, with render times recorded (see quiz_app/metrics.py)
+        "BACKEND": "quiz_app.metrics.InstrumentedDjangoTemplates",
         "DIRS": [os.path.join(BASE_DIR, "quiz_app/templates/quiz_app")],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -79,14 +90,70 @@ WSGI_APPLICATION = "quiz_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Set DATABASE_URL to use another database, e.g. sqlite:////srv/quiz/db.sqlite3
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+    "default": env.db("DATABASE_URL", default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+}
+# Keep connections open between requests (seconds; 0 closes them after every request)
+# and check them before reuse, so a worker does not reconnect on each request.
+DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=600)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = env.bool("DB_CONN_HEALTH_CHECKS", default=True)
+
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # Take the write lock when a transaction starts, so concurrent writers wait on the
+    # busy timeout instead of failing with "database is locked" when a read
+    # transaction is upgraded to a write.
+    DATABASES["default"].setdefault("OPTIONS", {})["transaction_mode"] = env.str(
+        "SQLITE_TRANSACTION_MODE", default="IMMEDIATE"
+    )
+
+# Read replicas for quiz browsing (see quiz_app/routers.py). Each URL in
+# DATABASE_REPLICA_URLS (comma-separated) becomes an alias replica1, replica2, ...
+# sharing the primary's connection settings; tests read them from the test primary.
+DATABASE_REPLICAS = []
+for number, url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), start=1):
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        **env.db_url_config(url),
+        "CONN_MAX_AGE": DATABASES["default"]["CONN_MAX_AGE"],
+        "CONN_HEALTH_CHECKS": DATABASES["default"]["CONN_HEALTH_CHECKS"],
+        "OPTIONS": dict(DATABASES["default"].get("OPTIONS", {})),
+        "TEST": {"MIRROR": "default"},
     }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["quiz_app.routers.PrimaryReplicaRouter"]
+
+# Seconds a user's reads stay on the primary after they wrote quiz data
+QUIZ_PRIMARY_PIN_SECONDS = env.int("QUIZ_PRIMARY_PIN_SECONDS", default=5)
+
+# PRAGMAs applied to every new SQLite connection (see quiz_app/database.py).
+# WAL lets readers run while a write is in progress; synchronous=NORMAL is durable
+# against application crashes in WAL mode and avoids an fsync on every commit.
+SQLITE_PRAGMAS = {
+    "busy_timeout": env.int("SQLITE_BUSY_TIMEOUT", default=5000),  # Milliseconds
+    "journal_mode": env.str("SQLITE_JOURNAL_MODE", default="wal"),
+    "synchronous": env.str("SQLITE_SYNCHRONOUS", default="normal"),
+    "mmap_size": env.int("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024),  # Bytes
+    "cache_size": env.int("SQLITE_CACHE_SIZE", default=-64000),  # Negative: KiB
+    "temp_store": env.str("SQLITE_TEMP_STORE", default="memory"),
 }
 
 
+# Cache shared by the quiz caches, sessions and users. Set CACHE_URL to change the
+# backend, e.g. filecache:///var/tmp/quiz_cache to share it between worker processes.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://quiz")}
+
+# cached_db keeps sessions in the cache and falls back to the database on a miss;
+# django.contrib.sessions.backends.cache skips the database (sessions die with the cache).
+SESSION_ENGINE = env.str(
+    "SESSION_ENGINE", default="django.contrib.sessions.backends.cached_db"
+)
+
+# Seconds a logged-in User object stays cached (see quiz_app/users.py)
+USER_CACHE_TIMEOUT = env.int("USER_CACHE_TIMEOUT", default=60)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -133,9 +200,65 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
-    }
+# Large quizzes post one field per question and answer from create_quiz
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
+
+# Answer-key cache used to grade quiz submissions (see quiz_app/answer_keys.py)
+ANSWER_KEY_CACHE_SIZE = 512  # Quizzes kept in the in-process LRU
+ANSWER_KEY_CACHE_TIMEOUT = 3600  # Seconds a key lives in the shared Django cache
+
+# Seconds a rendered play_quiz question block stays cached (see quiz_app/fragments.py)
+QUIZ_FRAGMENT_CACHE_TIMEOUT = 86400
+
+# Versioned quiz content snapshots (see quiz_app/snapshots.py)
+QUIZ_SNAPSHOT_CACHE_TIMEOUT = 86400  # Seconds a snapshot version stays cached
+QUIZ_SNAPSHOT_GZIP = True  # Also cache a gzip-compressed copy for clients that accept it
+QUIZ_SNAPSHOT_MAX_AGE = 0  # Cache-Control max-age; 0 makes clients revalidate every time
+
+# Seconds the question id array of a pooled quiz version stays cached (see quiz_app/pools.py)
+QUIZ_POOL_CACHE_TIMEOUT = 86400
+
+# Quizzes with more questions than this are played progressively: play_quiz renders the first
+# page and the browser fetches the others from the paged JSON API (see quiz_app/question_pages.py)
+QUIZ_PROGRESSIVE_PLAY_THRESHOLD = 200
+QUIZ_QUESTION_PAGE_SIZE = 50  # Questions per page of the API
+
+# Seconds a signed attempt token issued by play_quiz can be submitted (see
+# quiz_app/attempt_tokens.py). Replayed tokens are detected through the cache.
+QUIZ_ATTEMPT_TOKEN_MAX_AGE = 4 * 3600
+
+# Home page catalogue (see quiz_app/catalogue.py)
+QUIZ_CATALOGUE_PAGE_SIZE = 20  # Quizzes per page
+QUIZ_FACET_CACHE_TIMEOUT = 300  # Seconds the category/difficulty counts stay cached
+
+# Attempt history dashboard (see quiz_app/history.py)
+QUIZ_HISTORY_PAGE_SIZE = 20  # Attempts per page
+QUIZ_HISTORY_BEST_SCORES = 10  # Most recently played quizzes listed with their best score
+
+# Serve the play path from the async views in quiz_app/async_views.py.
+# Only enable this when running under an ASGI server (see quiz_project/asgi.py).
+QUIZ_ASYNC_VIEWS = env.bool("QUIZ_ASYNC_VIEWS", default=False)
+
+# Optional write-behind mode for quiz attempts (see quiz_app/write_behind.py).
+# When enabled, graded attempts are queued in memory and committed in batches.
+QUIZ_WRITE_BEHIND = {
+    "ENABLED": env.bool("QUIZ_WRITE_BEHIND", default=False),
+    "MAX_QUEUE": 10000,  # Attempts held in memory before requests are slowed down
+    "BATCH_SIZE": 200,  # Attempts committed per transaction
+    "FLUSH_INTERVAL": 0.25,  # Seconds the oldest queued attempt may wait
+    "PUT_TIMEOUT": 2.0,  # Seconds a full queue blocks a request before it writes itself
+    "WAIT_TIMEOUT": 10.0,  # Seconds submit_quiz waits for its attempt to be committed
 }
+
+# Seconds the rendered breakdown of an attempt stays cached (see quiz_app/results.py)
+QUIZ_RESULTS_CACHE_TIMEOUT = 86400
+
+# Attempts kept on each quiz leaderboard (see quiz_app/leaderboards.py)
+LEADERBOARD_SIZE = 10
+
+# Per-request metrics exposed at /metrics (see quiz_app/metrics.py).
+# When QUIZ_METRICS_TOKEN is set, scrapers must send "Authorization: Bearer <token>";
+# otherwise only logged-in staff members can read them.
+QUIZ_METRICS_TOKEN = env.str("QUIZ_METRICS_TOKEN", default="")
+# Requests slower than this many seconds are logged with their slowest SQL (unset: off)
+QUIZ_SLOW_REQUEST_SECONDS = env.float("QUIZ_SLOW_REQUEST_SECONDS", default=None)